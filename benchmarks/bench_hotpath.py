@@ -0,0 +1,290 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Микротесты производительности генерации значений и разрешения состояния объектов.
+
+Измеряется время выполнения функций, выполняемых для каждого объекта в каждом тике:
+    - icObjectProto.fill_state - полное заполнение состояния объекта;
+    - icObjectProto.gen_correct_value - генерация одного значения;
+    - icObjectProto.gen_code - генерация блока кода по заполненному состоянию;
+    - txtgen.auto_replace - автозамены в тексте (с кешем шаблонов и без него);
+    - icRegistrator.get_value_by_link - получение значения по ссылке
+      (с кешем разобранных ссылок и без него).
+
+Тестовый объект содержит заданное количество значений. Каждое значение -
+цепочка автозамен {{ }} заданной глубины, в основании которой ссылка
+на переменную одного из объектов-источников (количество источников задает
+разветвленность ссылок) или константа, если источников нет.
+
+Параметры коммандной строки:
+
+    python benchmarks/bench_hotpath.py <Параметры запуска>
+
+Параметры запуска:
+
+    --help|-h|-?        Напечатать строки помощи
+    --values=           Количество значений объекта. Можно указать список через запятую. По умолчанию 10,100
+    --depth=            Глубина вложенности автозамен. Можно указать список через запятую. По умолчанию 1,5
+    --fanout=           Количество объектов, на которые ссылаются значения.
+                        Можно указать список через запятую. По умолчанию 10
+    --functions=        Список измеряемых функций через запятую. По умолчанию все
+    --repeat=           Количество повторов измерения. По умолчанию 5
+    --number=           Количество вызовов функции в одном измерении. По умолчанию 100
+    --json=             Файл сохранения результатов в формате JSON
+"""
+
+import os
+import os.path
+import sys
+import time
+import json
+import getopt
+import timeit
+import platform
+import itertools
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ic import config
+from ic import engine
+from ic import datasrc_proto
+from ic.utils import log
+from ic.utils import txtgen
+
+__version__ = (0, 0, 1, 1)
+
+DEFAULT_VALUES = (10, 100)
+DEFAULT_DEPTH = (1, 5)
+DEFAULT_FANOUT = (10,)
+DEFAULT_REPEAT = 5
+DEFAULT_NUMBER = 100
+
+# Имя тестового объекта
+OBJECT_NAME = 'BENCH_OBJ'
+# Имя переменной объектов-источников, на которую ссылаются значения
+LINK_VALUE_NAME = 'value'
+
+
+def get_value_name(i, level):
+    """
+    Имя переменной значения.
+    @param i: Номер значения.
+    @param level: Уровень вложенности.
+    """
+    return 'v%04d_%02d' % (i, level)
+
+
+def get_src_name(i):
+    """
+    Имя объекта-источника.
+    @param i: Номер объекта-источника.
+    """
+    return 'SRC_%04d' % i
+
+
+def get_link(i):
+    """
+    Ссылка на переменную объекта-источника.
+    @param i: Номер объекта-источника.
+    """
+    return u'%s%s%s%s' % (engine.LINK_SIGNATURE, get_src_name(i), engine.LINK_DELIMETER, LINK_VALUE_NAME)
+
+
+class icHotPathCase(object):
+    """
+    Набор объектов одного варианта измерения.
+    """
+    def __init__(self, value_count, depth, fanout):
+        """
+        Конструктор.
+        @param value_count: Количество значений тестового объекта.
+        @param depth: Глубина вложенности автозамен каждого значения.
+        @param fanout: Количество объектов-источников, на которые ссылаются значения.
+        """
+        self.value_count = value_count
+        self.depth = depth
+        self.fanout = fanout
+
+        self.registrator = engine.icRegistrator()
+        self.links = [get_link(i) for i in range(fanout)]
+        for i in range(fanout):
+            src_obj = datasrc_proto.icDataSourceProto(self.registrator, name=get_src_name(i))
+            src_obj.reg_state(**{LINK_VALUE_NAME: i * 10})
+            self.registrator.reg_object(src_obj)
+
+        properties = dict(name=OBJECT_NAME, values=list())
+        for i in range(value_count):
+            name = get_value_name(i, 0)
+            properties['values'].append(name)
+            properties[name] = self.links[i % fanout] if fanout else unicode(i)
+            for level in range(1, depth + 1):
+                name = get_value_name(i, level)
+                properties['values'].append(name)
+                properties[name] = u'{{ %s }}.%d' % (get_value_name(i, level - 1), level)
+        self.obj = datasrc_proto.icDataSourceProto(self.registrator, **properties)
+        self.registrator.reg_object(self.obj)
+
+        # Значения верхнего уровня вложенности
+        self.top_names = [get_value_name(i, depth) for i in range(value_count)]
+        # Команда, использующая все значения верхнего уровня.
+        # Измеряется только генерация, команда не выполняется
+        self.code = u'echo %s' % u' '.join([u'{{ %s }}' % name for name in self.top_names])
+        # Текст и контекст автозамен
+        self.replace_txt = u'\n'.join([u'%s = {{ %s }}' % (name, name) for name in self.top_names])
+        self.replace_context = dict([(name, float(i)) for i, name in enumerate(self.top_names)])
+
+        self.cur_state = dict([(name, getattr(self.obj, name)) for name in self.obj.values])
+        self.obj.cache_state = self.obj.fill_state()
+
+    def fill_state(self):
+        """
+        Полное заполнение состояния объекта.
+        """
+        self.obj.fill_state()
+
+    def gen_correct_value(self):
+        """
+        Генерация всех значений верхнего уровня по одному.
+        """
+        for name in self.top_names:
+            self.obj.gen_correct_value(self.cur_state[name], self.cur_state)
+
+    def gen_code(self):
+        """
+        Генерация команды по заполненному состоянию объекта.
+        """
+        self.obj.gen_code(self.code)
+
+    def auto_replace(self):
+        """
+        Автозамены в тексте с кешем скомпилированных шаблонов.
+        """
+        txtgen.auto_replace(self.replace_txt, self.replace_context)
+
+    def auto_replace_nocache(self):
+        """
+        Автозамены в тексте с компиляцией шаблона.
+        """
+        txtgen.TEMPLATE_CACHE.clear()
+        txtgen.auto_replace(self.replace_txt, self.replace_context)
+
+    def get_value_by_link(self):
+        """
+        Получение значений по всем ссылкам с кешем разобранных ссылок.
+        """
+        for link in self.links:
+            self.registrator.get_value_by_link(link)
+
+    def get_value_by_link_nocache(self):
+        """
+        Получение значений по всем ссылкам с разбором ссылок.
+        """
+        self.registrator.link_resolvers.clear()
+        for link in self.links:
+            self.registrator.get_value_by_link(link)
+
+    def get_params(self):
+        """
+        Параметры варианта.
+        """
+        return dict(values=self.value_count, depth=self.depth, fanout=self.fanout)
+
+
+# Измеряемые функции
+FUNCTIONS = ('fill_state', 'gen_correct_value', 'gen_code',
+             'auto_replace', 'auto_replace_nocache',
+             'get_value_by_link', 'get_value_by_link_nocache')
+
+
+def measure(func, repeat=DEFAULT_REPEAT, number=DEFAULT_NUMBER):
+    """
+    Измерить время выполнения функции.
+    @param func: Функция без аргументов.
+    @param repeat: Количество повторов измерения.
+    @param number: Количество вызовов функции в одном измерении.
+    @return: Словарь статистики времени одного вызова в секундах.
+    """
+    timer = timeit.Timer(func)
+    times = sorted([total / number for total in timer.repeat(repeat=repeat, number=number)])
+    return dict(min=times[0], median=times[len(times) // 2], max=times[-1],
+                repeat=repeat, number=number)
+
+
+def run(options):
+    """
+    Выполнить микротесты по всем сочетаниям параметров.
+    @param options: Словарь параметров тестов.
+    @return: Список результатов.
+    """
+    results = list()
+    for value_count, depth, fanout in itertools.product(options['values'], options['depth'], options['fanout']):
+        case = icHotPathCase(value_count, depth, fanout)
+        print(u'values: %d  depth: %d  fanout: %d' % (value_count, depth, fanout))
+        for func_name in options['functions']:
+            # Кеш шаблонов не должен зависеть от предыдущих измерений
+            txtgen.TEMPLATE_CACHE.clear()
+            stat = measure(getattr(case, func_name), options['repeat'], options['number'])
+            print(u'\t%-28s min: %10.1f us  median: %10.1f us' % (func_name, stat['min'] * 1000000,
+                                                                   stat['median'] * 1000000))
+            result = case.get_params()
+            result.update(function=func_name, **stat)
+            results.append(result)
+    return results
+
+
+def parse_int_list(arg):
+    """
+    Разобрать список целых чисел через запятую.
+    """
+    return [int(item) for item in arg.split(',') if item.strip()]
+
+
+def main(argv):
+    """
+    Основная запускающая функция.
+    @param argv: Список параметров коммандной строки.
+    """
+    try:
+        opts, args = getopt.getopt(argv, 'h?',
+                                   ['help', 'values=', 'depth=', 'fanout=', 'functions=',
+                                    'repeat=', 'number=', 'json='])
+    except getopt.error, msg:
+        print(msg)
+        print(u'For help use --help option')
+        sys.exit(2)
+
+    options = dict(values=DEFAULT_VALUES, depth=DEFAULT_DEPTH, fanout=DEFAULT_FANOUT,
+                   functions=FUNCTIONS, repeat=DEFAULT_REPEAT, number=DEFAULT_NUMBER, json=None)
+    for option, arg in opts:
+        if option in ('-h', '--help', '-?'):
+            print(__doc__)
+            sys.exit(0)
+        elif option in ('--values', '--depth', '--fanout'):
+            options[option[2:]] = parse_int_list(arg)
+        elif option in ('--functions',):
+            options['functions'] = [name.strip() for name in arg.split(',') if name.strip() in FUNCTIONS]
+        elif option in ('--repeat', '--number'):
+            options[option[2:]] = int(arg)
+        elif option in ('--json',):
+            options['json'] = arg
+
+    # Отладочные сообщения не должны влиять на результат
+    config.set_cfg_var('DEBUG_MODE', False)
+    config.set_cfg_var('LOG_MODE', False)
+    log.init(config)
+
+    results = run(options)
+    if options['json']:
+        json_file = open(options['json'], 'w')
+        try:
+            json.dump(dict(version=__version__, python=platform.python_version(),
+                           time=time.strftime('%Y-%m-%d %H:%M:%S'), results=results),
+                      json_file, indent=4, sort_keys=True)
+        finally:
+            json_file.close()
+        print(u'Results saved to <%s>' % options['json'])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
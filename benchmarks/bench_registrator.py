@@ -0,0 +1,408 @@
+#!/usr/bin/env python
+#  -*- coding: utf-8 -*-
+
+"""
+Тест производительности тиков регистратора.
+
+Тест запускает icRegistrator.run_tick на синтетических файлах настроек.
+Внешние системы заменены локальными заменителями:
+    - UniReader - XML RPC сервер (fake_servers.icFakeUniReaderServer);
+    - УТМ ЕГАИС - HTTP сервер (fake_servers.icFakeUTMServer);
+    - PostgreSQL - база данных SQLite (требуется sqlalchemy).
+Для каждого сценария выводится количество тиков в секунду,
+время обработки каждого объекта и используемая память.
+
+Параметры коммандной строки:
+
+    python benchmarks/bench_registrator.py <Параметры запуска>
+
+Параметры запуска:
+
+    --help|-h|-?        Напечатать строки помощи
+    --debug|-d          Режим отладки (вывод сообщений регистратора)
+    --scenarios=        Список сценариев через запятую.
+                        По умолчанию все: uni_opc,xml_files,utm,sql
+    --ticks=            Количество измеряемых тиков каждого сценария. По умолчанию 10
+    --warmup=           Количество тиков прогрева, не входящих в измерение. По умолчанию 1
+    --tags=             Количество тегов UniReader. По умолчанию 100
+    --files=            Количество XML файлов. По умолчанию 100
+    --docs=             Количество документов УТМ. По умолчанию 10
+    --positions=        Количество позиций в каждом документе. По умолчанию 10
+    --delay=            Задержка ответа UniReader в секундах. По умолчанию 0
+    --work_dir=         Рабочая папка сценариев. По умолчанию временная папка, удаляемая после теста
+    --json=             Файл сохранения результатов в формате JSON для последующего сравнения
+"""
+
+import os
+import os.path
+import sys
+import time
+import json
+import shutil
+import getopt
+import sqlite3
+import resource
+import tempfile
+import distutils.spawn
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from ic import config
+from ic import engine
+from ic.utils import log
+from ic.utils import ini
+from ic.utils import journal
+from ic.utils import metrics
+
+from benchmarks import fake_servers
+
+__version__ = (0, 0, 1, 1)
+
+DEFAULT_TICKS = 10
+DEFAULT_WARMUP = 1
+DEFAULT_TAGS = 100
+DEFAULT_FILES = 100
+DEFAULT_DOCS = 10
+DEFAULT_POSITIONS = 10
+
+# Пути значений в XML документах
+XML_FILE_VALUES = (('doc_identity', 'Documents/Document/WayBill/Identity'),
+                   ('doc_number', 'Documents/Document/WayBill/Header/NUMBER'),
+                   ('doc_date', 'Documents/Document/WayBill/Header/Date'),
+                   ('fsrar_id', 'Documents/Owner/FSRAR_ID'))
+
+SQL_CREATE_TABLE = 'CREATE TABLE tags (id INTEGER PRIMARY KEY AUTOINCREMENT, name VARCHAR(64), value TEXT)'
+
+# Размер страницы памяти для определения текущего размера процесса
+PAGE_SIZE = resource.getpagesize()
+
+
+def get_tag_name(i):
+    """
+    Имя тега.
+    ВНИМАНИЕ! Имена параметров INI файла приводятся к нижнему регистру.
+    """
+    return 'tag_%04d' % (i + 1)
+
+
+def write_template(filename, names):
+    """
+    Записать шаблон текстового файла, в котором выводятся все значения.
+    @param filename: Полное имя файла шаблона.
+    @param names: Имена значений.
+    """
+    template_file = open(filename, 'w')
+    try:
+        template_file.write(''.join(['%s={{ %s }}\n' % (name, name) for name in names]))
+    finally:
+        template_file.close()
+
+
+def get_link_values(src_name, names):
+    """
+    Описание значений получателя в виде ссылок на значения источника.
+    @param src_name: Имя источника данных.
+    @param names: Имена значений.
+    @return: Словарь {Имя значения: Ссылка}.
+    """
+    return dict([(name, '%s%s%s%s' % (engine.LINK_SIGNATURE, src_name, engine.LINK_DELIMETER, name))
+                 for name in names])
+
+
+def get_txt_dst(work_dir, src_name, names):
+    """
+    Описание получателя данных - текстового файла со всеми значениями источника.
+    @param work_dir: Рабочая папка сценария.
+    @param src_name: Имя источника данных.
+    @param names: Имена значений.
+    @return: Словарь секции получателя данных.
+    """
+    template_filename = os.path.join(work_dir, 'template.txt')
+    write_template(template_filename, names)
+    section = dict(type='TXT_FMT', description='Text file', values=list(names),
+                   template=template_filename, output=os.path.join(work_dir, 'out', 'output.txt'))
+    section.update(get_link_values(src_name, names))
+    return section
+
+
+def get_uni_opc_src(server, tag_count):
+    """
+    Описание источника данных UniReader.
+    @param server: Заменитель UniReader.
+    @param tag_count: Количество тегов.
+    @return: Словарь секции источника данных.
+    """
+    tag_names = [get_tag_name(i) for i in range(tag_count)]
+    section = dict(type='UNI_OPC', description='UniReader', uni_host=server.host, uni_port=server.port,
+                   opc_server='RSLinx OPC Server', topic='BENCH', addresses=tag_names, values=list())
+    section.update(dict([(name, '[BENCH]N7:%d' % i) for i, name in enumerate(tag_names)]))
+    return section
+
+
+def make_uni_opc_settings(work_dir, servers, options):
+    """
+    Сценарий: чтение тегов UniReader и запись их в текстовый файл.
+    """
+    server = servers['uni_opc']
+    tag_names = [get_tag_name(i) for i in range(options['tags'])]
+    return {'OPTIONS': dict(sources=['UNI_SRC'], destinations=['TXT_DST']),
+            'UNI_SRC': get_uni_opc_src(server, options['tags']),
+            'TXT_DST': get_txt_dst(work_dir, 'UNI_SRC', tag_names)}
+
+
+def make_xml_files_settings(work_dir, servers, options):
+    """
+    Сценарий: чтение XML файлов и запись значений в текстовый файл.
+    Файлы не удаляются после обработки, поэтому каждый тик обрабатывает все файлы.
+    """
+    xml_dir = os.path.join(work_dir, 'xml')
+    os.makedirs(xml_dir)
+    for i in range(options['files']):
+        xml_file = open(os.path.join(xml_dir, 'doc_%06d.xml' % i), 'w')
+        try:
+            xml_file.write(fake_servers.gen_document_xml(i, 'XML-%06d' % i, options['positions']).encode('utf-8'))
+        finally:
+            xml_file.close()
+
+    names = [name for name, path in XML_FILE_VALUES]
+    src = dict(type='XML_FILE', description='XML files', xml_filename=os.path.join(xml_dir, '*.xml'),
+               values=names)
+    src.update(dict(XML_FILE_VALUES))
+    return {'OPTIONS': dict(sources=['XML_SRC'], destinations=['TXT_DST']),
+            'XML_SRC': src,
+            'TXT_DST': get_txt_dst(work_dir, 'XML_SRC', names)}
+
+
+def make_utm_settings(work_dir, servers, options):
+    """
+    Сценарий: чтение входящих документов УТМ.
+    """
+    curl = distutils.spawn.find_executable('curl')
+    if curl is None:
+        raise EnvironmentError('curl not found')
+    output_dir = os.path.join(work_dir, 'utm')
+    os.makedirs(output_dir)
+    return {'OPTIONS': dict(sources=['UTM_SRC'], destinations=list()),
+            'UTM_SRC': dict(type='UTM', description='UTM', utm_url=servers['utm'].get_url(),
+                            curl=curl, output_dir=output_dir, values=list())}
+
+
+def make_sql_settings(work_dir, servers, options):
+    """
+    Сценарий: чтение тегов UniReader, запись их в БД и чтение последних записей.
+    Вместо PostgreSQL используется SQLite.
+    """
+    # Без sqlalchemy сценарий пропускается
+    import sqlalchemy
+
+    db_filename = os.path.join(work_dir, 'bench.db')
+    connection = sqlite3.connect(db_filename)
+    try:
+        connection.execute(SQL_CREATE_TABLE)
+        connection.commit()
+    finally:
+        connection.close()
+    db_url = 'sqlite:///%s' % db_filename
+
+    tag_names = [get_tag_name(i) for i in range(options['tags'])]
+    insert_values = ', '.join(['(\'%s\', \'{{ %s }}\')' % (name, name) for name in tag_names])
+    dst = dict(type='SQL_DST', description='SQLite', db_url=db_url, values=tag_names,
+               sql='INSERT INTO tags (name, value) VALUES %s' % insert_values)
+    dst.update(get_link_values('UNI_SRC', tag_names))
+    src = dict(type='SQL_SRC', description='SQLite', db_url=db_url,
+               sql='SELECT name, value FROM tags ORDER BY id DESC LIMIT %d' % len(tag_names))
+    return {'OPTIONS': dict(sources=['UNI_SRC', 'SQL_SRC'], destinations=['SQL_DST'],
+                            queue=['UNI_SRC', 'SQL_DST', 'SQL_SRC']),
+            'UNI_SRC': get_uni_opc_src(servers['uni_opc'], options['tags']),
+            'SQL_DST': dst,
+            'SQL_SRC': src}
+
+
+# Сценарии ((Имя, Функция генерации словаря настроек), ...)
+SCENARIOS = (('uni_opc', make_uni_opc_settings),
+             ('xml_files', make_xml_files_settings),
+             ('utm', make_utm_settings),
+             ('sql', make_sql_settings))
+
+
+def get_memory_usage():
+    """
+    Используемая процессом память.
+    @return: Словарь (rss_kb - текущий размер, max_rss_kb - максимальный размер).
+    """
+    rss_kb = None
+    try:
+        statm_file = open('/proc/self/statm')
+        try:
+            rss_kb = int(statm_file.read().split()[1]) * PAGE_SIZE / 1024
+        finally:
+            statm_file.close()
+    except (IOError, IndexError, ValueError):
+        pass
+    return dict(rss_kb=rss_kb, max_rss_kb=resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)
+
+
+def get_object_latencies():
+    """
+    Время обработки объектов за измеряемые тики.
+    @return: Словарь {Имя объекта.операция: Словарь статистики}.
+    """
+    latencies = dict()
+    for (name, labels), timing in metrics.TIMINGS.items():
+        if name != 'object_seconds':
+            continue
+        labels = dict(labels)
+        latencies['%s.%s' % (labels['object'], labels['operation'])] = dict(count=timing.count,
+                                                                           avg=timing.get_avg(),
+                                                                           p50=timing.get_quantile(0.5),
+                                                                           p90=timing.get_quantile(0.9),
+                                                                           max=timing.get_max())
+    return latencies
+
+
+def run_scenario(name, make_settings, work_dir, servers, options):
+    """
+    Выполнить сценарий.
+    @param name: Имя сценария.
+    @param make_settings: Функция генерации словаря настроек.
+    @param work_dir: Рабочая папка сценария.
+    @param servers: Словарь запущенных заменителей внешних систем.
+    @param options: Словарь параметров теста.
+    @return: Словарь результатов сценария.
+    """
+    os.makedirs(work_dir)
+    settings = make_settings(work_dir, servers, options)
+    settings_filename = os.path.join(work_dir, 'settings.ini')
+    ini.Dict2INI(settings, settings_filename)
+
+    journal.init(os.path.join(work_dir, 'bench.jrn'))
+    config.set_cfg_var('SETTINGS_FILENAME', settings_filename)
+    config.set_cfg_var('RUN_MODE', config.RUN_MODE_SINGLE)
+    registrator = engine.icRegistrator()
+    if not registrator.init_settings():
+        raise EnvironmentError('Settings <%s> not loaded' % settings_filename)
+
+    for n_tick in range(options['warmup']):
+        registrator.run_tick(n_tick + 1)
+
+    metrics.clear()
+    memory_start = get_memory_usage()
+    start_time = time.time()
+    for n_tick in range(options['ticks']):
+        registrator.run_tick(options['warmup'] + n_tick + 1)
+    total_time = time.time() - start_time
+    memory_stop = get_memory_usage()
+
+    tick_timing = metrics.get_timing('tick_seconds')
+    return dict(scenario=name,
+                ticks=options['ticks'],
+                total_seconds=total_time,
+                ticks_per_second=options['ticks'] / total_time if total_time else None,
+                tick_avg=tick_timing.get_avg() if tick_timing else None,
+                tick_max=tick_timing.get_max() if tick_timing else None,
+                tick_errors=metrics.get_counter('tick_errors_total'),
+                objects=get_object_latencies(),
+                memory_start=memory_start,
+                memory_stop=memory_stop)
+
+
+def print_result(result):
+    """
+    Вывести результаты сценария.
+    @param result: Словарь результатов сценария.
+    """
+    print(u'[%s] ticks: %d  ticks/sec: %.2f  tick avg: %.4f s  max: %.4f s  errors: %d' % (
+          result['scenario'], result['ticks'], result['ticks_per_second'] or 0.0,
+          result['tick_avg'] or 0.0, result['tick_max'] or 0.0, result['tick_errors']))
+    for object_name, latency in sorted(result['objects'].items()):
+        print(u'\t%-20s avg: %.4f s  p50: %.4f s  p90: %.4f s  max: %.4f s' % (
+              object_name, latency['avg'], latency['p50'], latency['p90'], latency['max']))
+    print(u'\tmemory rss: %s KB -> %s KB  max rss: %s KB' % (result['memory_start']['rss_kb'],
+                                                           result['memory_stop']['rss_kb'],
+                                                           result['memory_stop']['max_rss_kb']))
+
+
+def run(options):
+    """
+    Выполнить тест производительности.
+    @param options: Словарь параметров теста.
+    @return: Список результатов сценариев.
+    """
+    work_dir = options['work_dir'] or tempfile.mkdtemp(prefix='icregistrator_bench_')
+    servers = dict(uni_opc=fake_servers.icFakeUniReaderServer(delay=options['delay']),
+                   utm=fake_servers.icFakeUTMServer(doc_count=options['docs'],
+                                                    position_count=options['positions']))
+    results = list()
+    try:
+        for server in servers.values():
+            server.start()
+        for name, make_settings in SCENARIOS:
+            if name not in options['scenarios']:
+                continue
+            try:
+                result = run_scenario(name, make_settings, os.path.join(work_dir, name), servers, options)
+            except (ImportError, EnvironmentError), err:
+                print(u'[%s] skipped: %s' % (name, err))
+                continue
+            result.update(dict([(option, options[option]) for option in ('tags', 'files', 'docs', 'positions')]))
+            print_result(result)
+            results.append(result)
+    finally:
+        for server in servers.values():
+            server.stop()
+        journal.close()
+        if not options['work_dir']:
+            shutil.rmtree(work_dir, ignore_errors=True)
+    return results
+
+
+def main(argv):
+    """
+    Основная запускающая функция.
+    @param argv: Список параметров коммандной строки.
+    """
+    try:
+        opts, args = getopt.getopt(argv, 'h?d',
+                                   ['help', 'debug', 'scenarios=', 'ticks=', 'warmup=',
+                                    'tags=', 'files=', 'docs=', 'positions=', 'delay=',
+                                    'work_dir=', 'json='])
+    except getopt.error, msg:
+        print(msg)
+        print(u'For help use --help option')
+        sys.exit(2)
+
+    options = dict(scenarios=[name for name, make_settings in SCENARIOS],
+                   ticks=DEFAULT_TICKS, warmup=DEFAULT_WARMUP,
+                   tags=DEFAULT_TAGS, files=DEFAULT_FILES, docs=DEFAULT_DOCS, positions=DEFAULT_POSITIONS,
+                   delay=0.0, work_dir=None, json=None)
+    config.set_cfg_var('DEBUG_MODE', False)
+    config.set_cfg_var('LOG_MODE', False)
+    for option, arg in opts:
+        if option in ('-h', '--help', '-?'):
+            print(__doc__)
+            sys.exit(0)
+        elif option in ('-d', '--debug'):
+            config.set_cfg_var('DEBUG_MODE', True)
+        elif option in ('--scenarios',):
+            options['scenarios'] = [name.strip() for name in arg.split(',')]
+        elif option in ('--ticks', '--warmup', '--tags', '--files', '--docs', '--positions'):
+            options[option[2:]] = int(arg)
+        elif option in ('--delay',):
+            options['delay'] = float(arg)
+        elif option in ('--work_dir', '--json'):
+            options[option[2:]] = arg
+    log.init(config)
+
+    results = run(options)
+    if options['json']:
+        json_file = open(options['json'], 'w')
+        try:
+            json.dump(dict(version=__version__, time=time.strftime('%Y-%m-%d %H:%M:%S'), results=results),
+                      json_file, indent=4, sort_keys=True)
+        finally:
+            json_file.close()
+        print(u'Results saved to <%s>' % options['json'])
+
+
+if __name__ == '__main__':
+    main(sys.argv[1:])
@@ -0,0 +1,247 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Локальные заменители внешних систем для тестов производительности.
+
+    - icFakeUniReaderServer - XML RPC сервер, имитирующий шлюз UniReader
+      (процедура sources.ReadValueAsString);
+    - icFakeUTMServer - HTTP сервер, имитирующий УТМ ЕГАИС
+      (список входящих документов /opt/out и сами документы).
+
+Серверы запускаются в фоновых потоках на локальном интерфейсе.
+Если порт не указан, то он выбирается операционной системой.
+"""
+
+import time
+import uuid
+import threading
+import SocketServer
+import BaseHTTPServer
+import SimpleXMLRPCServer
+
+__version__ = (0, 0, 1, 1)
+
+LOCALHOST = '127.0.0.1'
+
+# Путь списка входящих документов УТМ
+UTM_INBOX_PATH = '/opt/out'
+# Тип имитируемых документов УТМ
+UTM_DOC_TYPE = 'WayBill_v3'
+
+UTM_INBOX_FMT = u'''<?xml version="1.0" encoding="UTF-8" standalone="no"?>
+<A>%s<ver>2</ver></A>'''
+UTM_INBOX_URL_FMT = u'<url replyId="%s">%s</url>'
+UTM_DOC_FMT = u'''<?xml version="1.0" encoding="UTF-8"?>
+<Documents Version="1.0">
+<Owner><FSRAR_ID>0300000000%04d</FSRAR_ID></Owner>
+<Document><WayBill>
+<Identity>%s</Identity>
+<Header><NUMBER>%d</NUMBER><Date>2017-01-01</Date><Type>WBInvoiceFromMe</Type></Header>
+<Content>%s</Content>
+</WayBill></Document>
+</Documents>'''
+UTM_DOC_POSITION_FMT = u'<Position><Identity>%d</Identity><Quantity>%d</Quantity><Price>%d.50</Price></Position>'
+UTM_DELETE_RESPONSE = u'<?xml version="1.0" encoding="UTF-8"?><A><result>OK</result></A>'
+
+
+def gen_document_xml(i, identity, position_count=10):
+    """
+    Сгенерировать XML документа ЕГАИС.
+    @param i: Номер документа.
+    @param identity: Идентификатор документа.
+    @param position_count: Количество позиций документа.
+    @return: Текст XML документа.
+    """
+    positions = u''.join([UTM_DOC_POSITION_FMT % (n + 1, n + i, n) for n in range(position_count)])
+    return UTM_DOC_FMT % (i, identity, i + 1, positions)
+
+
+class icThreadingXMLRPCServer(SocketServer.ThreadingMixIn, SimpleXMLRPCServer.SimpleXMLRPCServer):
+    """
+    XML RPC сервер с обработкой запросов в отдельных потоках.
+    """
+    daemon_threads = True
+
+
+class icThreadingHTTPServer(SocketServer.ThreadingMixIn, BaseHTTPServer.HTTPServer):
+    """
+    HTTP сервер с обработкой запросов в отдельных потоках.
+    """
+    daemon_threads = True
+
+
+class icFakeServerProto(object):
+    """
+    Абстрактный фоновый сервер.
+    """
+    def __init__(self, host=LOCALHOST, port=0):
+        """
+        Конструктор.
+        @param host: Адрес.
+        @param port: Порт. 0 - порт выбирается операционной системой.
+        """
+        self.host = host
+        self.port = port
+        self.server = None
+        self.thread = None
+        # Количество обработанных запросов
+        self.request_count = 0
+
+    def create_server(self):
+        """
+        Создать объект сервера.
+        """
+        raise NotImplementedError
+
+    def start(self):
+        """
+        Запустить сервер в фоновом потоке.
+        @return: Порт сервера.
+        """
+        self.server = self.create_server()
+        self.port = self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever, name=self.__class__.__name__)
+        self.thread.daemon = True
+        self.thread.start()
+        return self.port
+
+    def stop(self):
+        """
+        Остановить сервер.
+        """
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+            self.server = None
+            self.thread = None
+
+    def get_url(self):
+        """
+        Адрес сервера.
+        """
+        return 'http://%s:%d' % (self.host, self.port)
+
+
+class icFakeUniReaderServer(icFakeServerProto):
+    """
+    Имитация шлюза UniReader.
+    Значения тегов генерируются по адресу и номеру запроса,
+    т.е. меняются от тика к тику.
+    """
+    def __init__(self, host=LOCALHOST, port=0, delay=0.0):
+        """
+        Конструктор.
+        @param host: Адрес.
+        @param port: Порт.
+        @param delay: Искусственная задержка ответа в секундах (имитация сети и OPC сервера).
+        """
+        icFakeServerProto.__init__(self, host, port)
+        self.delay = delay
+
+    def create_server(self):
+        server = icThreadingXMLRPCServer((self.host, self.port), logRequests=False, allow_none=True)
+        server.register_introspection_functions()
+        server.register_function(self.read_value_as_string, 'sources.ReadValueAsString')
+        return server
+
+    def read_value_as_string(self, node, opc_server, address):
+        """
+        Прочитать значение тега.
+        @param node: Узел OPC сервера.
+        @param opc_server: Имя OPC сервера.
+        @param address: Адрес тега.
+        @return: Список (Значение, Качество, Время).
+        """
+        self.request_count += 1
+        if self.delay:
+            time.sleep(self.delay)
+        value = (hash(address) % 10000 + self.request_count) / 10.0
+        return [str(value), 'Good', time.strftime('%Y-%m-%d %H:%M:%S')]
+
+
+class icFakeUTMRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Обработчик запросов имитации УТМ.
+    """
+    def _send(self, body, code=200):
+        body = body.encode('utf-8')
+        self.send_response(code)
+        self.send_header('Content-Type', 'text/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def do_GET(self):
+        utm = self.server.utm
+        utm.request_count += 1
+        path = self.path.split('?')[0].rstrip('/')
+        if path == UTM_INBOX_PATH:
+            self._send(utm.get_inbox_xml())
+            return
+        body = utm.get_document_xml(path)
+        if body is None:
+            self.send_error(404)
+            return
+        self._send(body)
+
+    def do_DELETE(self):
+        self.server.utm.request_count += 1
+        self._send(UTM_DELETE_RESPONSE)
+
+    def log_message(self, format, *args):
+        # Запросы не выводим
+        pass
+
+
+class icFakeUTMServer(icFakeServerProto):
+    """
+    Имитация УТМ ЕГАИС.
+    Список входящих документов постоянный, документы не удаляются.
+    """
+    def __init__(self, host=LOCALHOST, port=0, doc_count=10, position_count=10):
+        """
+        Конструктор.
+        @param host: Адрес.
+        @param port: Порт.
+        @param doc_count: Количество входящих документов.
+        @param position_count: Количество позиций в каждом документе.
+        """
+        icFakeServerProto.__init__(self, host, port)
+        self.doc_count = doc_count
+        self.position_count = position_count
+        self.reply_ids = [str(uuid.uuid4()) for i in range(doc_count)]
+
+    def create_server(self):
+        server = icThreadingHTTPServer((self.host, self.port), icFakeUTMRequestHandler)
+        server.utm = self
+        return server
+
+    def get_document_path(self, i):
+        """
+        Путь документа.
+        @param i: Номер документа.
+        """
+        return '%s/%s/%d' % (UTM_INBOX_PATH, UTM_DOC_TYPE, i + 1)
+
+    def get_inbox_xml(self):
+        """
+        XML списка входящих документов.
+        """
+        urls = [UTM_INBOX_URL_FMT % (reply_id, self.get_url() + self.get_document_path(i))
+                for i, reply_id in enumerate(self.reply_ids)]
+        return UTM_INBOX_FMT % u''.join(urls)
+
+    def get_document_xml(self, path):
+        """
+        XML документа.
+        @param path: Путь документа.
+        @return: Текст XML или None, если документ не найден.
+        """
+        prefix = '%s/%s/' % (UTM_INBOX_PATH, UTM_DOC_TYPE)
+        if not path.startswith(prefix) or not path[len(prefix):].isdigit():
+            return None
+        i = int(path[len(prefix):]) - 1
+        if not 0 <= i < self.doc_count:
+            return None
+        return gen_document_xml(i, self.reply_ids[i], self.position_count)
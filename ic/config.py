@@ -28,6 +28,8 @@ JOURNAL_FILENAME = os.path.join(PROFILE_DIR,
 
 DEBUG_MODE = True
 LOG_MODE = True
+# Асинхронный вывод сообщений в фоновом потоке
+LOG_ASYNC = False
 
 DEFAULT_INI_FILENAME = 'settings.ini'
 
@@ -40,8 +42,18 @@ RUN_MODE_LOOP = 'loop'
 RUN_MODE_SRC_DIAGNOSTIC = 'src_diagnostic'
 RUN_MODE_DST_DIAGNOSTIC = 'dst_diagnostic'
 RUN_MODE_DEBUG = 'debug'
+# Режим службы. Циклическая обработка без консоли с управлением сигналами:
+# SIGTERM/SIGINT - завершение после окончания текущего такта, SIGHUP - перезагрузка настроек
+RUN_MODE_DAEMON = 'daemon'
 RUN_MODE = RUN_MODE_DEBUG
 
+# PID файл. Если определен, то в него записывается идентификатор процесса
+PID_FILENAME = None
+
+# Папка файлов блокировок монопольного выполнения.
+# Блокировка захватывается отдельно для каждого файла настроек
+LOCK_DIR = PROFILE_DIR
+
 # Список имен описаний источников данных
 SOURCES = []
 
@@ -58,6 +70,22 @@ QUEUE = []
 # Задержка между тактами режима циклической обработки
 TICK_PERIOD = 300
 
+# Порт HTTP сервера метрик в формате Prometheus.
+# Если не определен, то сервер метрик не запускается
+METRICS_PORT = None
+
+# Время жизни значений тегов в общем кеше нескольких процессов регистраторов в секундах.
+# Если не определено, то общий кеш тегов не используется
+TAG_CACHE_TTL = None
+# Файл общего кеша тегов. Если не определен, то используется файл в /dev/shm
+TAG_CACHE_FILENAME = None
+
+# Папка сохранения статистики профилирования тиков.
+# Если не определена, то профилирование не производится
+PROFILER_DIR = None
+# Количество тиков, статистика которых сохраняется в один файл
+PROFILER_TICKS = 10
+
 # Время начала текущего такта
 TICK_DT_START = datetime.datetime.now()
 # Время окончания текущего такта
@@ -67,6 +95,11 @@ TICK_DT_STOP = datetime.datetime.now()
 # Доступ ко всем объекта осуществляем через этот объект
 ENGINE = None
 
+# Мгновенный снимок конфигурационных переменных.
+# Делается в начале каждого такта и используется как контекст выполнения
+# вместо копирования пространства имен модуля при каждом обращении
+CFG_SNAPSHOT = None
+
 
 def get_cfg_var(sName):
     """
@@ -85,3 +118,29 @@ def set_cfg_var(sName, vValue):
     @param vValue: Значение переменной.
     """
     globals()[sName] = vValue
+    # Снимок конфигурации перестает быть актуальным
+    globals()['CFG_SNAPSHOT'] = None
+
+
+def make_snapshot():
+    """
+    Сделать мгновенный снимок конфигурационных переменных.
+    @return: Словарь снимка конфигурационных переменных.
+    """
+    snapshot = dict(globals())
+    del snapshot['CFG_SNAPSHOT']
+    globals()['CFG_SNAPSHOT'] = snapshot
+    return snapshot
+
+
+def get_cfg_snapshot():
+    """
+    Получить актуальный снимок конфигурационных переменных.
+    Если снимок не актуален, то он создается.
+    ВНИМАНИЕ! Снимок не должен изменяться.
+    @return: Словарь снимка конфигурационных переменных.
+    """
+    snapshot = globals()['CFG_SNAPSHOT']
+    if snapshot is None:
+        snapshot = make_snapshot()
+    return snapshot
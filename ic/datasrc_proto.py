@@ -6,12 +6,13 @@
 """
 
 from ic.utils import log
-from ic.utils import txtgen
-from ic.utils import strfunc
+from ic.utils import metrics
+from ic.utils import tagcache
+from ic import config
 
 from . import obj_proto
 
-__version__ = (0, 0, 5, 3)
+__version__ = (0, 0, 6, 1)
 
 
 class icDataSourceProto(obj_proto.icObjectProto):
@@ -33,6 +34,10 @@ class icDataSourceProto(obj_proto.icObjectProto):
         # Тоже самое для кеширования (кеш сбрасывается в конце каждого такта обработки)
         self.cache_state = None
 
+        # Время жизни значений тегов в общем кеше нескольких процессов регистраторов в секундах.
+        # Если не определено, то используется общая настройка TAG_CACHE_TTL
+        self.tag_cache_ttl = kwargs.get('tag_cache_ttl', None)
+
     def reg_state(self, **values):
         """
         Зарегистрировать значения переменных в словаре внутренного состояния.
@@ -44,21 +49,47 @@ class icDataSourceProto(obj_proto.icObjectProto):
         """
         Вывести в консоль внутренне состояние объекта источника данных.
         Функция сделана для отладки.
+        Если отладочные сообщения не выводятся, то ничего не делается.
         """
-        log.debug(u'Состояние источника данных <%s>.<%s>' % (self.__class__.__name__, self.name))
-        log.debug(u'\t[Переменная]\t\t[Значение]')
-        for name, val in self.state.items():
-            try:
-                val_codepage = strfunc.get_codepage(val) if isinstance(val, str) else txtgen.DEFAULT_ENCODING
-                if val_codepage is None:
-                    val_codepage = txtgen.DEFAULT_ENCODING
+        if not log.is_enabled(log.DEBUG):
+            return
+        self.print_values(u'Состояние источника данных <%s>.<%s>' % (self.__class__.__name__, self.name),
+                          self.state)
 
-                val = unicode(str(val), val_codepage) if not isinstance(val, unicode) else val
-                log.debug(u'\t<%s>\t\t<%s>' % (name, val))
-            except UnicodeDecodeError:
-                log.error(u'Ошибка отображения состояния переменной <%s>' % name)
-            except UnicodeEncodeError:
-                log.error(u'Ошибка отображения состояния переменной <%s>' % name)
+    def get_tag_cache(self):
+        """
+        Общий кеш значений тегов нескольких процессов регистраторов.
+        @return: Объект кеша или None, если общий кеш тегов не используется.
+        """
+        ttl = self.tag_cache_ttl if self.tag_cache_ttl is not None else config.get_cfg_var('TAG_CACHE_TTL')
+        return tagcache.get_tag_cache(ttl, config.get_cfg_var('TAG_CACHE_FILENAME'))
+
+    def get_cached_tags(self, keys):
+        """
+        Получить значения тегов из общего кеша.
+        @param keys: Список ключей тегов.
+        @return: Словарь {Ключ: Значение} найденных в кеше тегов.
+        """
+        tag_cache = self.get_tag_cache()
+        if tag_cache is None:
+            return dict()
+        result = tag_cache.get_many(keys)
+        if result:
+            metrics.inc_counter('tag_cache_hits_total', len(result), object=self.name)
+        if len(keys) > len(result):
+            metrics.inc_counter('tag_cache_misses_total', len(keys) - len(result), object=self.name)
+        return result
+
+    def put_cached_tags(self, values):
+        """
+        Опубликовать прочитанные значения тегов в общем кеше.
+        Не прочитанные значения (None) не публикуются.
+        @param values: Словарь {Ключ: Значение}.
+        """
+        tag_cache = self.get_tag_cache()
+        if tag_cache is None:
+            return
+        tag_cache.put_many(dict([(key, value) for key, value in values.items() if value is not None]))
 
     def clear_state_cache(self):
         """
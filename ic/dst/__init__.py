@@ -4,14 +4,18 @@
 """
 Пакет классов-получателей данных.
 Кроме описания класса он д.б. зарегистрирован в словаре получателей данных.
+Модули получателей данных импортируются только при первом обращении к классу.
+Сторонние получатели данных регистрируются через точки входа группы
+DESTINATIONS_ENTRY_POINT_GROUP.
 """
 
-from . import txt_fmt
-from . import sql_query
-from . import cmd_list
+from ic.utils import plugfunc
 
-DATA_DESTINATIONS = {
-    'TXT_FMT': txt_fmt.icTxtFmtDataDestination,
-    'SQL_DST': sql_query.icSQLQueryDataDestination,
-    'CMD_LIST': cmd_list.icCmdListDataDestination,
-}
+# Группа точек входа сторонних получателей данных
+DESTINATIONS_ENTRY_POINT_GROUP = 'icregistrator.destinations'
+
+DATA_DESTINATIONS = plugfunc.icLazyRegistry({
+    'TXT_FMT': 'ic.dst.txt_fmt:icTxtFmtDataDestination',
+    'SQL_DST': 'ic.dst.sql_query:icSQLQueryDataDestination',
+    'CMD_LIST': 'ic.dst.cmd_list:icCmdListDataDestination',
+}, entry_point_group=DESTINATIONS_ENTRY_POINT_GROUP)
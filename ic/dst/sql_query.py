@@ -10,10 +10,11 @@ from ic.utils import log
 from ic.utils import journal
 from ic.utils import execfunc
 from ic.utils import txtgen
+from ic.utils import metrics
 
 from ic import datadst_proto
 
-__version__ = (0, 0, 2, 1)
+__version__ = (0, 0, 2, 3)
 
 
 class icSQLQueryDataDestination(datadst_proto.icDataDestinationProto):
@@ -39,6 +40,9 @@ class icSQLQueryDataDestination(datadst_proto.icDataDestinationProto):
         self.db_username = kwargs.get('db_username', None)
         # Пароль
         self.db_password = kwargs.get('db_password', None)
+        # Полный конекшн стринг. Если определен, то параметры подключения не используются.
+        # Например sqlite:////tmp/registrator.db
+        self.db_url = kwargs.get('db_url', None)
 
         # SQL выражение для записи данных в приемник
         self.sql = kwargs.get('sql', None)
@@ -50,6 +54,8 @@ class icSQLQueryDataDestination(datadst_proto.icDataDestinationProto):
         Конекшн стринг подключения к БД.
         @return: Конекшн стринг подключения к БД.
         """
+        if self.db_url:
+            return self.db_url
         return '%s://%s:%s@%s:%s/%s' % (self.db_driver, self.db_username, self.db_password,
                                         self.db_host, self.db_port, self.db_name)
 
@@ -147,7 +153,10 @@ class icSQLQueryDataDestination(datadst_proto.icDataDestinationProto):
         try:
             self.connect()
             log.info(u'Выполнение SQL: <%s>' % sql)
-            self.connection.execute(sql)
+            result = self.connection.execute(sql)
+            rowcount = getattr(result, 'rowcount', -1)
+            if rowcount > 0:
+                metrics.inc_counter('rows_written_total', rowcount, object=self.name)
             self.disconnect()
             return True
         except:
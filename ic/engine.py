@@ -8,17 +8,25 @@
 import os
 import os.path
 import time
+import signal
 import datetime
+import threading
+import ast
 from ic import config
 from ic.utils import log
 from ic.utils import keyboardfunc
 from ic.utils import journal
+from ic.utils import execfunc
+from ic.utils import metrics
+from ic.utils import proffunc
+from ic.utils import pidfunc
+from ic.utils import lockfunc
 
 from . import settings
 from . import src
 from . import dst
 
-__version__ = (0, 0, 4, 1)
+__version__ = (0, 0, 6, 8)
 
 # Сигнатура ссылки
 LINK_SIGNATURE = u'link:'
@@ -26,6 +34,93 @@ LINK_SIGNATURE = u'link:'
 # Разделитель ссылки
 LINK_DELIMETER = u'.'
 
+# Период опроса клавиатуры в ожидании следующего такта в секундах
+KEYBOARD_POLL_PERIOD = 0.1
+
+# Максимальное количество разобранных ссылок в кеше.
+# При превышении кеш очищается полностью
+LINK_RESOLVER_CACHE_SIZE = 4096
+
+
+def get_value_count(values):
+    """
+    Количество прочитанных значений.
+    Источники, обрабатывающие пакеты файлов, возвращают по каждой переменной список значений.
+    Не прочитанные значения (None) не учитываются.
+    @param values: Список значений переменных.
+    @return: Количество значений.
+    """
+    count = 0
+    for value in values:
+        if isinstance(value, list):
+            count += len([item for item in value if item is not None])
+        elif value is not None:
+            count += 1
+    return count
+
+
+class icLinkResolver(object):
+    """
+    Разобранная ссылка на внутреннюю переменную/метод объекта.
+    Ссылка разбирается один раз. Получение значения по ссылке -
+    это обращение к словарю состояния объекта или прямой вызов метода.
+    """
+    def __init__(self, link, obj_name, val_name, obj):
+        """
+        Конструктор.
+        @param link: Строковая ссылка без сигнатуры.
+        @param obj_name: Имя объекта.
+        @param val_name: Имя переменной или вызов метода объекта.
+        @param obj: Объект, на который указывает ссылка.
+        """
+        self.link = link
+        self.obj_name = obj_name
+        self.val_name = val_name
+        self.obj = obj
+
+        # Имя переменной состояния объекта
+        self.state_name = None
+        # Вызываемый метод и его аргументы
+        self.func = None
+        self.func_args = ()
+        # Скомпилированное выражение вызова, если аргументы не являются константами
+        self.func_code = None
+
+        val_name = val_name.strip()
+        is_func = u'(' in val_name and u')' in val_name and val_name.endswith(u')')
+        if not is_func:
+            self.state_name = val_name
+            return
+
+        func_name, func_args = val_name[:-1].split(u'(', 1)
+        try:
+            self.func_args = ast.literal_eval(u'(%s,)' % func_args) if func_args.strip() else ()
+            self.func = getattr(obj, func_name.strip())
+        except (ValueError, SyntaxError, AttributeError):
+            # Аргументы - не константы. Выражение вызова компилируется один раз
+            self.func_code = compile(u'obj.%s' % val_name, '<link>', 'eval')
+
+    def resolve(self):
+        """
+        Получить значение по ссылке.
+        @return: Значение внутренней переменной/результат вызова метода или None в случае ошибки.
+        """
+        if self.state_name is not None:
+            # Определение значения переменной
+            value = self.obj.state.get(self.state_name, None)
+            if value is None:
+                log.warning(u'Не найдена переменная <%s> в объекте <%s>' % (self.state_name, self.obj_name))
+            return value
+
+        # Это вызов функции
+        try:
+            if self.func is not None:
+                return self.func(*self.func_args)
+            return eval(self.func_code, globals(), dict(obj=self.obj))
+        except:
+            log.fatal(u'Ошибка вызова метода <%s.%s>' % (self.obj_name, self.val_name))
+        return None
+
 
 class icRegistratorProto(object):
     """
@@ -41,6 +136,23 @@ class icRegistratorProto(object):
         # Словарь зарегистрированных объектов
         self.objects = dict()
 
+        # Кеш разобранных ссылок {Строковая ссылка: Объект icLinkResolver}.
+        # Очищается в начале каждого такта, т.к. объекты пересоздаются
+        self.link_resolvers = dict()
+
+        # Полное имя загруженного файла настроек и
+        # его атрибуты (время модификации, размер) на момент загрузки
+        self.settings_filename = None
+        self.settings_key = None
+
+        # Профилировщик тиков. Создается, если задана папка статистики профилирования
+        self.profiler = None
+
+        # Запрос завершения цикла обработки. Устанавливается по сигналу или по <ESC>
+        self.stop_event = threading.Event()
+        # Запрос перезагрузки настроек. Устанавливается по сигналу SIGHUP
+        self.reload_request = False
+
         # После создания объекта прописываем его в конфиге для доступа из прикладного функционала
         config.set_cfg_var('ENGINE', self)
 
@@ -53,7 +165,63 @@ class icRegistratorProto(object):
         if ini_filename and not os.path.exists(ini_filename):
             log.warning(u'Файл настроек <%s> не найден. Используется файл настроек по умолчанию' % ini_filename)
             ini_filename = None
-        return self.settings_manager.loadSettings(ini_filename)
+        self.settings_filename = ini_filename or self.settings_manager.genINIFileName()
+        self.settings_key = self.get_settings_key()
+        return self.settings_manager.loadSettings(self.settings_filename)
+
+    def get_settings_key(self):
+        """
+        Атрибуты файла настроек для контроля его изменения.
+        @return: Кортеж (время модификации, размер) или None, если файл не доступен.
+        """
+        try:
+            settings_stat = os.stat(self.settings_filename)
+            return settings_stat.st_mtime, settings_stat.st_size
+        except (OSError, TypeError):
+            return None
+
+    def reload_settings(self, force=False):
+        """
+        Перезагрузить настройки, если файл настроек изменился.
+        Вызывается на границе тиков. Объекты создаются заново в каждом тике,
+        поэтому новые настройки вступают в силу со следующего тика.
+        Если новые настройки не удалось загрузить, то продолжают
+        действовать прежние настройки.
+        @param force: Перезагрузить настройки, даже если файл не изменился.
+        @return: True - настройки перезагружены / False - настройки не изменились или ошибка.
+        """
+        settings_key = self.get_settings_key()
+        if settings_key is None or (settings_key == self.settings_key and not force):
+            return False
+        self.settings_key = settings_key
+
+        log.info(u'Перезагрузка настроек из файла <%s>' % self.settings_filename)
+        cfg_names = ('SOURCES', 'DESTINATIONS', 'QUEUE', 'RUN_MODE', 'TICK_PERIOD')
+        prev_cfg = dict([(cfg_name, config.get_cfg_var(cfg_name)) for cfg_name in cfg_names])
+        try:
+            result = self.settings_manager.loadSettings(self.settings_filename)
+        except:
+            log.fatal(u'Ошибка перезагрузки настроек из файла <%s>' % self.settings_filename)
+            result = False
+
+        if not result:
+            log.warning(u'Продолжают действовать прежние настройки')
+            for cfg_name, value in prev_cfg.items():
+                config.set_cfg_var(cfg_name, value)
+            return False
+
+        prev_sections = dict([(section['name'], section) for section in prev_cfg['SOURCES'] + prev_cfg['DESTINATIONS']])
+        sections = dict([(section['name'], section) for section in config.SOURCES + config.DESTINATIONS])
+        added_names = [name for name in sections if name not in prev_sections]
+        removed_names = [name for name in prev_sections if name not in sections]
+        changed_names = [name for name in sections if name in prev_sections and sections[name] != prev_sections[name]]
+        msg = u'Перезагрузка настроек. Добавлены: %s. Удалены: %s. Изменены: %s' % (added_names, removed_names,
+                                                                                      changed_names)
+        log.info(msg)
+        journal.write_msg(msg)
+        if config.get_cfg_var('RUN_MODE') != prev_cfg['RUN_MODE']:
+            log.warning(u'Изменение режима запуска вступит в силу только после перезапуска регистратора')
+        return True
 
     def reg_object(self, obj):
         """
@@ -150,21 +318,49 @@ class icRegistratorProto(object):
             return None
 
         # Сначала проверяем является ли объект источником данных
-        if type_name in src.DATA_SOURCES:
+        if self.is_src_type(type_name):
             return self.create_src(**properties)
         # Сначала проверяем является ли объект источником данных
-        if type_name in dst.DATA_DESTINATIONS:
+        if self.is_dst_type(type_name):
             return self.create_dst(**properties)
         log.warning(u'Тип <%s> объекта <%s> не зарегистрирован среди источнико или приемников данных' % (type_name, name))
         return None
 
+    def is_src_type(self, type_name):
+        """
+        Проверка является ли тип типом источника данных.
+        Точки входа сторонних пакетов просматриваются, только если тип
+        не найден среди встроенных типов источников и приемников данных.
+        @param type_name: Имя типа.
+        @return: True/False.
+        """
+        if src.DATA_SOURCES.has_builtin(type_name):
+            return True
+        if dst.DATA_DESTINATIONS.has_builtin(type_name):
+            return False
+        return type_name in src.DATA_SOURCES
+
+    def is_dst_type(self, type_name):
+        """
+        Проверка является ли тип типом приемника данных.
+        Точки входа сторонних пакетов просматриваются, только если тип
+        не найден среди встроенных типов источников и приемников данных.
+        @param type_name: Имя типа.
+        @return: True/False.
+        """
+        if dst.DATA_DESTINATIONS.has_builtin(type_name):
+            return True
+        if src.DATA_SOURCES.has_builtin(type_name):
+            return False
+        return type_name in dst.DATA_DESTINATIONS
+
     def is_link(self, value):
         """
         Проверка является ли значение ссылкой.
         @param value: Проверяемое значение.
         @return: True - это ссылка, False - нет.
         """
-        return type(value) in (str, unicode) and value.lower().startswith(LINK_SIGNATURE)
+        return type(value) in (str, unicode) and value[:len(LINK_SIGNATURE)].lower() == LINK_SIGNATURE
 
     def is_link_func(self, link):
         """
@@ -172,7 +368,7 @@ class icRegistratorProto(object):
         @param link: Строковая ссылка.
         @return: True - да это вызов функции. False - это вызов переменной
         """
-        obj_name, val_name = link.split(LINK_DELIMETER)
+        obj_name, val_name = link.split(LINK_DELIMETER, 1)
         return u'(' in val_name and u')' in val_name and val_name.strip().endswith(u')')
 
     def get_value_by_link(self, link):
@@ -183,38 +379,48 @@ class icRegistratorProto(object):
             ИМЯ_ОБЪЕКТА.имя_функции(аргументы функции).
         @return: Значение внутренней переменной или None если по этой ссылке переменная или объект не найдены.
         """
-        if link.startswith(LINK_SIGNATURE):
-            # Убрать сигнатуру из обработки
-            link = link[len(LINK_SIGNATURE):].strip()
-
         try:
-            # Разделяем ссылку на имя объекта и имя переменной
-            obj_name, val_name = link.split(LINK_DELIMETER)
-
-            # Определение объекта
-            obj = self.objects.get(obj_name, None)
-            if obj is None:
-                log.warning(u'Не найден объект <%s> среди зарегистрированных' % obj_name)
+            resolver = self.get_link_resolver(link)
+            if resolver is None:
                 return None
-
-            if not self.is_link_func(link):
-                # Определение значения переменной
-                value = obj.state.get(val_name, None)
-                if value is None:
-                    log.warning(u'Не найдена переменная <%s> в объекте <%s>' % (val_name, obj_name))
-                    return None
-            else:
-                # Это вызов функции
-                value = None
-                try:
-                    value = eval(u'obj.%s' % val_name)
-                except:
-                    log.fatal(u'Ошибка вызова метода <%s.%s>' % (obj_name, val_name))
-            return value
+            return resolver.resolve()
         except:
             log.fatal(u'Ошибка получения значения внутренней переменной по ссылке <%s>' % link)
         return None
 
+    def get_link_resolver(self, link):
+        """
+        Получить разобранную ссылку.
+        Ссылки разбираются один раз и кешируются.
+        Т.к. объекты пересоздаются каждый такт, то разобранная ссылка
+        считается актуальной только пока она указывает на зарегистрированный объект.
+        @param link: Строковая ссылка.
+        @return: Объект icLinkResolver или None если объект ссылки не найден.
+        """
+        resolver = self.link_resolvers.get(link, None)
+        if resolver is not None and self.objects.get(resolver.obj_name, None) is resolver.obj:
+            return resolver
+
+        link_path = link
+        if link_path.startswith(LINK_SIGNATURE):
+            # Убрать сигнатуру из обработки
+            link_path = link_path[len(LINK_SIGNATURE):].strip()
+
+        # Разделяем ссылку на имя объекта и имя переменной
+        obj_name, val_name = link_path.split(LINK_DELIMETER, 1)
+
+        # Определение объекта
+        obj = self.objects.get(obj_name, None)
+        if obj is None:
+            log.warning(u'Не найден объект <%s> среди зарегистрированных' % obj_name)
+            return None
+
+        resolver = icLinkResolver(link_path, obj_name, val_name, obj)
+        if len(self.link_resolvers) >= LINK_RESOLVER_CACHE_SIZE:
+            self.link_resolvers.clear()
+        self.link_resolvers[link] = resolver
+        return resolver
+
 
 class icRegistrator(icRegistratorProto):
     """
@@ -252,10 +458,15 @@ class icRegistrator(icRegistratorProto):
         @param n_tick: Номер текущего тика.
         @return: True/False.
         """
+        start_time = time.time()
         try:
             config.set_cfg_var('TICK_DT_START', datetime.datetime.now())
+            # Один снимок конфигурации на весь такт для контекстов выполнения
+            config.make_snapshot()
             # ВНИМАНИЕ! Необходимо с начале каждого тика надо создавать объекты
             # чтобы не контролировать актуальность их состояния
+            # Разобранные ссылки предыдущего такта указывают на старые объекты
+            self.link_resolvers.clear()
             log.info(u'Создание объектов...')
             src_objects = list()
             for properties in config.SOURCES:
@@ -275,13 +486,9 @@ class icRegistrator(icRegistratorProto):
                 log.info(u'Начало обработки...')
                 journal.write_msg(u'Начало обработки...')
                 for src_object in src_objects:
-                    log.info(u'Чтение данных из <%s>' % src_object.name)
-                    journal.write_msg(u'\tЧтение данных из <%s>' % src_object.description)
-                    src_object.read_as_dict()
+                    self.read_object(src_object)
                 for dst_object in dst_objects:
-                    log.info(u'Запись данных в <%s>' % dst_object.name)
-                    journal.write_msg(u'\tЗапись данных в <%s>' % dst_object.description)
-                    dst_object.write_as_dict()
+                    self.write_object(dst_object)
                 log.info(u'...Конец обработки [%d]' % n_tick)
                 journal.write_msg(u'...Конец обработки')
             else:
@@ -293,16 +500,12 @@ class icRegistrator(icRegistratorProto):
                     obj = self.find_object(obj_name)
                     if obj:
                         obj_type = obj_properties['type']
-                        if obj_type in src.DATA_SOURCES.keys():
+                        if self.is_src_type(obj_type):
                             # Это источник данных
-                            log.info(u'Чтение данных из <%s>' % obj.name)
-                            journal.write_msg(u'\tЧтение данных из <%s>' % obj.description)
-                            obj.read_as_dict()
-                        elif obj_type in dst.DATA_DESTINATIONS.keys():
+                            self.read_object(obj)
+                        elif self.is_dst_type(obj_type):
                             # Это получатель данных
-                            log.info(u'Запись данных в <%s>' % obj.name)
-                            journal.write_msg(u'\tЗапись данных в <%s>' % obj.description)
-                            obj.write_as_dict()
+                            self.write_object(obj)
                         else:
                             # Вообще не определенный тип
                             log.warning(u'Не поддерживаемый тип <%s> объекта <%s>' % (obj_type, obj_name))
@@ -312,11 +515,104 @@ class icRegistrator(icRegistratorProto):
             # Сбросить кеш состояния в конце такта
             # obj_list = src_objects + dst_objects
             # self.clear_all_state_chaches(*obj_list)
-            return True
+            result = True
         except:
             log.fatal(u'Ошибка выполнения тика [%d]' % n_tick)
+            metrics.inc_counter('tick_errors_total')
+            result = False
+        # Записать накопленные за такт сообщения журнала
+        journal.flush()
+
+        tick_time = time.time() - start_time
+        metrics.add_timing('tick_seconds', tick_time)
+        metrics.inc_counter('ticks_total')
+        tick_period = config.get_cfg_var('TICK_PERIOD')
+        if config.get_cfg_var('RUN_MODE') in (config.RUN_MODE_LOOP, config.RUN_MODE_DAEMON) and \
+                0 < tick_period < tick_time:
+            log.warning(u'Время выполнения тика [%d] <%.3f> сек. превышает период цикла обработки <%s> сек.',
+                        n_tick, tick_time, tick_period, bForcePrint=True)
+        return result
+
+    def read_object(self, obj):
+        """
+        Чтение данных из объекта источника данных с регистрацией времени чтения.
+        @param obj: Объект источника данных.
+        @return: Результат чтения.
+        """
+        log.info(u'Чтение данных из <%s>' % obj.name)
+        journal.write_msg(u'\tЧтение данных из <%s>' % obj.description)
+        start_time = time.time()
+        result = obj.read_as_dict()
+        metrics.add_timing('object_seconds', time.time() - start_time, object=obj.name, operation='read')
+        if result is None:
+            metrics.inc_counter('read_errors_total', object=obj.name)
+        elif isinstance(result, dict):
+            metrics.inc_counter('values_read_total', get_value_count(result.values()), object=obj.name)
+        return result
+
+    def write_object(self, obj):
+        """
+        Запись данных в объект получателя данных с регистрацией времени записи.
+        @param obj: Объект получателя данных.
+        @return: Результат записи.
+        """
+        log.info(u'Запись данных в <%s>' % obj.name)
+        journal.write_msg(u'\tЗапись данных в <%s>' % obj.description)
+        start_time = time.time()
+        result = obj.write_as_dict()
+        metrics.add_timing('object_seconds', time.time() - start_time, object=obj.name, operation='write')
+        if not result:
+            metrics.inc_counter('write_errors_total', object=obj.name)
+        return result
+
+    def start_metrics_server(self):
+        """
+        Запустить HTTP сервер метрик, если определен его порт.
+        @return: True - сервер запущен / False - сервер не запускается или ошибка.
+        """
+        port = config.get_cfg_var('METRICS_PORT')
+        if not port:
+            return False
+        metrics.register_gauge_callback('async_queue_size', execfunc.get_async_queue_size)
+        metrics.register_gauge_callback('log_queue_size', log.get_queue_size)
+        metrics.register_gauge_callback('tick_period_seconds', lambda: config.get_cfg_var('TICK_PERIOD'))
+        return metrics.start_http_server(port)
+
+    def do_tick(self, n_tick=1):
+        """
+        Выполнить тик.
+        Если включено профилирование, то тик выполняется под профилировщиком.
+        @param n_tick: Номер текущего тика.
+        @return: True/False.
+        """
+        if self.profiler is not None:
+            return self.profiler.run(n_tick, self.run_tick, n_tick)
+        return self.run_tick(n_tick)
+
+    def start_profiler(self):
+        """
+        Включить профилирование тиков, если задана папка статистики профилирования.
+        @return: True - профилирование включено / False - нет.
+        """
+        profiler_dir = config.get_cfg_var('PROFILER_DIR')
+        if not profiler_dir:
+            return False
+        try:
+            self.profiler = proffunc.icTickProfiler(profiler_dir, config.get_cfg_var('PROFILER_TICKS'))
+            log.info(u'Профилирование тиков включено. Папка статистики <%s>' % profiler_dir)
+            return True
+        except:
+            log.fatal(u'Ошибка включения профилирования тиков')
         return False
 
+    def stop_profiler(self):
+        """
+        Завершить профилирование тиков.
+        """
+        if self.profiler is not None:
+            self.profiler.close()
+            self.profiler = None
+
     def run(self, mode=None):
         """
         Основная процедура запуска регистрации.
@@ -329,42 +625,20 @@ class icRegistrator(icRegistratorProto):
         if mode is None:
             mode = config.get_cfg_var('RUN_MODE')
 
+        self.start_profiler()
+
         if mode == config.RUN_MODE_SINGLE:
             # Одноразовый запуск
-            self.run_tick()
+            self.do_tick()
             config.set_cfg_var('TICK_DT_STOP', datetime.datetime.now())
 
         elif mode == config.RUN_MODE_LOOP:
             # Запуск регистратора в цикле
+            self.run_loop(use_keyboard=keyboardfunc.is_tty())
 
-            # Запуск цикла обработки
-            do_exit = False
-            tick = config.get_cfg_var('TICK_PERIOD')
-            log.info(u'Период цикла обработки: <%d>...' % tick)
-            i_tick = 1
-            while not do_exit:
-                start_tick = time.time()
-                end_tick = start_tick + tick
-
-                self.run_tick(i_tick)
-
-                if tick > 0:
-                    log.warning(u'Для выхода нажмите <ESC>')
-                    cur_time = time.time()
-                    while end_tick > cur_time:
-                        ch_key = keyboardfunc.getchAsync()
-                        if keyboardfunc.same_key(ch_key, keyboardfunc.ESC_KEY):
-                            do_exit = True
-                            log.info(u'Выход из цикла обработки')
-                            break
-                        cur_time = time.time()
-                        # log.debug(u'test tick %d : %d' % (cur_time, end_tick))
-                else:
-                    log.warning(u'Для выхода нажмите <Ctrl+C>')
-
-                config.set_cfg_var('TICK_DT_STOP', datetime.datetime.now())
-                log.info(u'...Конец периода цикла обработки [%d]' % i_tick)
-                i_tick += 1
+        elif mode == config.RUN_MODE_DAEMON:
+            # Запуск регистратора в режиме службы
+            self.run_daemon()
 
         elif mode == config.RUN_MODE_SRC_DIAGNOSTIC:
             # Запуск регистратора в режиме диагностики источников данных
@@ -383,8 +657,151 @@ class icRegistrator(icRegistratorProto):
                     log.info(u'Результат чтения данных из контроллера %s' % result)
         else:
             log.warning(u'Режим запуска регистратра <%s> не поддерживается системой' % mode)
+
+        # Перед завершением дождаться выполнения фоновых блоков кода
+        execfunc.wait_async_code_blocks()
+        self.stop_profiler()
+        metrics.log_summary()
+        journal.flush()
+        log.flush()
         return False
 
+    def request_stop(self, signum=None, frame=None):
+        """
+        Запросить завершение цикла обработки.
+        Текущий такт при этом выполняется до конца.
+        Используется как обработчик сигналов SIGTERM/SIGINT.
+        """
+        log.info(u'Запрос завершения цикла обработки%s' % (u' по сигналу <%s>' % signum if signum else u''))
+        self.stop_event.set()
+
+    def request_reload(self, signum=None, frame=None):
+        """
+        Запросить перезагрузку настроек перед следующим тактом.
+        Используется как обработчик сигнала SIGHUP.
+        """
+        log.info(u'Запрос перезагрузки настроек%s' % (u' по сигналу <%s>' % signum if signum else u''))
+        self.reload_request = True
+
+    def install_signal_handlers(self, stop_signals=('SIGTERM',), reload_signals=('SIGHUP',)):
+        """
+        Установить обработчики сигналов управления циклом обработки.
+        Сигналы, не поддерживаемые платформой, пропускаются.
+        Сигналы не прерывают системные вызовы (чтение OPC, SQL, файлов),
+        чтобы текущий такт был выполнен до конца.
+        @param stop_signals: Имена сигналов завершения.
+        @param reload_signals: Имена сигналов перезагрузки настроек.
+        """
+        for signal_names, handler in ((stop_signals, self.request_stop), (reload_signals, self.request_reload)):
+            for signal_name in signal_names:
+                if hasattr(signal, signal_name):
+                    signum = getattr(signal, signal_name)
+                    signal.signal(signum, handler)
+                    if hasattr(signal, 'siginterrupt'):
+                        signal.siginterrupt(signum, False)
+
+    def wait_next_tick(self, end_tick, use_keyboard=False):
+        """
+        Ожидание начала следующего такта.
+        Ожидание прерывается запросом завершения цикла обработки.
+        @param end_tick: Время начала следующего такта.
+        @param use_keyboard: Завершать цикл обработки по нажатию <ESC>?
+            Клавиатура опрашивается только при наличии терминала.
+        """
+        while not self.stop_event.is_set():
+            timeout = end_tick - time.time()
+            if timeout <= 0:
+                break
+            if not use_keyboard:
+                self.stop_event.wait(timeout)
+                break
+            ch_key = keyboardfunc.getchAsync()
+            if keyboardfunc.same_key(ch_key, keyboardfunc.ESC_KEY):
+                log.info(u'Выход из цикла обработки')
+                self.stop_event.set()
+                break
+            self.stop_event.wait(min(timeout, KEYBOARD_POLL_PERIOD))
+
+    def run_loop(self, use_keyboard=True):
+        """
+        Цикл обработки.
+        @param use_keyboard: Завершать цикл обработки по нажатию <ESC>?
+        """
+        self.start_metrics_server()
+        self.stop_event.clear()
+
+        tick = config.get_cfg_var('TICK_PERIOD')
+        log.info(u'Период цикла обработки: <%d>...' % tick)
+        i_tick = 1
+        while not self.stop_event.is_set():
+            if i_tick > 1:
+                is_reload_request = self.reload_request
+                self.reload_request = False
+                if self.reload_settings(force=is_reload_request):
+                    tick = config.get_cfg_var('TICK_PERIOD')
+                    log.info(u'Период цикла обработки: <%d>...' % tick)
+
+            start_tick = time.time()
+            end_tick = start_tick + tick
+
+            self.do_tick(i_tick)
+
+            if tick > 0:
+                if use_keyboard:
+                    log.warning(u'Для выхода нажмите <ESC>')
+                self.wait_next_tick(end_tick, use_keyboard)
+            elif use_keyboard:
+                log.warning(u'Для выхода нажмите <Ctrl+C>')
+
+            config.set_cfg_var('TICK_DT_STOP', datetime.datetime.now())
+            log.info(u'...Конец периода цикла обработки [%d]' % i_tick)
+            i_tick += 1
+
+    def run_daemon(self):
+        """
+        Цикл обработки в режиме службы.
+        Консоль не используется. Управление производится сигналами:
+            SIGTERM/SIGINT - завершение после окончания текущего такта;
+            SIGHUP - перезагрузка настроек перед следующим тактом.
+        Если определен PID файл, то на время работы в него записывается идентификатор процесса.
+        На все время работы захватывается блокировка, соответствующая PID файлу,
+        поэтому одновременно запущенные службы не могут использовать один PID файл.
+        Файл блокировки не удаляется, поэтому PID файл создается и удаляется
+        только владельцем блокировки.
+        @return: True/False.
+        """
+        pid_filename = config.get_cfg_var('PID_FILENAME')
+        pid_lock = None
+        if pid_filename:
+            pid_lock = lockfunc.icFileLock(lockfunc.get_lock_filename(pid_filename, config.get_cfg_var('LOCK_DIR'),
+                                                                      'icregistrator_pid_'))
+            if not pid_lock.acquire():
+                running_pid = pidfunc.get_running_pid(pid_filename) or pid_lock.get_owner_pid()
+                msg = u'Регистратор уже запущен. PID <%s>. PID файл <%s>' % (running_pid, pid_filename)
+                log.error(msg)
+                journal.write_msg(msg)
+                return False
+            if not pidfunc.write_pidfile(pid_filename):
+                pid_lock.release()
+                return False
+
+        self.install_signal_handlers(stop_signals=('SIGTERM', 'SIGINT'))
+        msg = u'Регистратор запущен в режиме службы. PID <%d>' % os.getpid()
+        log.info(msg)
+        journal.write_msg(msg)
+        try:
+            self.run_loop(use_keyboard=False)
+        finally:
+            msg = u'Регистратор остановлен'
+            log.info(msg)
+            journal.write_msg(msg)
+            if pid_lock is not None:
+                # PID файл удаляется до освобождения блокировки.
+                # Другая служба может записать свой PID файл только после освобождения
+                pidfunc.remove_pidfile(pid_filename)
+                pid_lock.release()
+        return True
+
     def do_diagnostic(self, property_obj_list):
         """
         Произвести диагностику объектов.
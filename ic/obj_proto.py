@@ -9,11 +9,21 @@
 from ic.utils import execfunc
 from ic.utils import txtgen
 from ic.utils import strfunc
+from ic.utils import ctxfunc
 
 from . import config
 from ic.utils import log
 
-__version__ = (0, 0, 5, 2)
+__version__ = (0, 0, 6, 6)
+
+# Максимальное количество переменных при отладочном выводе состояния
+PRINT_MAX_ITEMS = 50
+# Максимальная длина значения переменной при отладочном выводе состояния
+PRINT_MAX_VALUE_LEN = 256
+
+# Признак вычисляемого в данный момент значения.
+# Используется для обнаружения циклических ссылок между переменными
+_IN_PROGRESS = object()
 
 
 class icObjectProto(object):
@@ -93,56 +103,113 @@ class icObjectProto(object):
     def get_context(self, state=None):
         """
         Определение контекста выполнения.
+        Контекст состоит из слоя состояния поверх снимка глобального конфига.
+        Слои не копируются. Изменения контекста попадают только в его локальный слой.
         @param state: Словарь состояния.
         @return: Словарь контекста выполнения.
         """
-        context = dict()
-        if state is None:
-            state = dict()
-        context.update(state)
-        # Берем из глобального конфига
-        context.update(dict([(name, config.get_cfg_var(name)) for name in config.__dict__.keys()]))
-        return context
+        return ctxfunc.icLayeredContext(state, config.get_cfg_snapshot())
 
-    def gen_correct_value(self, value, cur_state=None):
+    def gen_correct_value(self, value, cur_state=None, memo=None):
         """
         Генерация значения с учетом порядка блоков кодов и ссылок.
         @param value: Генерируемое значение.
         @param cur_state: Текущее состояние объекта.
+        @param memo: Словарь уже вычисленных значений переменных состояния.
+            Каждая переменная вычисляется только один раз.
         @return: Признак произведенной замены, Сгенерированное значение.
         """
         if cur_state is None:
             cur_state = dict([(name, getattr(self, name)) for name in self.values])
+        if memo is None:
+            memo = dict()
 
         if txtgen.is_genered(value):
             replace_names = txtgen.get_raplace_names(value)
             replaces = dict()
             for name in replace_names:
+                if name in replaces:
+                    continue
                 if name not in cur_state:
                     log.error(u'Переменная <%s> не определена в описании объекта <%s>' % (name, self.name))
                     continue
-                is_fill, replaces[name] = self.gen_correct_value(cur_state[name], cur_state)
-                log.debug(u'\tЗамена <%s> => <%s> => <%s>' % (name, cur_state[name], replaces[name]))
+                replaces[name] = self._get_memo_value(name, cur_state, memo)
             value = txtgen.gen(value, replaces)
             if self.parent.is_link(value):
                 # Это просто ссылка без требования генерации
                 value = self.parent.get_value_by_link(value)
             elif execfunc.is_code_python(value) or execfunc.is_code_func(value):
-                # Это просто блок кода без требования генерации
-                value = execfunc.exec_code_block(value)
+                # Это блок кода, полученный автозаменой.
+                # Его текст зависит от значений замен, поэтому он не кешируется
+                value = execfunc.exec_code_block(value, cur_state, use_cache=False)
             return True, value
-        elif self.parent.is_link(value) and not txtgen.is_genered(value):
+        elif self.parent.is_link(value):
             # Это просто ссылка без требования генерации
             return True, self.parent.get_value_by_link(value)
-        elif (execfunc.is_code_python(value) or execfunc.is_code_func(value)) and not txtgen.is_genered(value):
+        elif execfunc.is_code_python(value) or execfunc.is_code_func(value):
             # Это просто блок кода без требования генерации
-            return True, execfunc.exec_code_block(value)
+            return True, execfunc.exec_code_block(value, cur_state)
 
         return False, value
 
+    def _get_memo_value(self, name, cur_state, memo):
+        """
+        Получить вычисленное значение переменной состояния.
+        Если переменная еще не вычислена, то она вычисляется и запоминается.
+        @param name: Имя переменной.
+        @param cur_state: Текущее состояние объекта.
+        @param memo: Словарь уже вычисленных значений переменных состояния.
+        @return: Вычисленное значение переменной.
+        """
+        value = memo.get(name, None)
+        if value is _IN_PROGRESS:
+            log.error(u'Циклическая ссылка на переменную <%s> в описании объекта <%s>' % (name, self.name))
+            return cur_state[name]
+        elif name in memo:
+            return value
+
+        memo[name] = _IN_PROGRESS
+        is_fill, value = self.gen_correct_value(cur_state[name], cur_state, memo)
+        memo[name] = value
+        return value
+
+    def sort_state_names(self, cur_state):
+        """
+        Упорядочить имена переменных состояния по зависимостям.
+        Зависимости определяются по именам автозамен в значениях переменных.
+        @param cur_state: Текущее состояние объекта.
+        @return: Кортеж (Список имен в порядке вычисления, Список имен с циклическими зависимостями).
+        """
+        # Зависимости {Имя переменной: Множество имен переменных от которых она зависит}
+        depends = dict()
+        # Обратные зависимости {Имя переменной: Список имен зависящих от нее переменных}
+        dependents = dict([(name, list()) for name in cur_state])
+        for name, value in cur_state.items():
+            if txtgen.is_genered(value):
+                depends[name] = set([replace_name for replace_name in txtgen.get_raplace_names(value)
+                                     if replace_name in cur_state])
+            else:
+                depends[name] = set()
+            for depend_name in depends[name]:
+                dependents[depend_name].append(name)
+
+        # Топологическая сортировка
+        ready_names = [name for name, depend_names in depends.items() if not depend_names]
+        order = list()
+        while ready_names:
+            name = ready_names.pop()
+            order.append(name)
+            for dependent_name in dependents[name]:
+                depends[dependent_name].discard(name)
+                if not depends[dependent_name]:
+                    ready_names.append(dependent_name)
+        cyclic_names = [name for name, depend_names in depends.items() if depend_names]
+        return order, cyclic_names
+
     def fill_state(self, cur_state=None):
         """
         Функция полного заполнения сстояния объекта.
+        Переменные вычисляются в порядке зависимостей и каждая только один раз.
         @param cur_state: Текущее заполняемое состояние объекта.
             Если не определено, то текущее состояние заполняется по всем переменным.
         @return: Заполненный словарь состояний.
@@ -150,13 +217,16 @@ class icObjectProto(object):
         if cur_state is None:
             cur_state = dict([(name, getattr(self, name)) for name in self.values])
 
-        is_fill = False
-        for name, value in cur_state.items():
-            is_fill, value = self.gen_correct_value(value, cur_state)
-            cur_state[name] = value
-        if is_fill:
-            # Продолжить генерацию значений
-            return self.fill_state(cur_state)
+        order, cyclic_names = self.sort_state_names(cur_state)
+        if cyclic_names:
+            log.error(u'Циклические зависимости переменных %s в описании объекта <%s>' % (cyclic_names, self.name))
+
+        memo = dict()
+        # Переменные с циклическими зависимостями вычисляются последними.
+        # При обнаружении цикла вместо значения подставляется его исходное описание
+        for name in order + cyclic_names:
+            self._get_memo_value(name, cur_state, memo)
+        cur_state.update(memo)
         return cur_state
 
     def gen_code(self, code, context=None):
@@ -202,18 +272,37 @@ class icObjectProto(object):
         """
         Вывести в консоль внутренне состояние объекта источника данных.
         Функция сделана для отладки.
+        Если отладочные сообщения не выводятся, то ничего не делается.
+        """
+        if not log.is_enabled(log.DEBUG):
+            return
+        self.print_values(u'Состояние контекста <%s>.<%s>' % (self.__class__.__name__, self.name), context)
+
+    def print_values(self, title, values):
         """
-        log.debug(u'Состояние контекста <%s>.<%s>' % (self.__class__.__name__, self.name))
+        Вывести в консоль словарь переменных.
+        Количество выводимых переменных и длина значений ограничены.
+        @param title: Заголовок.
+        @param values: Словарь переменных.
+        """
+        log.debug(title)
         log.debug(u'\t[Переменная]\t\t[Значение]')
-        for name, val in context.items():
+        names = sorted(values.keys())
+        for name in names[:PRINT_MAX_ITEMS]:
+            val = values.get(name)
             try:
-                val_codepage = strfunc.get_codepage(val) if isinstance(val, str) else txtgen.DEFAULT_ENCODING
-                if val_codepage is None:
-                    val_codepage = txtgen.DEFAULT_ENCODING
-
-                val = unicode(str(val), val_codepage) if not isinstance(val, unicode) else val
-                log.debug(u'\t<%s>\t\t<%s>' % (name, val))
+                if isinstance(val, str):
+                    val = val[:PRINT_MAX_VALUE_LEN]
+                    val_codepage = strfunc.get_codepage(val)
+                    val = unicode(val, val_codepage or txtgen.DEFAULT_ENCODING, 'replace')
+                elif not isinstance(val, unicode):
+                    val = unicode(str(val), txtgen.DEFAULT_ENCODING, 'replace')
+                if len(val) > PRINT_MAX_VALUE_LEN:
+                    val = val[:PRINT_MAX_VALUE_LEN] + u'...'
+                log.debug(u'\t<%s>\t\t<%s>', name, val)
             except UnicodeDecodeError:
                 log.error(u'Ошибка отображения состояния переменной <%s>' % name)
             except UnicodeEncodeError:
                 log.error(u'Ошибка отображения состояния переменной <%s>' % name)
+        if len(names) > PRINT_MAX_ITEMS:
+            log.debug(u'\t... и еще <%d> переменных', len(names) - PRINT_MAX_ITEMS)
@@ -7,14 +7,46 @@
 
 import os
 import os.path
-import copy
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
 
 from ic.utils import log
 from ic.utils import ini
 from ic.utils import utils
 from ic import config
 
-__version__ = (0, 0, 1, 2)
+__version__ = (0, 0, 2, 4)
+
+# Расширение файла кеша собранных настроек.
+# Файл кеша располагается рядом с INI файлом
+SETTINGS_CACHE_FILE_EXT = '.cache'
+
+# Имена собираемых списков секций: (Параметр секции OPTIONS, Имя переменной конфигурации)
+SECTION_LISTS = (('sources', 'SOURCES'),
+                 ('destinations', 'DESTINATIONS'),
+                 ('queue', 'QUEUE'))
+
+
+def copy_section(section):
+    """
+    Копия словаря секции.
+    Значения-списки и словари (values, sources и т.п.) тоже копируются,
+    чтобы изменение описания одного объекта не затрагивало
+    описания других объектов, собранных из той же секции.
+    @param section: Словарь секции.
+    @return: Копия словаря секции.
+    """
+    result = dict()
+    for name, value in section.items():
+        if isinstance(value, list):
+            value = list(value)
+        elif isinstance(value, dict):
+            value = dict(value)
+        result[name] = value
+    return result
 
 
 class icSettingsManager(object):
@@ -61,19 +93,37 @@ class icSettingsManager(object):
             sINIFileName = self.genINIFileName()
 
         if os.path.exists(sINIFileName):
-            settings = ini.INI2Dict(sINIFileName)
-            settings = ini.toUnicodeINIValues(settings)
-            if settings:
-                # Инициализация переменных настроек
-                self.loadSectionList(settings, 'OPTIONS', 'sources', 'SOURCES')
-                self.loadSectionList(settings, 'OPTIONS', 'destinations', 'DESTINATIONS')
-                self.loadSectionList(settings, 'OPTIONS', 'queue', 'QUEUE')
+            cache = self.loadSettingsCache(sINIFileName)
+            if cache is not None:
+                settings = cache['settings']
+                for cfg_name, cfg_sections in cache['sections'].items():
+                    config.set_cfg_var(cfg_name, cfg_sections)
+            else:
+                settings = ini.INI2Dict(sINIFileName)
+                settings = ini.toUnicodeINIValues(settings)
+                if settings:
+                    # Инициализация переменных настроек
+                    memo = dict()
+                    sections = dict()
+                    for name, cfg_name in SECTION_LISTS:
+                        sections[cfg_name] = self.loadSectionList(settings, 'OPTIONS', name, cfg_name, memo)
+                    self.saveSettingsCache(sINIFileName, dict(settings=settings, sections=sections))
 
+            if settings:
                 if 'run_mode' in settings.get('OPTIONS', dict()):
                     config.set_cfg_var('RUN_MODE', settings.get('OPTIONS', dict()).get('run_mode', 'debug'))
 
                 config.set_cfg_var('TICK_PERIOD', settings.get('OPTIONS', dict()).get('tick', 300))
 
+                if 'metrics_port' in settings.get('OPTIONS', dict()):
+                    config.set_cfg_var('METRICS_PORT', settings.get('OPTIONS', dict()).get('metrics_port', None))
+
+                if 'tag_cache_ttl' in settings.get('OPTIONS', dict()):
+                    config.set_cfg_var('TAG_CACHE_TTL', settings.get('OPTIONS', dict()).get('tag_cache_ttl', None))
+                if 'tag_cache_filename' in settings.get('OPTIONS', dict()):
+                    config.set_cfg_var('TAG_CACHE_FILENAME',
+                                       settings.get('OPTIONS', dict()).get('tag_cache_filename', None))
+
                 log.info('LOAD SETTINGS')
                 if utils.isDebugMode():
                     self.printSettings(settings)
@@ -83,59 +133,139 @@ class icSettingsManager(object):
                 log.warning('Don\'t define settings. Ini file name: %s' % sINIFileName)
         return False
 
-    def loadSectionList(self, ini_settings, section, name, cfg_name):
+    def getSettingsCacheFileName(self, sINIFileName):
+        """
+        Имя файла кеша собранных настроек.
+        @param sINIFileName: Полное имя конфигурационного файла.
+        """
+        return sINIFileName + SETTINGS_CACHE_FILE_EXT
+
+    def getINIFileKey(self, sINIFileName):
+        """
+        Ключ актуальности кеша собранных настроек.
+        @param sINIFileName: Полное имя конфигурационного файла.
+        @return: Кортеж (Версия менеджера настроек, Время модификации, Размер) INI файла.
+        """
+        ini_stat = os.stat(sINIFileName)
+        return __version__, ini_stat.st_mtime, ini_stat.st_size
+
+    def loadSettingsCache(self, sINIFileName):
+        """
+        Загрузка собранных настроек из файла кеша.
+        @param sINIFileName: Полное имя конфигурационного файла.
+        @return: Словарь собранных настроек или None,
+            если кеш отсутствует или не соответствует INI файлу.
+        """
+        cache_filename = self.getSettingsCacheFileName(sINIFileName)
+        if not os.path.exists(cache_filename):
+            return None
+
+        cache_file = None
+        try:
+            cache_file = open(cache_filename, 'rb')
+            key, cache = pickle.load(cache_file)
+            cache_file.close()
+            if key == self.getINIFileKey(sINIFileName):
+                log.info(u'Загрузка собранных настроек из кеша <%s>' % cache_filename)
+                return cache
+        except:
+            if cache_file:
+                cache_file.close()
+            log.warning(u'Ошибка загрузки кеша настроек <%s>' % cache_filename)
+        return None
+
+    def saveSettingsCache(self, sINIFileName, cache):
+        """
+        Сохранение собранных настроек в файл кеша.
+        Запись производится через временный файл.
+        Если папка INI файла не доступна для записи, то кеш не сохраняется.
+        @param sINIFileName: Полное имя конфигурационного файла.
+        @param cache: Словарь собранных настроек.
+        @return: True/False.
+        """
+        cache_filename = self.getSettingsCacheFileName(sINIFileName)
+        tmp_filename = cache_filename + '.tmp'
+        cache_file = None
+        try:
+            cache_file = open(tmp_filename, 'wb')
+            pickle.dump((self.getINIFileKey(sINIFileName), cache), cache_file, pickle.HIGHEST_PROTOCOL)
+            cache_file.close()
+            os.rename(tmp_filename, cache_filename)
+            return True
+        except:
+            if cache_file:
+                cache_file.close()
+            log.warning(u'Ошибка сохранения кеша настроек <%s>' % cache_filename)
+        return False
+
+    def loadSectionList(self, ini_settings, section, name, cfg_name, memo=None):
         """
         Загрузка списка секций из INI файла.
         @param ini_settings: Словарь содержания INI файла.
         @param section: Секция источника.
         @param name: Наименование параметра источника данных запрашиваемого списка секций.
         @param cfg_name: Имя списка секций в сонфигурационном файле.
-        @return: True/False.
+        @param memo: Словарь уже собранных секций.
+        @return: Список собранных секций.
         """
+        if memo is None:
+            memo = dict()
         ini_names = ini_settings.get(section, dict()).get(name, list())
         cfg_sections = list()
         for ini_name in ini_names:
             # cfg_section = ini_settings.get(ini_name, dict())
-            cfg_section = self.buildSection(ini_settings, ini_name)
+            cfg_section = self.buildSection(ini_settings, ini_name, memo)
             cfg_section['name'] = ini_name
-            log.debug(u'Собранная секция %s' % cfg_section.keys())
+            log.debug(u'Собранная секция %s', cfg_section.keys())
             cfg_sections.append(cfg_section)
         config.set_cfg_var(cfg_name, cfg_sections)
+        return cfg_sections
 
-    def buildSection(self, ini_settings, ini_name):
+    def buildSection(self, ini_settings, ini_name, memo=None):
         """
         Собрать полное описание секции с учетом ключа parent.
         Через ключ parent можно наследовать описание секции.
         @param ini_settings: Словарь содержания INI файла.
         @param ini_name: Наименование запрашиваемой секции.
+        @param memo: Словарь уже собранных секций.
+            Каждая секция собирается один раз, не зависимо от того,
+            сколько секций наследуется от нее.
         @return: Словарь секции дополненный переменными из секции указанной в parent.
             Сборка данных производиться рекурсивно.
         """
-        section = copy.deepcopy(ini_settings.get(ini_name, dict(name=ini_name)))
+        if memo is None:
+            memo = dict()
+        if ini_name in memo:
+            if memo[ini_name] is None:
+                log.warning(u'Циклическое наследование секции <%s>' % ini_name)
+                return dict()
+            return copy_section(memo[ini_name])
+
+        # Признак сборки секции. Используется для обнаружения циклов
+        memo[ini_name] = None
+        section = copy_section(ini_settings.get(ini_name, dict(name=ini_name)))
         if 'parent' not in section:
-            return section
+            pass
         elif not section['parent']:
             del section['parent']
-            return section
-        elif section['parent'] not in ini_settings:
+        elif type(section['parent']) in (str, unicode) and section['parent'] not in ini_settings:
             log.warning(u'Запрашиваемая секция <%s> как родительская для <%s> не найдена' % (section['parent'], ini_name))
             del section['parent']
-            return section
-        else:
-            if type(section['parent']) in (str, unicode):
-                parent_section = self.buildSection(ini_settings, section['parent'])
-                parent_section.update(section)
-                del parent_section['parent']
-                return parent_section
-            elif type(section['parent']) in (list, tuple):
-                result_section = dict()
-                for parent_section_name in section['parent']:
-                    parent_section = self.buildSection(ini_settings, parent_section_name)
-                    result_section.update(parent_section)
-                result_section.update(section)
-                del result_section['parent']
-                return result_section
-        return section
+        elif type(section['parent']) in (str, unicode):
+            parent_section = self.buildSection(ini_settings, section['parent'], memo)
+            parent_section.update(section)
+            del parent_section['parent']
+            section = parent_section
+        elif type(section['parent']) in (list, tuple):
+            result_section = dict()
+            for parent_section_name in section['parent']:
+                parent_section = self.buildSection(ini_settings, parent_section_name, memo)
+                result_section.update(parent_section)
+            result_section.update(section)
+            del result_section['parent']
+            section = result_section
+        memo[ini_name] = section
+        return copy_section(section)
 
     def saveSettings(self, sINIFileName=None):
         """
@@ -4,20 +4,21 @@
 """
 Пакет классов-источников данных.
 Кроме описания класса он д.б. зарегистрирован в словаре источников данных.
+Модули источников данных импортируются только при первом обращении к классу.
+Сторонние источники данных регистрируются через точки входа группы
+SOURCES_ENTRY_POINT_GROUP.
 """
 
-from . import rslinx
-from . import uni_opc
-from . import xml_file
-from . import utm
-from . import src_query
-from . import file_list
+from ic.utils import plugfunc
 
-DATA_SOURCES = {
-    'RSLINX': rslinx.icRSLinxDataSource,
-    'UNI_OPC': uni_opc.icUniReaderOPCDataSource,
-    'XML_FILE': xml_file.icXMLFileDataSource,
-    'UTM': utm.icUTMDataSource,
-    'SQL_SRC': src_query.icSQLQueryDataSource,
-    'FILE_LIST': file_list.icFileListDataSource,
-}
+# Группа точек входа сторонних источников данных
+SOURCES_ENTRY_POINT_GROUP = 'icregistrator.sources'
+
+DATA_SOURCES = plugfunc.icLazyRegistry({
+    'RSLINX': 'ic.src.rslinx:icRSLinxDataSource',
+    'UNI_OPC': 'ic.src.uni_opc:icUniReaderOPCDataSource',
+    'XML_FILE': 'ic.src.xml_file:icXMLFileDataSource',
+    'UTM': 'ic.src.utm:icUTMDataSource',
+    'SQL_SRC': 'ic.src.src_query:icSQLQueryDataSource',
+    'FILE_LIST': 'ic.src.file_list:icFileListDataSource',
+}, entry_point_group=SOURCES_ENTRY_POINT_GROUP)
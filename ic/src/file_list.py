@@ -7,15 +7,29 @@
 
 import os
 import os.path
-import glob
+import time
+import heapq
 
 from ic.utils import log
 from ic.utils import journal
 from ic.utils import execfunc
+from ic.utils import filefunc
 
 from ic import datasrc_proto
 
-__version__ = (0, 0, 1, 1)
+__version__ = (0, 0, 2, 1)
+
+# Ключи упорядочивания списка файлов
+ORDER_BY_NAME = 'name'
+ORDER_BY_MTIME = 'mtime'
+ORDER_BY_SIZE = 'size'
+# Индексы атрибутов в кортеже описания файла (Полный путь, Размер, Время модификации)
+ORDER_BY_IDX = {ORDER_BY_NAME: 0,
+                ORDER_BY_SIZE: 1,
+                ORDER_BY_MTIME: 2,
+                }
+# Признак обратного порядка сортировки
+ORDER_DESC_SIGNATURE = '-'
 
 
 class icFileListDataSource(datasrc_proto.icDataSourceProto):
@@ -31,6 +45,21 @@ class icFileListDataSource(datasrc_proto.icDataSourceProto):
         # Список файлов задается по шаблону
         self.filename_pattern = kwargs.get('filename_pattern', None)
 
+        # Максимальное количество обрабатываемых за один такт файлов.
+        # Если не определено, то обрабатываются все найденные файлы
+        self.max_files = kwargs.get('max_files', None)
+        # Минимальный возраст файла в секундах.
+        # Более молодые файлы (например еще записываемые) пропускаются
+        self.min_age = kwargs.get('min_age', None)
+        # Порядок обработки файлов: name/mtime/size.
+        # Знак - перед ключом означает обратный порядок (например -mtime)
+        self.order_by = kwargs.get('order_by', ORDER_BY_NAME)
+
+        # Атрибуты прочитанных файлов {Полный путь: (Размер, Время модификации)}
+        self.file_stats = dict()
+        # Упорядоченный список полных путей прочитанных файлов
+        self.filepaths = list()
+
     def diagnostic(self):
         """
         Простая процедура проверки доступа к источнику данных.
@@ -65,14 +94,49 @@ class icFileListDataSource(datasrc_proto.icDataSourceProto):
             journal.write_msg(msg)
             return list()
 
-        filenames = glob.glob(self.filename_pattern)
-
-        log.info(u'Найденные файлы:')
-        for filename in filenames:
-            log.info(u'\t%s' % filename)
-
-        self.state = dict([(os.path.basename(filename), os.path.abspath(filename)) for filename in filenames])
-        return filenames
+        file_items = filefunc.scan_files(self.filename_pattern)
+        file_count = len(file_items)
+
+        if self.min_age:
+            # Отсекаем слишком молодые файлы
+            max_mtime = time.time() - float(self.min_age)
+            file_items = [file_item for file_item in file_items if file_item[2] <= max_mtime]
+
+        file_items = self.order_file_items(file_items)
+
+        log.info(u'Найдено файлов <%d>. Отобрано для обработки <%d>:' % (file_count, len(file_items)))
+        for file_item in file_items:
+            log.info(u'\t%s' % file_item[0])
+
+        self.file_stats = dict([(file_item[0], file_item[1:]) for file_item in file_items])
+        self.filepaths = [file_item[0] for file_item in file_items]
+        self.state = dict([(os.path.basename(filename), filename) for filename in self.filepaths])
+        return self.filepaths
+
+    def order_file_items(self, file_items):
+        """
+        Упорядочить и ограничить список описаний файлов.
+        @param file_items: Список кортежей (Полный путь, Размер, Время модификации).
+        @return: Упорядоченный список не более max_files описаний файлов.
+        """
+        order_by = self.order_by or ORDER_BY_NAME
+        is_desc = order_by.startswith(ORDER_DESC_SIGNATURE)
+        order_by = order_by.lstrip(ORDER_DESC_SIGNATURE).strip().lower()
+        if order_by not in ORDER_BY_IDX:
+            log.warning(u'Не поддерживаемый порядок обработки файлов <%s>. Используется <%s>' % (order_by,
+                                                                                               ORDER_BY_NAME))
+            order_by = ORDER_BY_NAME
+        idx = ORDER_BY_IDX[order_by]
+        # Вторичный ключ - имя файла, для детерминированного порядка
+        sort_key = lambda file_item: (file_item[idx], file_item[0])
+
+        max_files = int(self.max_files) if self.max_files else 0
+        if 0 < max_files < len(file_items):
+            # Для ограниченной пачки достаточно частичной сортировки
+            if is_desc:
+                return heapq.nlargest(max_files, file_items, key=sort_key)
+            return heapq.nsmallest(max_files, file_items, key=sort_key)
+        return sorted(file_items, key=sort_key, reverse=is_desc)
 
     def read_as_dict(self, **values):
         """
@@ -93,8 +157,7 @@ class icFileListDataSource(datasrc_proto.icDataSourceProto):
         @param values: Список получаемых значений.
         @return: Словарь {Имя файла: Полный путь до файла}.
         """
-        filenames = self._read(*values.keys())
-        self.state = dict([(os.path.basename(filename), os.path.abspath(filename)) for filename in filenames])
+        self._read(*values.keys())
         return self.state
 
     def get_filenames(self):
@@ -107,12 +170,21 @@ class icFileListDataSource(datasrc_proto.icDataSourceProto):
     def get_filepath_list(self, auto_sort=True):
         """
         Получить список прочитанных имен файлов.
+        @param auto_sort: Вернуть список в порядке обработки (order_by)?
+            Список упорядочивается один раз при чтении.
         @return: Список прочитанных имен файлов.
         """
-        filepaths = self.state.values()
         if auto_sort:
-            filepaths.sort()
-        return filepaths
+            return list(self.filepaths)
+        return self.state.values()
+
+    def get_file_stat(self, filepath):
+        """
+        Получить атрибуты прочитанного файла.
+        @param filepath: Полный путь до файла.
+        @return: Кортеж (Размер, Время модификации) или None если файл не был прочитан.
+        """
+        return self.file_stats.get(filepath, None)
 
     def get_filename_list(self, auto_sort=True):
         """
@@ -15,6 +15,7 @@ from ic.utils import log
 from ic.utils import journal
 from ic.utils import txtgen
 from ic.utils import execfunc
+from ic.utils import tagcache
 from ic import config
 
 try:
@@ -24,7 +25,10 @@ except ImportError:
 
 from ic import datasrc_proto
 
-__version__ = (0, 0, 5, 1)
+__version__ = (0, 0, 6, 2)
+
+# Источник тегов в ключе общего кеша значений тегов
+RSLINX_TAG_CACHE_SOURCE_FMT = 'rslinx://%s'
 
 
 class icRSLinxDataSource(datasrc_proto.icDataSourceProto):
@@ -136,12 +140,27 @@ class icRSLinxDataSource(datasrc_proto.icDataSourceProto):
             addresses.append(address)
         return addresses
 
+    def get_tag_key(self, address):
+        """
+        Ключ тега в общем кеше значений тегов.
+        @param address: Адрес тега в OPC сервере.
+        """
+        return tagcache.make_key(RSLINX_TAG_CACHE_SOURCE_FMT % (self.opc_host or 'localhost'),
+                                 self.opc_server, address)
+
     def _read_value(self, address):
         """
         Прочитать значение по адресу из RSLinx.
         @param address: Адрес. Адрес задается явно.
         @return: Прочитанное значение либо None в случае ошибки.
         """
+        # В общем кеше хранятся значения до перекодировки,
+        # т.к. настройки перекодировки у разных источников данных могут отличаться
+        key = self.get_tag_key(address)
+        cached_values = self.get_cached_tags([key])
+        if key in cached_values:
+            return self.recode(cached_values[key])
+
         opc = None
         try:
             # Создание клиента OPC
@@ -167,9 +186,11 @@ class icRSLinxDataSource(datasrc_proto.icDataSourceProto):
 
             # Прочитать из OPC сервера
             val = opc.read(address)
-            result = self.recode(val[0]) if val and val[1] == 'Good' else None
+            value = val[0] if val and val[1] == 'Good' else None
 
             opc.close()
+            self.put_cached_tags({key: value})
+            result = self.recode(value)
 
             log.debug(u'Адрес <%s>. Результат чтения данных %s' % (address, result))
             return result
@@ -197,38 +218,53 @@ class icRSLinxDataSource(datasrc_proto.icDataSourceProto):
             log.debug(u'Переменные взяты из описания источника данных: %s' % values)
 
         try:
-            # Создание клиента OPC
-            opc = self.create_opc_client(self.opc_host)
-            if opc is None:
-                msg = u'Не возможно создать объект клиента OPC. Хост <%s>' % self.opc_host
-                log.error(msg)
-                journal.write_msg(msg)
-                return None
-
-            # Список серверов OPC
-            servers = opc.servers()
-            if self.opc_server not in servers:
-                msg = u'Сервер <%s> не найден среди %s' % (self.opc_server, servers)
-                log.warning(msg)
-                journal.write_msg(msg)
-                opc.close()
-                return None
-
-            # Соедиенение с сервером
-            server = self.opc_server
-            opc.connect(server)
-
             # Подготовка переменных для чтения
             # Адреса всегда задаются строками
             addresses = self._gen_addresses(*values)
             log.debug(u'Чтение адресов %s' % addresses)
-            # Прочитать из OPC сервера
-            result = [self.recode(val[1]) if val and val[2] == 'Good' else None for val in opc.read(addresses)]
 
-            # result = [val.encode('') if isinstance(val, unicode) else val for val in result]
-            # result = [val for val in opc.read(addresses)]
+            # Значения, недавно прочитанные другими процессами регистраторов, берем из общего кеша
+            keys = [self.get_tag_key(address) for address in addresses]
+            cached_values = self.get_cached_tags(keys)
+
+            read_values = dict()
+            if len(cached_values) < len(keys):
+                # Создание клиента OPC
+                opc = self.create_opc_client(self.opc_host)
+                if opc is None:
+                    msg = u'Не возможно создать объект клиента OPC. Хост <%s>' % self.opc_host
+                    log.error(msg)
+                    journal.write_msg(msg)
+                    return None
+
+                # Список серверов OPC
+                servers = opc.servers()
+                if self.opc_server not in servers:
+                    msg = u'Сервер <%s> не найден среди %s' % (self.opc_server, servers)
+                    log.warning(msg)
+                    journal.write_msg(msg)
+                    opc.close()
+                    return None
+
+                # Соедиенение с сервером
+                server = self.opc_server
+                opc.connect(server)
+
+                # Прочитать из OPC сервера только отсутствующие в кеше адреса
+                missing = [address for key, address in zip(keys, addresses) if key not in cached_values]
+                missing_keys = [key for key in keys if key not in cached_values]
+                for key, val in zip(missing_keys, opc.read(missing)):
+                    read_values[key] = val[1] if val and val[2] == 'Good' else None
+
+                # result = [val.encode('') if isinstance(val, unicode) else val for val in result]
+                # result = [val for val in opc.read(addresses)]
 
-            opc.close()
+                opc.close()
+                self.put_cached_tags(read_values)
+
+            # Перекодировка производится после получения значений из кеша
+            result = [cached_values[key] if key in cached_values else read_values[key] for key in keys]
+            result = [self.recode(value) for value in result]
 
             # Регистрация состояния
             state = dict([(values[i], val) for i, val in enumerate(result)])
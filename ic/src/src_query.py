@@ -13,7 +13,7 @@ from ic.utils import execfunc
 
 from ic import datasrc_proto
 
-__version__ = (0, 0, 1, 1)
+__version__ = (0, 0, 1, 2)
 
 
 class icSQLQueryDataSource(datasrc_proto.icDataSourceProto):
@@ -38,6 +38,9 @@ class icSQLQueryDataSource(datasrc_proto.icDataSourceProto):
         self.db_username = kwargs.get('db_username', None)
         # Пароль
         self.db_password = kwargs.get('db_password', None)
+        # Полный конекшн стринг. Если определен, то параметры подключения не используются.
+        # Например sqlite:////tmp/registrator.db
+        self.db_url = kwargs.get('db_url', None)
 
         # SQL выражение для записи данных в приемник
         self.sql = kwargs.get('sql', None)
@@ -53,6 +56,8 @@ class icSQLQueryDataSource(datasrc_proto.icDataSourceProto):
         Конекшн стринг подключения к БД.
         @return: Конекшн стринг подключения к БД.
         """
+        if self.db_url:
+            return self.db_url
         return '%s://%s:%s@%s:%s/%s' % (self.db_driver, self.db_username, self.db_password,
                                         self.db_host, self.db_port, self.db_name)
 
@@ -15,6 +15,7 @@ from ic.utils import log
 from ic.utils import journal
 from ic.utils import txtgen
 from ic.utils import execfunc
+from ic.utils import tagcache
 from ic import config
 
 try:
@@ -24,13 +25,16 @@ except ImportError:
 
 from ic import datasrc_proto
 
-__version__ = (0, 0, 0, 1)
+__version__ = (0, 0, 1, 2)
 
 
 UNI_SERVER_URL_FMT = 'http://%s:%d'
 
 DEFAULT_PORT = 8080
 
+# Источник тегов в ключе общего кеша значений тегов
+UNI_TAG_CACHE_SOURCE_FMT = 'uni://%s:%s'
+
 
 class icUniReaderOPCDataSource(datasrc_proto.icDataSourceProto):
     """
@@ -146,12 +150,28 @@ class icUniReaderOPCDataSource(datasrc_proto.icDataSourceProto):
             addresses.append(address)
         return addresses
 
+    def get_tag_key(self, address):
+        """
+        Ключ тега в общем кеше значений тегов.
+        @param address: Адрес тега в OPC сервере.
+        """
+        return tagcache.make_key(UNI_TAG_CACHE_SOURCE_FMT % (self.uni_host, self.uni_port),
+                                 self.opc_server, address)
+
     def _read_value(self, address):
         """
         Прочитать значение по адресу из OPC сервера.
         @param address: Адрес. Адрес задается явно.
         @return: Прочитанное значение либо None в случае ошибки.
         """
+        # В общем кеше хранятся значения до перекодировки,
+        # т.к. настройки перекодировки у разных источников данных могут отличаться
+        key = self.get_tag_key(address)
+        cached_values = self.get_cached_tags([key])
+        if key in cached_values:
+            val = cached_values[key]
+            return self.recode(val[0]) if val else None
+
         connection = None
         try:
             # Создание связи
@@ -172,6 +192,7 @@ class icUniReaderOPCDataSource(datasrc_proto.icDataSourceProto):
 
             # Прочитать из OPC сервера
             val = connection.sources.ReadValueAsString('OPC_SERVER_NODE', self.opc_server, address)
+            self.put_cached_tags({key: val})
             result = self.recode(val[0]) if val else None
 
             log.debug(u'UniReader. Адрес <%s>. Результат чтения данных %s' % (address, result))
@@ -198,32 +219,43 @@ class icUniReaderOPCDataSource(datasrc_proto.icDataSourceProto):
             log.debug(u'UniReader. Переменные взяты из описания источника данных: %s' % values)
 
         try:
-            # Создание клиента OPC
-            connection = self.create_connection(self.uni_host)
-            if connection is None:
-                msg = u'Не возможно создать объект связи с UniReader. Хост <%s>' % self.uni_host
-                log.error(msg)
-                journal.write_msg(msg)
-                return None
-
-            # Контроль наличия процедуры чтения значений из OPC сервера
-            rpc_methods = connection.system.listMethods()
-            if 'sources.ReadValueAsString' not in rpc_methods:
-                msg = u'UniReader. Процедура чтения значения из OPC сервера не найдена. Хост <%s>' % self.uni_host
-                log.error(msg)
-                journal.write_msg(msg)
-                return None
-
             # Подготовка переменных для чтения
             # Адреса всегда задаются строками
             addresses = self._gen_addresses(*values)
             log.debug(u'UniReader. Чтение адресов %s' % addresses)
 
-            # Прочитать из OPC сервера
-            result = list()
-            for address in addresses:
-                value = connection.sources.ReadValueAsString('OPC_SERVER_NODE', self.opc_server, address)
-                result.append(self.recode(value) if value else None)
+            # Значения, недавно прочитанные другими процессами регистраторов, берем из общего кеша
+            keys = [self.get_tag_key(address) for address in addresses]
+            cached_values = self.get_cached_tags(keys)
+
+            read_values = dict()
+            if len(cached_values) < len(keys):
+                # Создание клиента OPC
+                connection = self.create_connection(self.uni_host)
+                if connection is None:
+                    msg = u'Не возможно создать объект связи с UniReader. Хост <%s>' % self.uni_host
+                    log.error(msg)
+                    journal.write_msg(msg)
+                    return None
+
+                # Контроль наличия процедуры чтения значений из OPC сервера
+                rpc_methods = connection.system.listMethods()
+                if 'sources.ReadValueAsString' not in rpc_methods:
+                    msg = u'UniReader. Процедура чтения значения из OPC сервера не найдена. Хост <%s>' % self.uni_host
+                    log.error(msg)
+                    journal.write_msg(msg)
+                    return None
+
+                # Прочитать из OPC сервера только отсутствующие в кеше адреса
+                for key, address in zip(keys, addresses):
+                    if key not in cached_values and key not in read_values:
+                        value = connection.sources.ReadValueAsString('OPC_SERVER_NODE', self.opc_server, address)
+                        read_values[key] = value if value else None
+                self.put_cached_tags(read_values)
+
+            # Перекодировка производится после получения значений из кеша
+            result = [cached_values[key] if key in cached_values else read_values[key] for key in keys]
+            result = [self.recode(value) if value else None for value in result]
 
             # Регистрация состояния
             state = dict([(values[i], val) for i, val in enumerate(result)])
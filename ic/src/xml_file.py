@@ -16,10 +16,13 @@ from ic.utils import log
 from ic.utils import journal
 from ic.utils import execfunc
 from ic.utils import xmlfunc
+from ic.utils import ledger
+from ic.utils import filefunc
 
+from ic import config
 from ic import datasrc_proto
 
-__version__ = (0, 0, 2, 1)
+__version__ = (0, 0, 3, 3)
 
 
 class icXMLFileDataSource(datasrc_proto.icDataSourceProto):
@@ -41,6 +44,19 @@ class icXMLFileDataSource(datasrc_proto.icDataSourceProto):
 
         # Признак удаления файлов после обработки
         self.auto_remove = kwargs.get('auto_remove', False)
+        # Папка архива обработанных файлов.
+        # Если определена, то при auto_remove файлы не удаляются, а
+        # атомарно перемещаются в эту папку после регистрации прочитанных значений.
+        # В имени папки можно указывать формат даты (например /data/archive/%Y-%m-%d)
+        self.archive_dir = kwargs.get('archive_dir', None)
+
+        # Признак ведения реестра обработанных файлов.
+        # Если реестр включен, то обрабатываются только новые или измененные файлы
+        self.use_ledger = kwargs.get('ledger', False)
+        # Учитывать контрольную сумму содержимого файлов в реестре
+        self.ledger_hash = kwargs.get('ledger_hash', False)
+        # Файл реестра. По умолчанию располагается в папке профиля
+        self.ledger_filename = kwargs.get('ledger_filename', None)
 
         self.cache_xml_filenames = list()
 
@@ -69,6 +85,13 @@ class icXMLFileDataSource(datasrc_proto.icDataSourceProto):
         """
         xml_filenames = self.get_xml_filenames()
 
+        file_ledger = self.get_ledger()
+        if file_ledger is not None:
+            all_xml_filenames = xml_filenames
+            xml_filenames = file_ledger.filter_changed(all_xml_filenames)
+            log.info(u'Новых или измененных XML файлов <%d> из <%d>' % (len(xml_filenames),
+                                                                      len(all_xml_filenames)))
+
         if not values:
             log.warning(u'Не определены переменные для чтения в <%s>' % self.name)
             values = self.values
@@ -88,16 +111,23 @@ class icXMLFileDataSource(datasrc_proto.icDataSourceProto):
             state = dict([(values[i], val) for i, val in enumerate(result)])
             self.reg_state(**state)
 
-            if self.auto_remove:
-                for xml_filename in xml_filenames:
-                    if os.path.exists(xml_filename):
-                        try:
-                            log.info(u'Удаление файла <%s>' % xml_filename)
-                            os.remove(xml_filename)
-                        except:
-                            msg = u'Ошибка удаления файла <%s>' % xml_filename
-                            log.fatal(msg)
-                            journal.write_msg(msg)
+            # Фиксируем обработку файлов только после регистрации всех прочитанных значений.
+            # При ошибке чтения любого файла пакета ни один файл не удаляется и
+            # весь пакет будет обработан повторно
+            # Папки, содержимое которых изменилось при фиксации обработки файлов
+            changed_dirnames = list()
+            for xml_filename in xml_filenames:
+                if file_ledger is not None:
+                    file_ledger.register(xml_filename)
+                if self.auto_remove:
+                    changed_dirnames += self.commit_xml_file(xml_filename)
+
+            if changed_dirnames:
+                filefunc.fsync_dirs(changed_dirnames)
+
+            if file_ledger is not None:
+                file_ledger.prune(all_xml_filenames)
+                file_ledger.save()
 
             return result
         except:
@@ -129,6 +159,51 @@ class icXMLFileDataSource(datasrc_proto.icDataSourceProto):
         log.debug(u'Результат чтения данных в виде словаря %s' % result)
         return result
 
+    def commit_xml_file(self, xml_filename):
+        """
+        Зафиксировать обработку XML файла.
+        Если определена папка архива, то файл атомарно перемещается в архив,
+        иначе файл удаляется.
+        @param xml_filename: Полное имя обработанного XML файла.
+        @return: Список папок, содержимое которых изменилось.
+            Сброс изменений папок на диск производится после обработки всего пакета файлов.
+        """
+        if not os.path.exists(xml_filename):
+            return list()
+
+        src_dirname = os.path.dirname(os.path.abspath(xml_filename))
+        if self.archive_dir:
+            archive_dirname = filefunc.get_archive_dirname(self.archive_dir)
+            log.info(u'Перемещение файла <%s> в архив <%s>' % (xml_filename, archive_dirname))
+            if filefunc.move_file_atomic(xml_filename, archive_dirname):
+                return [src_dirname, archive_dirname]
+            msg = u'Ошибка перемещения файла <%s> в архив' % xml_filename
+            journal.write_msg(msg)
+            return list()
+
+        try:
+            log.info(u'Удаление файла <%s>' % xml_filename)
+            os.remove(xml_filename)
+            return [src_dirname]
+        except:
+            msg = u'Ошибка удаления файла <%s>' % xml_filename
+            log.fatal(msg)
+            journal.write_msg(msg)
+        return list()
+
+    def get_ledger(self):
+        """
+        Получить реестр обработанных файлов.
+        @return: Объект реестра обработанных файлов или None если реестр не используется.
+        """
+        if not self.use_ledger:
+            return None
+
+        ledger_filename = self.ledger_filename
+        if not ledger_filename:
+            ledger_filename = os.path.join(config.PROFILE_DIR, self.name + ledger.LEDGER_FILE_EXT)
+        return ledger.icFileLedger(ledger_filename, use_hash=self.ledger_hash)
+
     def is_filename_pattern(self, filename):
         """
         Проверка является имя файла шаблоном.
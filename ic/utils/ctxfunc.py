@@ -0,0 +1,84 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Функции работы с контекстом выполнения.
+
+Контекст выполнения собирается из нескольких слоев
+(например состояние объекта поверх снимка конфигурации).
+Слои не копируются и не изменяются. Запись в контекст
+производится в собственный локальный слой контекста.
+"""
+
+import UserDict
+
+__version__ = (0, 0, 1, 1)
+
+
+class icLayeredContext(UserDict.DictMixin):
+    """
+    Многослойный контекст выполнения.
+    Поиск переменной производится сначала в локальном слое,
+    а затем в слоях в порядке их указания.
+    """
+    def __init__(self, *layers):
+        """
+        Конструктор.
+        @param layers: Словари слоев контекста в порядке убывания приоритета.
+        """
+        # Локальный слой. Сюда попадают все изменения контекста
+        self.local = dict()
+        self.layers = [layer for layer in layers if layer is not None]
+
+    def __getitem__(self, name):
+        if name in self.local:
+            return self.local[name]
+        for layer in self.layers:
+            if name in layer:
+                return layer[name]
+        raise KeyError(name)
+
+    def __setitem__(self, name, value):
+        self.local[name] = value
+
+    def __delitem__(self, name):
+        del self.local[name]
+
+    def __contains__(self, name):
+        if name in self.local:
+            return True
+        for layer in self.layers:
+            if name in layer:
+                return True
+        return False
+
+    has_key = __contains__
+
+    def __iter__(self):
+        return iter(self.keys())
+
+    def __len__(self):
+        return len(self.keys())
+
+    def get(self, name, default=None):
+        if name in self.local:
+            return self.local[name]
+        for layer in self.layers:
+            if name in layer:
+                return layer[name]
+        return default
+
+    def keys(self):
+        names = set(self.local)
+        for layer in self.layers:
+            names.update(layer)
+        return list(names)
+
+    def copy(self):
+        """
+        Копия контекста.
+        Копируется только локальный слой, остальные слои остаются общими.
+        """
+        context = icLayeredContext(*self.layers)
+        context.local.update(self.local)
+        return context
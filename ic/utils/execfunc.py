@@ -15,17 +15,89 @@ import os
 import os.path
 import sys
 import imp
-import locale
+import time
+import threading
+import Queue
 from . import log
+from . import journal
+from . import procfunc
+from . import metrics
 
-__versiom__ = (0, 0, 4, 2)
+__versiom__ = (0, 0, 7, 3)
 
 # Сигнатуры блоков кода
 PY_SIGNATURE = u'python:'
 FUNC_SIGNATURE = u'func:'
 CMD_SIGNATURE = u'cmd:'
 SHELL_SIGNATURE = u'shell:'
-EXEC_SIGNATURES = (PY_SIGNATURE, FUNC_SIGNATURE, CMD_SIGNATURE, SHELL_SIGNATURE)
+# Сигнатура асинхронного выполнения блока кода.
+# Указывается перед сигнатурой блока кода, например: async:cmd:mv ...
+ASYNC_SIGNATURE = u'async:'
+EXEC_SIGNATURES = (PY_SIGNATURE, FUNC_SIGNATURE, CMD_SIGNATURE, SHELL_SIGNATURE, ASYNC_SIGNATURE)
+
+# Максимальное количество блоков кода в очереди асинхронного выполнения.
+# При заполнении очереди блоки кода выполняются синхронно
+ASYNC_QUEUE_SIZE = 100
+
+# Очередь и поток асинхронного выполнения блоков кода
+_async_queue = None
+_async_thread = None
+_async_lock = threading.Lock()
+
+# Кеш скомпилированных блоков кода {Текст блока кода: Объект кода}.
+# Кешируются только постоянные блоки кода. Блоки кода с автозаменами {{ }}
+# после замены каждый такт получают новый текст и компилируются без кеша
+CODE_CACHE = dict()
+# Максимальное количество блоков кода в кеше.
+# При превышении кеш очищается полностью
+CODE_CACHE_SIZE = 4096
+# Кеш импортированных модулей функций {Имя модуля: Объект пакета верхнего уровня}
+FUNC_MODULE_CACHE = dict()
+
+
+def compile_code(code, use_cache=True):
+    """
+    Получить скомпилированный блок кода.
+    Каждый постоянный блок кода компилируется только один раз.
+    @param code: Текст блока кода (выражение Python).
+    @param use_cache: Использовать кеш скомпилированных блоков кода?
+        Блоки кода, полученные автозаменой, не кешируются.
+    @return: Объект кода.
+    """
+    if not use_cache:
+        return compile(code, '<code block>', 'eval')
+
+    code_obj = CODE_CACHE.get(code, None)
+    if code_obj is None:
+        code_obj = compile(code, '<code block>', 'eval')
+        if len(CODE_CACHE) >= CODE_CACHE_SIZE:
+            CODE_CACHE.clear()
+        CODE_CACHE[code] = code_obj
+    return code_obj
+
+
+def import_func_module(func_mod, bReImport=False):
+    """
+    Импортировать модуль функции.
+    Импортированные модули кешируются.
+    @param func_mod: Полное имя модуля (ИмяПакета.ИмяМодуля).
+    @param bReImport: Переимпортировать модуль?
+    @return: Кортеж (Имя пакета верхнего уровня, Объект пакета верхнего уровня).
+    """
+    if bReImport:
+        unLoadSource(func_mod)
+        if func_mod in FUNC_MODULE_CACHE:
+            del FUNC_MODULE_CACHE[func_mod]
+
+    top_module = FUNC_MODULE_CACHE.get(func_mod, None)
+    if top_module is None:
+        try:
+            top_module = __import__(func_mod)
+        except:
+            log.error(u'Import module error <%s>' % func_mod)
+            raise
+        FUNC_MODULE_CACHE[func_mod] = top_module
+    return func_mod.split('.')[0], top_module
 
 
 def loadSource(name, path):
@@ -75,7 +147,7 @@ def reLoadSource(name, path=None):
     return loadSource(name, path)
 
 
-def exec_func(func_code='', bReImport=False, name_space=None, kwargs=None):
+def exec_func(func_code='', bReImport=False, name_space=None, kwargs=None, use_cache=True):
     """
     Выполнить блок кода функции.
     @type func_code: C{string}
@@ -88,6 +160,7 @@ def exec_func(func_code='', bReImport=False, name_space=None, kwargs=None):
     @param name_space: Пространство имен.
     @type kwargs: C{dictionary}
     @param kwargs: Дополнительные аргументы функции.
+    @param use_cache: Использовать кеш скомпилированных блоков кода?
     """
     result = None
 
@@ -98,20 +171,10 @@ def exec_func(func_code='', bReImport=False, name_space=None, kwargs=None):
     func_import = func_code.split('(')[0].split('.')
     func_mod = '.'.join(func_import[:-1])
 
-    if bReImport:
-        unLoadSource(func_mod)
-
     # Импортирование модуля
     if func_mod:
-        import_str = 'import ' + func_mod
-        try:
-            exec import_str
-        except:
-            log.error(u'Import module error <%s>' % import_str)
-            raise
-
-    # Добавить локальное пространство имен
-    name_space.update(locals())
+        top_name, top_module = import_func_module(func_mod, bReImport)
+        name_space[top_name] = top_module
 
     if kwargs:
         if isinstance(kwargs, dict):
@@ -121,7 +184,7 @@ def exec_func(func_code='', bReImport=False, name_space=None, kwargs=None):
 
     # Выполнение функции
     try:
-        result = eval(func_code, globals(), name_space)
+        result = eval(compile_code(func_code, use_cache), globals(), name_space)
     except:
         log.error(u'Ошибка выполнения блока кода функции <%s>' % func_code)
         raise
@@ -129,10 +192,13 @@ def exec_func(func_code='', bReImport=False, name_space=None, kwargs=None):
     return result
 
 
-def exec_python(python_code):
+def exec_python(python_code, context=None, use_cache=True):
     """
     Выполнение кода Python.
     @param python_code: Блок кода Pythonю
+    @param context: Контекст выполнения блока кода.
+        Переменные контекста доступны в блоке кода как локальные.
+    @param use_cache: Использовать кеш скомпилированных блоков кода?
     @return: Результат выполнения блока кода Python.
     """
     python_code = python_code.strip()
@@ -141,115 +207,86 @@ def exec_python(python_code):
         return None
 
     try:
-        log.debug(u'Выполнение блока кода Python <%s>' % python_code)
-        return eval(python_code)
+        log.debug(u'Выполнение блока кода Python <%s>', python_code)
+        return eval(compile_code(python_code, use_cache), globals(), context if context is not None else dict())
     except:
         log.fatal(u'Ошибка выполнения блока кода Python <%s>' % python_code)
     return None
 
 # Разделитель комманд
 CMD_DELIMETER = u'{+}'
+# Разделитель независимых комманд, которые можно выполнять параллельно
+CMD_CONCURRENT_DELIMETER = u'{&}'
 # Кодировка коммандной оболочки по умолчанию
-CMD_ENCODING = sys.stdout.encoding if sys.platform.startswith('win') else locale.getpreferredencoding()
+CMD_ENCODING = procfunc.CMD_ENCODING
+# Максимальное время выполнения одной комманды в секундах. None - не ограничено
+CMD_TIMEOUT = None
 
 
-def exec_cmd(cmd):
+def exec_cmd(cmd, timeout=None):
     """
     Выполнение комманды опереционной системы.
     Комманды могут быть разделены разделителем CMD_DELIMETER.
     В этом случае они выполняются последовательно.
+    Комманды, разделенные разделителем CMD_CONCURRENT_DELIMETER, выполняются параллельно.
     @param cmd: Комманды ОС.
-    @return: True/False.
+    @param timeout: Максимальное время выполнения одной комманды в секундах.
+        Если не определено, то берется CMD_TIMEOUT.
+    @return: Список результатов выполнения комманд (procfunc.icProcessResults).
+        Результат истинен, если все комманды завершились с кодом возврата 0.
     """
+    if type(cmd) not in (str, unicode):
+        return None
+
     cmd = cmd.strip()
     if not cmd:
         log.warning(u'Command. Пустой блок кода')
         return None
 
-    if type(cmd) not in (str, unicode):
-        return None
-
-    commands = cmd.split(CMD_DELIMETER)
-    result = True
+    concurrent = CMD_CONCURRENT_DELIMETER in cmd
+    delimeter = CMD_CONCURRENT_DELIMETER if concurrent else CMD_DELIMETER
+    commands = [command.strip() for command in cmd.split(delimeter) if command.strip()]
     for command in commands:
-        command = command.strip()
-        try:
-            log.debug(u'Выполнение команды ОС <%s>' % command)
-            if isinstance(command, unicode):
-                # ВНИМАНИЕ! Комманды выполняются в контексте консоли, поэтому должны быть перекодированы в
-                # консольную кодировку перед выполнением
-                command = command.encode(CMD_ENCODING)
-            os.system(command)
-            result = result and True
-        except:
-            log.fatal(u'Ошибка выполнения комманды ОС <%s>' % command)
-            result = False
-    return result
+        log.debug(u'Выполнение команды ОС <%s>', command)
+
+    results = procfunc.run_processes(commands, timeout=timeout or CMD_TIMEOUT, concurrent=concurrent)
+    for result in results:
+        procfunc.log_result(result)
+    return results
 
 
 # Символ перевода каретки
 EOL = '\r\n' if sys.platform.startswith('win') else '\n'
 
 
-def exec_shell(cmd, auto_remove_cmd_file=True):
+def exec_shell(cmd, auto_remove_cmd_file=True, timeout=None):
     """
-    Выполнение комманды опереционной системы через создание коммандного файла и запуск его в шелл.
+    Выполнение комманды опереционной системы в коммандной оболочке.
     Комманды могут быть разделены разделителем CMD_DELIMETER.
-    В этом случае они выполняются последовательно.
+    В этом случае они выполняются последовательно как один скрипт.
+    Текст скрипта передается коммандной оболочке напрямую, без создания коммандного файла.
     @param cmd: Комманды ОС.
-    @param auto_remove_cmd_file: Произвести автоматическое удаление коммандного файла после выполнения?
-    @return: True/False.
+    @param auto_remove_cmd_file: Оставлен для совместимости. Коммандный файл больше не создается.
+    @param timeout: Максимальное время выполнения скрипта в секундах.
+        Если не определено, то берется CMD_TIMEOUT.
+    @return: Результат выполнения скрипта (procfunc.icProcessResult).
+        Результат истинен, если скрипт завершился с кодом возврата 0.
     """
     if type(cmd) not in (str, unicode):
         return None
 
-    tmp_cmd_filename = os.tempnam()+('.bat' if sys.platform.startswith('win') else '.sh')
-    commands = [command.strip() + EOL for command in cmd.split(CMD_DELIMETER)]
-
-    is_command = max([bool(command.strip()) for command in commands])
-    if not is_command:
+    commands = [command.strip() for command in cmd.split(CMD_DELIMETER)]
+    if not max([bool(command) for command in commands]):
         log.warning(u'Shell. Пустой блок кода')
         return None
 
-    log.info(u'Создание коммандного файла <%s>:' % tmp_cmd_filename)
-    for cmd in commands:
-        log.info(u'\t%s' % cmd)
-
-    # Если файл выполняется в коммандной оболочке,
-    # то и кодировка должна быть в кодировке коммандной оболочки
-    commands = [command.encode(log.DEFAULT_ENCODING) if isinstance(command, unicode) else command for command in commands]
-    # log.debug(u'Список комманд %s' % commands)
-    result = True
-    tmp_cmd_file = None
-    try:
-        tmp_cmd_file = open(tmp_cmd_filename, 'w+')
-        tmp_cmd_file.writelines(commands)
-        tmp_cmd_file.close()
-    except:
-        if tmp_cmd_file:
-            tmp_cmd_file.close()
-        log.fatal(u'Ошибка создания коммандного файла <%s> для выполнения комманды ОС <%s>' % (tmp_cmd_filename, cmd))
-        result = False
-
-    if result:
-        if not os.path.exists(tmp_cmd_filename):
-            log.warning(u'Коммандный файл <%s> не найден' % tmp_cmd_filename)
-            result = False
-        else:
-            # Выполнить коммандный файл
-            if sys.platform.startswith('win'):
-                cmd = '"%s"' % tmp_cmd_filename
-            else:
-                cmd = 'sh "%s"' % tmp_cmd_filename
-            result = exec_cmd(cmd)
-            # После выполнения удалить временный коммандный файл
-            if auto_remove_cmd_file:
-                try:
-                    log.info(u'Удаление файла <%s>' % tmp_cmd_filename)
-                    os.remove(tmp_cmd_filename)
-                except:
-                    log.fatal(u'Ошибка удаления файла <%s>' % tmp_cmd_filename)
+    log.info(u'Выполнение скрипта коммандной оболочки:')
+    for command in commands:
+        log.info(u'\t%s' % command)
 
+    script = EOL.join(commands) + EOL
+    result = procfunc.run_script(script, timeout=timeout or CMD_TIMEOUT)
+    procfunc.log_result(result)
     return result
 
 
@@ -266,6 +303,18 @@ def is_code_block(txt):
     return max([txt.startswith(signature) for signature in EXEC_SIGNATURES])
 
 
+def is_code_async(txt):
+    """
+    Проверка является ли строка/текст блоком кода асинхронного выполнения.
+    @param txt: Проверяемый текст.
+    @return: True/False.
+    """
+    if type(txt) not in (str, unicode):
+        # Если это вообще не текст, то и не блок кода
+        return False
+    return txt.startswith(ASYNC_SIGNATURE)
+
+
 def is_code_python(txt):
     """
     Проверка является ли строка/текст блоком кода.
@@ -318,11 +367,14 @@ def is_code_shell(txt):
     return txt.startswith(SHELL_SIGNATURE)
 
 
-def exec_code_block(code_block):
+def exec_code_block(code_block, context=None, use_cache=True):
     """
     Выполнение блока кода.
     В блоке кода должна присутствовать сигнатура для определения метода выполнения блока кода.
     @param code_block: Строка блока кода с сигнатурой.
+    @param context: Контекст выполнения блоков кода Python.
+    @param use_cache: Использовать кеш скомпилированных блоков кода Python и функций?
+        Блоки кода, полученные автозаменой, следует выполнять без кеша.
     @return: Результат выполнения блока кода.
     """
     if not is_code_block(code_block):
@@ -333,11 +385,11 @@ def exec_code_block(code_block):
     if code_block.startswith(PY_SIGNATURE):
         # Обработка блоков кода Python
         code = code_block[len(PY_SIGNATURE):].strip()
-        return exec_python(code)
+        return exec_python(code, context, use_cache)
     elif code_block.startswith(FUNC_SIGNATURE):
         # Обработка блоков кода функций
         code = code_block[len(FUNC_SIGNATURE):].strip()
-        return exec_func(code)
+        return exec_func(code, use_cache=use_cache)
     elif code_block.startswith(CMD_SIGNATURE):
         # Обработка блоков кода комманд ОС
         code = code_block[len(CMD_SIGNATURE):].strip()
@@ -346,36 +398,136 @@ def exec_code_block(code_block):
         # Обработка блоков кода комманд ОС через создание командного файла
         code = code_block[len(SHELL_SIGNATURE):].strip()
         return exec_shell(code)
+    elif code_block.startswith(ASYNC_SIGNATURE):
+        # Блок кода выполняется в фоне. Результат выполнения не ожидаем
+        code = code_block[len(ASYNC_SIGNATURE):].strip()
+        return exec_code_block_async(code)
     else:
         log.warning(u'Не определена сигнатура блока кода <%s>' % code_block)
     return None
 
 
+def _async_worker():
+    """
+    Цикл обработки очереди асинхронного выполнения блоков кода.
+    Ошибки выполнения регистрируются в журнале.
+    """
+    while True:
+        code_block = _async_queue.get()
+        try:
+            result = exec_code_block(code_block)
+            # Результат блоков кода Python и функций не является признаком ошибки
+            # (как и при синхронном выполнении пост-обработки).
+            # Ошибкой считается только не успешное завершение комманд ОС
+            if isinstance(result, (procfunc.icProcessResult, procfunc.icProcessResults)) and not result:
+                _write_async_error(u'Ошибка асинхронного выполнения блока кода <%s>' % code_block)
+        except:
+            msg = u'Ошибка асинхронного выполнения блока кода <%s>' % code_block
+            log.fatal(msg)
+            _write_async_error(msg)
+        finally:
+            _async_queue.task_done()
+
+
+def _write_async_error(msg):
+    """
+    Регистрация ошибки асинхронного выполнения в журнале.
+    Ошибка записи в журнал не должна останавливать поток обработки очереди.
+    @param msg: Текст сообщения.
+    """
+    try:
+        journal.write_msg(msg)
+    except:
+        log.fatal(u'Ошибка записи в журнал сообщения <%s>' % msg)
+
+
+def _start_async_worker():
+    """
+    Запустить поток асинхронного выполнения блоков кода, если он еще не запущен.
+    """
+    global _async_queue
+    global _async_thread
+
+    with _async_lock:
+        if _async_thread is None:
+            _async_queue = Queue.Queue(ASYNC_QUEUE_SIZE)
+            _async_thread = threading.Thread(target=_async_worker, name='async_code_block')
+            _async_thread.daemon = True
+            _async_thread.start()
+
+
+def exec_code_block_async(code_block):
+    """
+    Асинхронное выполнение блока кода в фоновом потоке.
+    Если очередь асинхронного выполнения заполнена, то блок кода выполняется синхронно.
+    @param code_block: Строка блока кода с сигнатурой.
+    @return: True - блок кода поставлен в очередь выполнения /
+        Результат синхронного выполнения блока кода при заполненной очереди.
+    """
+    _start_async_worker()
+    try:
+        _async_queue.put_nowait(code_block)
+        log.debug(u'Блок кода <%s> поставлен в очередь асинхронного выполнения', code_block)
+        return True
+    except Queue.Full:
+        log.warning(u'Очередь асинхронного выполнения заполнена. Синхронное выполнение блока кода <%s>' % code_block)
+    return exec_code_block(code_block)
+
+
+def get_async_queue_size():
+    """
+    Количество блоков кода, ожидающих асинхронного выполнения.
+    """
+    return _async_queue.qsize() if _async_queue is not None else 0
+
+
+def wait_async_code_blocks():
+    """
+    Дождаться выполнения всех блоков кода из очереди асинхронного выполнения.
+    Вызывается при завершении работы программы.
+    """
+    if _async_queue is not None:
+        if _async_queue.unfinished_tasks:
+            log.info(u'Ожидание завершения асинхронного выполнения блоков кода...')
+        _async_queue.join()
+
+
 def exec_prev_post_decorate(func=None, prev_cmd=None, post_cmd=None, *args, **kwargs):
     """
     Выполнение внешней функции.
     Функция выполняется с пред... и пост... обработкой.
+    Время выполнения каждой фазы (prev_cmd, io, post_cmd) регистрируется
+    в метриках с меткой имени объекта, которому принадлежит функция.
     @param func: Выполняемая функция.
     @param args: Аргументы выполняемой функции.
     @param kwargs: Аргументы выполняемой функции.
     @param prev_cmd: Блок кода пред обработки.
     @param post_cmd: Блок кода пост обработки.
+        Блоки кода с сигнатурой ASYNC_SIGNATURE выполняются в фоне и не задерживают такт.
+        Асинхронный блок кода пред обработки не может запретить выполнение функции.
     @return: Результат выполнения функции или None в случае ошибки.
     """
+    obj_name = getattr(getattr(func, 'im_self', None), 'name', None) or getattr(func, '__name__', u'')
+
     prev_result = True
     if prev_cmd:
         log.info(u'Выполнение блока кода пред-обработки <%s>' % prev_cmd)
+        start_time = time.time()
         # Перед выполнение произвести замену из контекста
         prev_result = exec_code_block(prev_cmd)
+        metrics.add_timing('phase_seconds', time.time() - start_time, object=obj_name, phase='prev_cmd')
 
     if prev_result:
         # По результату предобработки определяем вообще надо производить чтение или нет
         if func:
+            start_time = time.time()
             try:
                 result = func(*args, **kwargs)
             except:
                 log.fatal(u'Ошибка выполнения функции %s' % str(func))
+                metrics.inc_counter('errors_total', object=obj_name)
                 result = None
+            metrics.add_timing('phase_seconds', time.time() - start_time, object=obj_name, phase='io')
         else:
             log.warning(u'Не определена функция выполнения')
             result = None
@@ -385,8 +537,9 @@ def exec_prev_post_decorate(func=None, prev_cmd=None, post_cmd=None, *args, **kw
 
     if post_cmd:
         log.info(u'Выполнение блока кода пост-обработки <%s>' % post_cmd)
+        start_time = time.time()
         # Просто выполняем блок кода
         exec_code_block(post_cmd)
+        metrics.add_timing('phase_seconds', time.time() - start_time, object=obj_name, phase='post_cmd')
 
     return result
-
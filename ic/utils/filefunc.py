@@ -0,0 +1,196 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Функции работы с файлами и папками.
+"""
+
+import os
+import os.path
+import errno
+import stat
+import glob
+import fnmatch
+import shutil
+import datetime
+
+try:
+    # Быстрый обход папок с получением атрибутов файлов за один проход
+    from os import scandir
+except ImportError:
+    try:
+        from scandir import scandir
+    except ImportError:
+        scandir = None
+
+from . import log
+
+__version__ = (0, 0, 2, 2)
+
+
+def get_archive_dirname(archive_dir, dt=None):
+    """
+    Определить папку архива с учетом даты.
+    В имени папки архива можно указывать формат даты
+    (например /data/archive/%Y-%m-%d).
+    @param archive_dir: Папка архива/формат папки архива.
+    @param dt: Дата-время для заполнения формата. Если не определено, то берется текущее.
+    @return: Полное имя папки архива.
+    """
+    if dt is None:
+        dt = datetime.datetime.now()
+    if '%' in archive_dir:
+        archive_dir = dt.strftime(archive_dir)
+    return os.path.abspath(os.path.normpath(archive_dir))
+
+
+def _get_unique_filename(filename):
+    """
+    Получить не занятое имя файла.
+    Если файл уже существует, то к имени добавляется порядковый номер.
+    @param filename: Полное имя файла.
+    @return: Не занятое имя файла.
+    """
+    if not os.path.exists(filename):
+        return filename
+    base_filename, ext = os.path.splitext(filename)
+    i = 1
+    while os.path.exists('%s.%d%s' % (base_filename, i, ext)):
+        i += 1
+    return '%s.%d%s' % (base_filename, i, ext)
+
+
+def move_file_atomic(src_filename, dst_dirname):
+    """
+    Атомарно переместить файл в папку.
+    Внутри одной файловой системы перемещение производится переименованием.
+    Если папка находится на другой файловой системе, то файл сначала копируется
+    во временный файл в папке назначения, а затем переименовывается.
+    @param src_filename: Полное имя перемещаемого файла.
+    @param dst_dirname: Папка назначения.
+    @return: Полное имя файла в папке назначения или None в случае ошибки.
+    """
+    try:
+        if not os.path.exists(dst_dirname):
+            log.info(u'Создание папки <%s>' % dst_dirname)
+            os.makedirs(dst_dirname)
+
+        dst_filename = _get_unique_filename(os.path.join(dst_dirname, os.path.basename(src_filename)))
+        try:
+            os.rename(src_filename, dst_filename)
+        except OSError, err:
+            if err.errno != errno.EXDEV:
+                raise
+            # Папка назначения на другой файловой системе
+            tmp_filename = dst_filename + '.tmp'
+            shutil.copy2(src_filename, tmp_filename)
+            tmp_file = open(tmp_filename, 'rb')
+            try:
+                os.fsync(tmp_file.fileno())
+            finally:
+                tmp_file.close()
+            os.rename(tmp_filename, dst_filename)
+            os.remove(src_filename)
+        return dst_filename
+    except:
+        log.fatal(u'Ошибка перемещения файла <%s> в папку <%s>' % (src_filename, dst_dirname))
+    return None
+
+
+def fsync_dir(dirname):
+    """
+    Сбросить на диск изменения содержимого папки.
+    Необходимо для гарантированного сохранения результатов переименования файлов.
+    На платформах, не поддерживающих открытие папок, функция ничего не делает.
+    @param dirname: Папка.
+    @return: True/False.
+    """
+    if not hasattr(os, 'O_DIRECTORY'):
+        return False
+
+    dir_fd = None
+    try:
+        dir_fd = os.open(dirname, os.O_RDONLY | os.O_DIRECTORY)
+        os.fsync(dir_fd)
+        os.close(dir_fd)
+        return True
+    except OSError:
+        if dir_fd is not None:
+            os.close(dir_fd)
+        log.warning(u'Ошибка сброса на диск содержимого папки <%s>' % dirname)
+    return False
+
+
+def fsync_dirs(dirnames):
+    """
+    Сбросить на диск изменения содержимого нескольких папок.
+    Каждая папка обрабатывается один раз.
+    @param dirnames: Список папок.
+    @return: True/False.
+    """
+    result = True
+    for dirname in set(dirnames):
+        result = fsync_dir(dirname) and result
+    return result
+
+
+def _is_pattern(path):
+    """
+    Проверка является ли путь шаблоном.
+    @param path: Путь.
+    @return: True/False.
+    """
+    return '*' in path or '?' in path or '[' in path
+
+
+def scan_files(filename_pattern):
+    """
+    Получить список файлов по шаблону вместе с атрибутами.
+    Атрибуты файлов собираются за один проход обхода папки.
+    @param filename_pattern: Шаблон имен файлов (например /data/in/*.xml).
+    @return: Список кортежей (Полный путь, Размер, Время модификации).
+    """
+    dirname, basename_pattern = os.path.split(os.path.abspath(filename_pattern))
+    # Как и glob, скрытые файлы учитываем только если это явно указано в шаблоне
+    is_hidden = basename_pattern.startswith('.')
+    result = list()
+    if _is_pattern(dirname):
+        # Шаблон задан и в имени папки. Обходим все найденные файлы
+        for filename in glob.glob(filename_pattern):
+            try:
+                file_stat = os.stat(filename)
+            except OSError:
+                continue
+            # Как и при обходе одной папки, учитываем только обычные файлы
+            if stat.S_ISREG(file_stat.st_mode):
+                result.append((os.path.abspath(filename), file_stat.st_size, file_stat.st_mtime))
+        return result
+
+    if not os.path.isdir(dirname):
+        return result
+
+    if scandir is not None:
+        for entry in scandir(dirname):
+            if not fnmatch.fnmatch(entry.name, basename_pattern):
+                continue
+            if entry.name.startswith('.') and not is_hidden:
+                continue
+            try:
+                if not entry.is_file():
+                    continue
+                file_stat = entry.stat()
+            except OSError:
+                continue
+            result.append((os.path.join(dirname, entry.name), file_stat.st_size, file_stat.st_mtime))
+    else:
+        for name in fnmatch.filter(os.listdir(dirname), basename_pattern):
+            if name.startswith('.') and not is_hidden:
+                continue
+            filename = os.path.join(dirname, name)
+            try:
+                file_stat = os.stat(filename)
+            except OSError:
+                continue
+            if stat.S_ISREG(file_stat.st_mode):
+                result.append((filename, file_stat.st_size, file_stat.st_mtime))
+    return result
@@ -14,6 +14,7 @@ CFG файлы - простые файлы настроек
 
 import os.path
 import re
+import ast
 
 import utils
 try:
@@ -21,7 +22,7 @@ try:
 except:
     print('ERROR! Import error ConfigParser module')
 
-__version__ = (0, 0, 3, 1)
+__version__ = (0, 0, 3, 2)
 
 CFG_FILE_EXT = '.cfg'
 INI_FILE_EXT = '.ini'
@@ -298,6 +299,24 @@ def getParamNamesINI(sINIFileName, sSection):
     return None
 
 
+def parseINIValue(sValue):
+    """
+    Преобразование строкового значения параметра INI файла.
+    Возможно в виде параметра записан словарь/список/None/число и т.д.
+    Допускаются только литералы Python. Никакой код при этом не выполняется.
+    @param sValue: Строковое значение параметра.
+    @return: Значение параметра или исходная строка,
+        если значение не является литералом Python.
+    """
+    if not sValue:
+        return sValue
+    try:
+        return ast.literal_eval(sValue)
+    except:
+        # Нет вроде строка
+        return sValue
+
+
 def INI2Dict(sINIFileName):
     """
     Представление содержимого INI файла в виде словаря.
@@ -325,13 +344,7 @@ def INI2Dict(sINIFileName):
             settings[section] = {}
             for param in params:
                 param_str = ini_parser.get(section, param)
-                try:
-                    # Возможно в виде параметра записан словарь/список/None/число и т.д.
-                    param_value = eval(param_str)
-                except:
-                    # Нет вроде строка
-                    param_value = param_str
-                settings[section][param] = param_value
+                settings[section][param] = parseINIValue(param_str)
         
         return settings
     except:
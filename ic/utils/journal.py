@@ -5,20 +5,54 @@
 Функции поддержки ведения простого файлового журнала.
 Используется для журналирования сообщений прикладного уровня.
 Такие журналы необходимы для диагностики отказов прикладной системы.
+
+Файл журнала открывается один раз в режиме добавления.
+Сообщения накапливаются в буфере и записываются в файл пакетом
+при превышении размера буфера, по истечении периода сброса
+или явным вызовом функции flush (например в конце такта).
+Если в имени файла журнала присутствует текущая дата, то
+при смене даты журнал автоматически переключается на новый файл.
 """
 
+import os
+import os.path
+import time
+import atexit
 import datetime
+import threading
 from . import log
-from . import txtfunc
+from . import ic_extend
+from . import metrics
 # from ic.utils import ic_str
 
-__version__ = (0, 0, 1, 1)
+__version__ = (0, 0, 2, 3)
 
 LOG_FILENAME = None
 IS_DATETIME = True
 IS_PRINT = False
 LOG_ENCODING = None
 
+# Размер буфера сообщений в байтах, при превышении которого буфер сбрасывается в файл.
+# Если файл журнала недоступен, то при превышении этого размера накопленные сообщения отбрасываются
+FLUSH_BUFFER_SIZE = 64 * 1024
+# Период сброса буфера сообщений в файл в секундах
+FLUSH_PERIOD = 5
+
+# Блокировка записи в журнал из разных потоков
+_write_lock = threading.Lock()
+
+# Открытый файл журнала
+_journal_file = None
+# Полное имя открытого файла журнала
+_journal_filename = None
+# Дата, указанная в имени файла журнала. Используется для ежедневной смены файла
+_journal_date = None
+# Буфер сообщений
+_buffer = list()
+_buffer_size = 0
+# Время последнего сброса буфера
+_flush_time = 0
+
 
 def init(sLogFileName, bDateTime=True, bPrint=False,
          sEncoding=log.DEFAULT_ENCODING):
@@ -31,10 +65,136 @@ def init(sLogFileName, bDateTime=True, bPrint=False,
     @param sEncoding: Кодовая страница журнала.
     @return: True/False.
     """
-    globals()['LOG_FILENAME'] = sLogFileName
-    globals()['IS_DATETIME'] = bDateTime
-    globals()['IS_PRINT'] = bPrint
-    globals()['LOG_ENCODING'] = sEncoding
+    global _journal_date
+
+    with _write_lock:
+        _close()
+
+        globals()['LOG_FILENAME'] = sLogFileName
+        globals()['IS_DATETIME'] = bDateTime
+        globals()['IS_PRINT'] = bPrint
+        globals()['LOG_ENCODING'] = sEncoding
+
+        today = datetime.date.today()
+        _journal_date = today if sLogFileName and today.isoformat() in sLogFileName else None
+    return True
+
+
+def _get_filename():
+    """
+    Определить полное имя файла журнала.
+    @return: Полное имя файла журнала.
+    """
+    log_filename = globals()['LOG_FILENAME']
+    if '~' in log_filename:
+        return ic_extend.normpath(log_filename, ic_extend.get_login())
+    return os.path.abspath(os.path.normpath(log_filename))
+
+
+def _open(filename):
+    """
+    Открыть файл журнала в режиме добавления.
+    @param filename: Полное имя файла журнала.
+    @return: True/False.
+    """
+    global _journal_file
+    global _journal_filename
+
+    try:
+        dirname = os.path.dirname(filename)
+        if dirname and not os.path.exists(dirname):
+            os.makedirs(dirname)
+        _journal_file = open(filename, 'ab')
+        _journal_filename = filename
+        return True
+    except:
+        log.fatal(u'Ошибка открытия файла журнала <%s>' % filename)
+        _journal_file = None
+        _journal_filename = None
+    return False
+
+
+def _write_buffer():
+    """
+    Записать накопленный буфер сообщений в файл журнала.
+    Вызывается под блокировкой записи.
+    @return: True/False.
+    """
+    global _buffer
+    global _buffer_size
+    global _flush_time
+
+    _flush_time = time.time()
+    if not _buffer:
+        return True
+
+    if _journal_file is not None or _open(_get_filename()):
+        try:
+            _journal_file.write(''.join(_buffer))
+            _journal_file.flush()
+            _buffer = list()
+            _buffer_size = 0
+            return True
+        except:
+            log.fatal(u'Ошибка записи в файл журнала <%s>' % _journal_filename)
+            # При следующей записи файл будет открыт заново
+            _reset_file()
+
+    # Пока журнал недоступен, буфер не должен расти неограниченно
+    if _buffer_size >= FLUSH_BUFFER_SIZE:
+        log.error(u'Файл журнала недоступен. Отброшено <%d> сообщений' % len(_buffer))
+        metrics.inc_counter('journal_dropped_messages_total', len(_buffer))
+        _buffer = list()
+        _buffer_size = 0
+    return False
+
+
+def _reset_file():
+    """
+    Закрыть файл журнала без записи буфера.
+    Вызывается под блокировкой записи.
+    """
+    global _journal_file
+    global _journal_filename
+
+    if _journal_file is not None:
+        try:
+            _journal_file.close()
+        except:
+            pass
+    _journal_file = None
+    _journal_filename = None
+
+
+def _close():
+    """
+    Сбросить буфер и закрыть файл журнала.
+    Вызывается под блокировкой записи.
+    """
+    global _journal_file
+    global _journal_filename
+
+    _write_buffer()
+    if _journal_file is not None:
+        try:
+            _journal_file.close()
+        except:
+            log.fatal(u'Ошибка закрытия файла журнала <%s>' % _journal_filename)
+    _journal_file = None
+    _journal_filename = None
+
+
+def _rotate(dt):
+    """
+    Переключить журнал на файл новой даты.
+    Вызывается под блокировкой записи.
+    @param dt: Новая дата.
+    """
+    global _journal_date
+
+    _close()
+    globals()['LOG_FILENAME'] = globals()['LOG_FILENAME'].replace(_journal_date.isoformat(), dt.isoformat())
+    _journal_date = dt
 
 
 def write_msg(sMessage):
@@ -43,16 +203,21 @@ def write_msg(sMessage):
     @param sMessage: Текст сообщения.
     @return: True/False.
     """
+    global _buffer_size
+
     log_filename = globals()['LOG_FILENAME']
     is_datetime = globals()['IS_DATETIME']
     is_print = globals()['IS_PRINT']
     log_encoding = globals()['LOG_ENCODING']
 
+    if not log_filename:
+        return False
+
     if is_print:
         log.print_color_txt(sMessage, sColor=log.PURPLE_COLOR_TEXT)
 
+    now = datetime.datetime.now()
     if is_datetime:
-        now = datetime.datetime.now()
         sMessage = u'%s %s' % (now.strftime(log.LOG_DATETIME_FMT), sMessage)
 
     try:
@@ -60,4 +225,36 @@ def write_msg(sMessage):
     except:
         log.fatal(u'Ошибка преобразования сообщения к текстовому виду. Кодовая страница <%s>' % log_encoding)
         msg = ''
-    return txtfunc.text_file_append(log_filename, msg)
+
+    with _write_lock:
+        today = now.date()
+        if _journal_date is not None and today != _journal_date:
+            _rotate(today)
+
+        _buffer.append(msg + os.linesep)
+        metrics.inc_counter('journal_messages_total')
+        _buffer_size += len(msg) + len(os.linesep)
+        if _buffer_size >= FLUSH_BUFFER_SIZE or (time.time() - _flush_time) >= FLUSH_PERIOD:
+            return _write_buffer()
+    return True
+
+
+def flush():
+    """
+    Принудительно записать накопленные сообщения в файл журнала.
+    @return: True/False.
+    """
+    with _write_lock:
+        return _write_buffer()
+
+
+def close():
+    """
+    Записать накопленные сообщения и закрыть файл журнала.
+    """
+    with _write_lock:
+        _close()
+
+
+# Не потерять накопленные сообщения при завершении программы
+atexit.register(close)
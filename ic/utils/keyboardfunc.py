@@ -15,7 +15,7 @@ elif sys.platform.lower().startswith('lin'):
     import select
 
 
-__version__ = (0, 0, 1, 1)
+__version__ = (0, 0, 1, 2)
 
 # Коды клавиш
 ESC_KEY = 27
@@ -23,6 +23,20 @@ ENTER_KEY = 13
 SPACE_KEY = 32
 
 
+def is_tty():
+    """
+    Проверка подключен ли стандартный ввод к терминалу.
+    При запуске службой (systemd, cron) терминала нет и
+    опрашивать клавиатуру нельзя.
+    @return: True - терминал есть / False - нет.
+    """
+    try:
+        return sys.stdin is not None and sys.stdin.isatty()
+    except (AttributeError, ValueError):
+        # Стандартный ввод закрыт или подменен
+        return False
+
+
 def getch():
     """
     Функция получения кода нажатой клавиши с ожиданием ввода.
@@ -59,12 +73,15 @@ def getchAsync():
     """
     Функция получения кода нажатой клавиши с ожиданием ввода.
     Функция создавалась как кросплатформенная.
+    Если терминала нет, то всегда возвращается None.
     @return: Код нажатой клавиши или None если ничего не нажато.
     """
     if sys.platform.lower().startswith('win'):
         if msvcrt.kbhit():
             return msvcrt.getch()
     elif sys.platform.lower().startswith('lin'):
+        if not is_tty():
+            return None
         c = None
         old_settings = termios.tcgetattr(sys.stdin)
         try:
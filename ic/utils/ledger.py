@@ -0,0 +1,213 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Реестр обработанных файлов.
+
+Реестр позволяет источникам данных не обрабатывать повторно
+уже прочитанные и не изменившиеся файлы.
+Файл идентифицируется по полному пути, времени модификации, размеру и
+(необязательно) контрольной сумме содержимого.
+Реестр хранится в компактном бинарном виде в папке профиля программы.
+"""
+
+import os
+import os.path
+import hashlib
+
+try:
+    import cPickle as pickle
+except ImportError:
+    import pickle
+
+from . import log
+
+__version__ = (0, 0, 1, 1)
+
+# Расширение файла реестра
+LEDGER_FILE_EXT = '.ldg'
+
+# Размер блока чтения файла при подсчете контрольной суммы
+HASH_BLOCK_SIZE = 1024 * 1024
+
+
+def get_file_hash(filename):
+    """
+    Подсчет контрольной суммы содержимого файла.
+    @param filename: Полное имя файла.
+    @return: Строка контрольной суммы или None в случае ошибки.
+    """
+    f = None
+    try:
+        md5 = hashlib.md5()
+        f = open(filename, 'rb')
+        block = f.read(HASH_BLOCK_SIZE)
+        while block:
+            md5.update(block)
+            block = f.read(HASH_BLOCK_SIZE)
+        f.close()
+        return md5.hexdigest()
+    except:
+        if f:
+            f.close()
+        log.fatal(u'Ошибка подсчета контрольной суммы файла <%s>' % filename)
+    return None
+
+
+class icFileLedger(object):
+    """
+    Реестр обработанных файлов.
+    Каждой записи реестра соответствует кортеж (время модификации, размер, контрольная сумма).
+    """
+    def __init__(self, ledger_filename, use_hash=False):
+        """
+        Конструктор.
+        @param ledger_filename: Полное имя файла реестра.
+        @param use_hash: Использовать контрольную сумму содержимого файла?
+            Если включено, то файл с измененным временем модификации,
+            но с тем же содержимым, не считается измененным.
+        """
+        self.ledger_filename = ledger_filename
+        self.use_hash = use_hash
+
+        # Словарь записей {Полный путь: (mtime, size, hash)}
+        self.records = dict()
+        # Признак изменения реестра после загрузки
+        self.is_modified = False
+
+        self.load()
+
+    def load(self):
+        """
+        Загрузить реестр из файла.
+        @return: True/False.
+        """
+        self.records = dict()
+        self.is_modified = False
+        if not os.path.exists(self.ledger_filename):
+            return True
+
+        ledger_file = None
+        try:
+            ledger_file = open(self.ledger_filename, 'rb')
+            self.records = pickle.load(ledger_file)
+            ledger_file.close()
+            return True
+        except:
+            if ledger_file:
+                ledger_file.close()
+            log.fatal(u'Ошибка загрузки реестра обработанных файлов <%s>' % self.ledger_filename)
+            self.records = dict()
+        return False
+
+    def save(self):
+        """
+        Сохранить реестр в файл.
+        Запись производится через временный файл для исключения
+        порчи реестра при аварийном завершении программы.
+        @return: True/False.
+        """
+        if not self.is_modified:
+            return True
+
+        tmp_filename = self.ledger_filename + '.tmp'
+        ledger_file = None
+        try:
+            ledger_dirname = os.path.dirname(self.ledger_filename)
+            if ledger_dirname and not os.path.exists(ledger_dirname):
+                os.makedirs(ledger_dirname)
+
+            ledger_file = open(tmp_filename, 'wb')
+            pickle.dump(self.records, ledger_file, pickle.HIGHEST_PROTOCOL)
+            ledger_file.close()
+            os.rename(tmp_filename, self.ledger_filename)
+            self.is_modified = False
+            return True
+        except:
+            if ledger_file:
+                ledger_file.close()
+            log.fatal(u'Ошибка сохранения реестра обработанных файлов <%s>' % self.ledger_filename)
+        return False
+
+    def _get_stat(self, filename):
+        """
+        Получить ключевые атрибуты файла.
+        @param filename: Полное имя файла.
+        @return: Кортеж (mtime, size) или None если файл не доступен.
+        """
+        try:
+            file_stat = os.stat(filename)
+            return file_stat.st_mtime, file_stat.st_size
+        except OSError:
+            return None
+
+    def is_changed(self, filename):
+        """
+        Проверка является ли файл новым или измененным после последней регистрации.
+        @param filename: Имя файла.
+        @return: True - файл новый или изменен / False - файл уже обработан.
+        """
+        filename = os.path.abspath(filename)
+        file_stat = self._get_stat(filename)
+        if file_stat is None:
+            return False
+
+        record = self.records.get(filename, None)
+        if record is None:
+            return True
+        if record[:2] == file_stat:
+            return False
+
+        if self.use_hash and record[2] is not None:
+            # Атрибуты изменились. Окончательное решение за содержимым
+            if get_file_hash(filename) == record[2]:
+                # Содержимое не изменилось. Обновляем только атрибуты
+                self.records[filename] = file_stat + (record[2],)
+                self.is_modified = True
+                return False
+        return True
+
+    def filter_changed(self, filenames):
+        """
+        Отфильтровать из списка только новые или измененные файлы.
+        @param filenames: Список имен файлов.
+        @return: Список новых или измененных файлов.
+        """
+        return [filename for filename in filenames if self.is_changed(filename)]
+
+    def register(self, filename):
+        """
+        Зарегистрировать файл в реестре как обработанный.
+        @param filename: Имя файла.
+        @return: True/False.
+        """
+        filename = os.path.abspath(filename)
+        file_stat = self._get_stat(filename)
+        if file_stat is None:
+            return False
+
+        file_hash = get_file_hash(filename) if self.use_hash else None
+        self.records[filename] = file_stat + (file_hash,)
+        self.is_modified = True
+        return True
+
+    def prune(self, filenames=None):
+        """
+        Удалить из реестра записи о файлах, которые больше не существуют.
+        Таким образом размер реестра остается пропорциональным
+        количеству реально присутствующих файлов.
+        @param filenames: Список актуальных файлов источника.
+            Если определен, то существование файлов не проверяется,
+            а остаются только записи из этого списка.
+        @return: Количество удаленных записей.
+        """
+        if filenames is not None:
+            actual_filenames = set([os.path.abspath(filename) for filename in filenames])
+            lost_filenames = [filename for filename in self.records.keys() if filename not in actual_filenames]
+        else:
+            lost_filenames = [filename for filename in self.records.keys() if not os.path.exists(filename)]
+        for filename in lost_filenames:
+            del self.records[filename]
+        if lost_filenames:
+            self.is_modified = True
+        return len(lost_filenames)
@@ -0,0 +1,139 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Функции межпроцессных блокировок на основе файлов.
+
+Блокировка захватывается на открытый файл средствами ОС
+(fcntl.flock под Linux, msvcrt.locking под Windows).
+Захват не требует запуска внешних программ и при аварийном
+завершении процесса блокировка автоматически снимается ОС.
+В файл блокировки записывается идентификатор процесса-владельца
+для диагностики.
+"""
+
+import os
+import os.path
+import hashlib
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+    import msvcrt
+
+from . import log
+
+__version__ = (0, 0, 1, 2)
+
+# Расширение файлов блокировок
+LOCK_FILE_EXT = '.lock'
+
+
+def get_lock_filename(filename, lock_dir, prefix=''):
+    """
+    Имя файла блокировки, соответствующего файлу.
+    Разные файлы (в том числе одноименные файлы в разных папках)
+    получают разные файлы блокировок.
+    @param filename: Имя файла, доступ к которому блокируется (например файла настроек).
+    @param lock_dir: Папка файлов блокировок.
+    @param prefix: Префикс имени файла блокировки.
+    @return: Полное имя файла блокировки.
+    """
+    filename = os.path.normcase(os.path.abspath(filename))
+    if isinstance(filename, unicode):
+        filename = filename.encode('utf-8')
+    basename = os.path.splitext(os.path.basename(filename))[0]
+    path_hash = hashlib.md5(filename).hexdigest()[:8]
+    return os.path.join(lock_dir, '%s%s_%s%s' % (prefix, basename, path_hash, LOCK_FILE_EXT))
+
+
+class icFileLock(object):
+    """
+    Межпроцессная блокировка на основе файла.
+    """
+    def __init__(self, lock_filename):
+        """
+        Конструктор.
+        @param lock_filename: Полное имя файла блокировки.
+        """
+        self.lock_filename = lock_filename
+        self.lock_file = None
+
+    def is_locked(self):
+        """
+        Блокировка захвачена текущим процессом?
+        """
+        return self.lock_file is not None
+
+    def acquire(self):
+        """
+        Захватить блокировку без ожидания.
+        @return: True - блокировка захвачена / False - блокировка занята другим процессом или ошибка.
+        """
+        if self.lock_file is not None:
+            return True
+
+        lock_file = None
+        try:
+            dirname = os.path.dirname(self.lock_filename)
+            if dirname and not os.path.exists(dirname):
+                os.makedirs(dirname)
+            # Файл не усекается при открытии, чтобы не затереть PID владельца блокировки
+            lock_file = open(self.lock_filename, 'a+')
+            if fcntl is not None:
+                # Дескриптор не должен наследоваться запускаемыми процессами,
+                # иначе блокировка остается захваченной после завершения регистратора,
+                # пока работают запущенные им в фоне команды
+                flags = fcntl.fcntl(lock_file.fileno(), fcntl.F_GETFD)
+                fcntl.fcntl(lock_file.fileno(), fcntl.F_SETFD, flags | fcntl.FD_CLOEXEC)
+                fcntl.flock(lock_file.fileno(), fcntl.LOCK_EX | fcntl.LOCK_NB)
+            else:
+                lock_file.seek(0)
+                msvcrt.locking(lock_file.fileno(), msvcrt.LK_NBLCK, 1)
+        except (IOError, OSError):
+            if lock_file is not None:
+                lock_file.close()
+            return False
+
+        try:
+            lock_file.seek(0)
+            lock_file.truncate()
+            lock_file.write('%d\n' % os.getpid())
+            lock_file.flush()
+        except (IOError, OSError):
+            log.fatal(u'Ошибка записи PID в файл блокировки <%s>' % self.lock_filename)
+        self.lock_file = lock_file
+        return True
+
+    def release(self):
+        """
+        Освободить блокировку.
+        Файл блокировки не удаляется, т.к. его в этот момент может захватывать другой процесс.
+        """
+        if self.lock_file is None:
+            return
+        try:
+            if fcntl is not None:
+                fcntl.flock(self.lock_file.fileno(), fcntl.LOCK_UN)
+            else:
+                self.lock_file.seek(0)
+                msvcrt.locking(self.lock_file.fileno(), msvcrt.LK_UNLCK, 1)
+        except (IOError, OSError):
+            log.fatal(u'Ошибка освобождения блокировки <%s>' % self.lock_filename)
+        self.lock_file.close()
+        self.lock_file = None
+
+    def get_owner_pid(self):
+        """
+        Идентификатор процесса-владельца блокировки, записанный в файл блокировки.
+        @return: Идентификатор процесса или None, если не определен.
+        """
+        try:
+            lock_file = open(self.lock_filename, 'r')
+            try:
+                return int(lock_file.read().strip())
+            finally:
+                lock_file.close()
+        except (IOError, ValueError):
+            return None
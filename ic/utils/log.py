@@ -56,8 +56,22 @@ import os.path
 import stat
 import traceback
 import locale
+import atexit
+import threading
+import Queue
 
-__version__ = (0, 0, 3, 5)
+__version__ = (0, 0, 4, 2)
+
+# Уровни сообщений
+DEBUG = logging.DEBUG
+INFO = logging.INFO
+WARNING = logging.WARNING
+ERROR = logging.ERROR
+FATAL = logging.FATAL
+
+# Максимальный размер очереди асинхронного вывода сообщений.
+# При заполнении очереди вызывающий поток ожидает освобождения места
+LOG_QUEUE_SIZE = 10000
 
 # Кодировка коммандной оболочки по умолчанию
 DEFAULT_ENCODING = sys.stdout.encoding if sys.platform.startswith('win') else locale.getpreferredencoding()
@@ -74,6 +88,11 @@ NORMAL_COLOR_TEXT = '\x1b[0m'       # normal
 
 LOG_DATETIME_FMT = '%Y-%m-%d %H:%M:%S'
 
+# Очередь и поток асинхронного вывода сообщений
+_log_queue = None
+_log_thread = None
+_log_lock = threading.Lock()
+
 
 def print_color_txt(sTxt, sColor=NORMAL_COLOR_TEXT):
     if type(sTxt) == unicode:
@@ -130,6 +149,30 @@ def get_log_mode():
     return False
 
 
+def get_log_level():
+    """
+    Определить минимальный уровень выводимых сообщений.
+    По умолчанию выводятся все сообщения.
+    @return: Уровень сообщений.
+    """
+    global CONFIG
+    if CONFIG is not None and hasattr(CONFIG, 'LOG_LEVEL'):
+        return CONFIG.LOG_LEVEL
+    return DEBUG
+
+
+def get_async_mode():
+    """
+    Определить режим асинхронного вывода сообщений.
+    По умолчанию считаем что режим выключен.
+    @return: True - сообщения выводятся в фоновом потоке / False - в вызывающем потоке.
+    """
+    global CONFIG
+    if CONFIG is not None and hasattr(CONFIG, 'LOG_ASYNC'):
+        return CONFIG.LOG_ASYNC
+    return False
+
+
 def init(mConfig=None, sLogFileName=None):
     """
     Инициализация файла лога.
@@ -166,92 +209,195 @@ def init(mConfig=None, sLogFileName=None):
         print_color_txt('INFO. Init log %s' % sLogFileName, GREEN_COLOR_TEXT)
 
 
-def debug(sMsg=u'', bForcePrint=False, bForceLog=False):
+def is_enabled(level=DEBUG):
     """
-    Вывести ОТЛАДОЧНУЮ информацию.
-    @param sMsg: Текстовое сообщение.
+    Проверка включен ли вывод сообщений указанного уровня.
+    Используется в местах вызова для исключения подготовки
+    дорогих для формирования сообщений, которые все равно не будут выведены.
+    @param level: Уровень сообщений (DEBUG, INFO, WARNING, ERROR, FATAL).
+    @return: True - сообщения уровня выводятся на экран или в журнал / False - нет.
+    """
+    if CONFIG is None:
+        return True
+    return (get_debug_mode() or get_log_mode()) and level >= get_log_level()
+
+
+def _format_msg(sMsg, args):
+    """
+    Форматирование сообщения.
+    Производится только если сообщение действительно будет выведено.
+    @param sMsg: Текстовое сообщение или шаблон сообщения.
+    @param args: Аргументы шаблона сообщения.
+    @return: Текстовое сообщение.
+    """
+    if args:
+        try:
+            return sMsg % args
+        except:
+            return u'%s %s' % (sMsg, args)
+    return sMsg
+
+
+def _output(level, prefix, color, msg, do_print, do_log):
+    """
+    Вывод подготовленного сообщения на экран и в журнал.
+    @param level: Уровень сообщения.
+    @param prefix: Префикс сообщения при выводе на экран.
+    @param color: Цвет сообщения при выводе на экран.
+    @param msg: Текстовое сообщение.
+    @param do_print: Вывести на экран?
+    @param do_log: Записать в журнал?
+    """
+    if do_print:
+        print_color_txt(prefix + msg, color)
+    if do_log:
+        logging.log(level, msg)
+
+
+def _log_worker():
+    """
+    Цикл обработки очереди асинхронного вывода сообщений.
+    """
+    while True:
+        record = _log_queue.get()
+        try:
+            _output(*record)
+        except:
+            # Здесь уже некуда сообщать об ошибке
+            pass
+        finally:
+            _log_queue.task_done()
+
+
+def _start_log_worker():
+    """
+    Запустить поток асинхронного вывода сообщений, если он еще не запущен.
+    """
+    global _log_queue
+    global _log_thread
+
+    with _log_lock:
+        if _log_thread is None:
+            _log_queue = Queue.Queue(LOG_QUEUE_SIZE)
+            _log_thread = threading.Thread(target=_log_worker, name='async_log')
+            _log_thread.daemon = True
+            _log_thread.start()
+
+
+def get_queue_size():
+    """
+    Количество сообщений, ожидающих асинхронного вывода.
+    """
+    return _log_queue.qsize() if _log_queue is not None else 0
+
+
+def flush():
+    """
+    Дождаться вывода всех сообщений из очереди асинхронного вывода.
+    """
+    if _log_thread is not None:
+        _log_queue.join()
+
+
+def _write(level, prefix, color, sMsg, args, bForcePrint, bForceLog):
+    """
+    Вывести сообщение.
+    Уровень сообщения проверяется до форматирования сообщения.
+    В режиме асинхронного журналирования вывод производится в фоновом потоке.
+    @param level: Уровень сообщения.
+    @param prefix: Префикс сообщения при выводе на экран.
+    @param color: Цвет сообщения при выводе на экран.
+    @param sMsg: Текстовое сообщение или шаблон сообщения.
+    @param args: Аргументы шаблона сообщения.
     @param bForcePrint: Принудительно вывести на экран.
     @param bForceLog: Принудительно записать в журнале.
     """
-    global CONFIG
-    
     if CONFIG:
-        if get_debug_mode() or bForcePrint:
-            print_color_txt('DEBUG. '+sMsg, BLUE_COLOR_TEXT)
-        if get_log_mode() or bForceLog:
-            logging.debug(sMsg)
+        is_level = level >= get_log_level()
+        do_print = (get_debug_mode() and is_level) or bForcePrint
+        do_log = (get_log_mode() and is_level) or bForceLog
+        if not do_print and not do_log:
+            return
+        msg = _format_msg(sMsg, args)
+        if get_async_mode():
+            _start_log_worker()
+            _log_queue.put((level, prefix, color, msg, do_print, do_log))
+        else:
+            _output(level, prefix, color, msg, do_print, do_log)
     else:
         print_color_txt('Not init log system.', PURPLE_COLOR_TEXT)
-        print_color_txt('DEBUG. ' + sMsg, BLUE_COLOR_TEXT)
+        print_color_txt(prefix + _format_msg(sMsg, args), color)
+
+
+def debug(sMsg=u'', *args, **kwargs):
+    """
+    Вывести ОТЛАДОЧНУЮ информацию.
+    @param sMsg: Текстовое сообщение или шаблон сообщения.
+    @param args: Аргументы шаблона сообщения.
+        Форматирование производится только если сообщение будет выведено.
+    @param kwargs: bForcePrint - Принудительно вывести на экран.
+        bForceLog - Принудительно записать в журнале.
+    """
+    _write(DEBUG, 'DEBUG. ', BLUE_COLOR_TEXT, sMsg, args,
+           kwargs.get('bForcePrint', False), kwargs.get('bForceLog', False))
 
 
-def info(sMsg=u'', bForcePrint=False, bForceLog=False):
+def info(sMsg=u'', *args, **kwargs):
     """
     Вывести ТЕКСТОВУЮ информацию.
-    @param sMsg: Текстовое сообщение.
-    @param bForcePrint: Принудительно вывести на экран.
-    @param bForceLog: Принудительно записать в журнале.
+    @param sMsg: Текстовое сообщение или шаблон сообщения.
+    @param args: Аргументы шаблона сообщения.
+        Форматирование производится только если сообщение будет выведено.
+    @param kwargs: bForcePrint - Принудительно вывести на экран.
+        bForceLog - Принудительно записать в журнале.
     """
-    global CONFIG
-    
-    if CONFIG:
-        if get_debug_mode() or bForcePrint:
-            print_color_txt('INFO. '+sMsg, GREEN_COLOR_TEXT)
-        if get_log_mode() or bForceLog:
-            logging.info(sMsg)    
-    else:
-        print_color_txt('Not init log system.', PURPLE_COLOR_TEXT)
-        print_color_txt('INFO. ' + sMsg, GREEN_COLOR_TEXT)
+    _write(INFO, 'INFO. ', GREEN_COLOR_TEXT, sMsg, args,
+           kwargs.get('bForcePrint', False), kwargs.get('bForceLog', False))
 
 
-def error(sMsg=u'', bForcePrint=False, bForceLog=False):
+def error(sMsg=u'', *args, **kwargs):
     """
     Вывести ОБЩУЮ информацию.
-    @param sMsg: Текстовое сообщение.
-    @param bForcePrint: Принудительно вывести на экран.
-    @param bForceLog: Принудительно записать в журнале.
+    @param sMsg: Текстовое сообщение или шаблон сообщения.
+    @param args: Аргументы шаблона сообщения.
+        Форматирование производится только если сообщение будет выведено.
+    @param kwargs: bForcePrint - Принудительно вывести на экран.
+        bForceLog - Принудительно записать в журнале.
     """
-    global CONFIG
-    
-    if CONFIG:
-        if get_debug_mode() or bForcePrint:
-            print_color_txt('ERROR. '+sMsg, RED_COLOR_TEXT)
-        if get_log_mode() or bForceLog:
-            logging.error(sMsg)    
-    else:
-        print_color_txt('Not init log system.', PURPLE_COLOR_TEXT)
-        print_color_txt('ERROR. ' + sMsg, RED_COLOR_TEXT)
+    _write(ERROR, 'ERROR. ', RED_COLOR_TEXT, sMsg, args,
+           kwargs.get('bForcePrint', False), kwargs.get('bForceLog', False))
 
 
-def warning(sMsg=u'', bForcePrint=False, bForceLog=False):
+def warning(sMsg=u'', *args, **kwargs):
     """
     Вывести информацию ОБ ПРЕДУПРЕЖДЕНИИ.
-    @param sMsg: Текстовое сообщение.
-    @param bForcePrint: Принудительно вывести на экран.
-    @param bForceLog: Принудительно записать в журнале.
+    @param sMsg: Текстовое сообщение или шаблон сообщения.
+    @param args: Аргументы шаблона сообщения.
+        Форматирование производится только если сообщение будет выведено.
+    @param kwargs: bForcePrint - Принудительно вывести на экран.
+        bForceLog - Принудительно записать в журнале.
     """
-    global CONFIG
-    
-    if CONFIG:
-        if get_debug_mode() or bForcePrint:
-            print_color_txt('WARNING. '+sMsg, YELLOW_COLOR_TEXT)
-        if get_log_mode() or bForceLog:
-            logging.warning(sMsg)    
-    else:
-        print_color_txt('Not init log system.', PURPLE_COLOR_TEXT)
-        print_color_txt('WARNING. ' + sMsg, YELLOW_COLOR_TEXT)
+    _write(WARNING, 'WARNING. ', YELLOW_COLOR_TEXT, sMsg, args,
+           kwargs.get('bForcePrint', False), kwargs.get('bForceLog', False))
 
 
-def fatal(sMsg=u'', bForcePrint=False, bForceLog=False):
+def fatal(sMsg=u'', *args, **kwargs):
     """
     Вывести информацию ОБ ОШИБКЕ.
-    @param sMsg: Текстовое сообщение.
-    @param bForcePrint: Принудительно вывести на экран.
-    @param bForceLog: Принудительно записать в журнале.
+    @param sMsg: Текстовое сообщение или шаблон сообщения.
+    @param args: Аргументы шаблона сообщения.
+        Форматирование производится только если сообщение будет выведено.
+    @param kwargs: bForcePrint - Принудительно вывести на экран.
+        bForceLog - Принудительно записать в журнале.
     """
-    global CONFIG
+    bForcePrint = kwargs.get('bForcePrint', False)
+    bForceLog = kwargs.get('bForceLog', False)
+    if CONFIG and not is_enabled(FATAL) and not bForcePrint and not bForceLog:
+        return
 
+    # Трассировку стека необходимо получить в месте вызова
     trace_txt = traceback.format_exc()
+    sMsg = _format_msg(sMsg, args)
 
     try:
         msg = sMsg+u'\n'+trace_txt
@@ -262,11 +408,8 @@ def fatal(sMsg=u'', bForcePrint=False, bForceLog=False):
             trace_txt = unicode(trace_txt, get_default_encoding())
         msg = sMsg+u'\n'+trace_txt
 
-    if CONFIG:
-        if get_debug_mode() or bForcePrint:
-            print_color_txt('FATAL. '+msg, RED_COLOR_TEXT)
-        if get_log_mode() or bForceLog:
-            logging.fatal(msg)
-    else:
-        print_color_txt('Not init log system.', PURPLE_COLOR_TEXT)
-        print_color_txt('FATAL. ' + msg, RED_COLOR_TEXT)
+    _write(FATAL, 'FATAL. ', RED_COLOR_TEXT, msg, (), bForcePrint, bForceLog)
+
+
+# Дождаться вывода сообщений из очереди при завершении программы
+atexit.register(flush)
@@ -0,0 +1,375 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Функции сбора метрик работы регистратора.
+
+Метрики трех видов:
+    - длительности (время выполнения тиков, объектов, фаз обработки).
+      Для них ведется скользящее окно последних значений и общие
+      количество и сумма значений;
+    - счетчики (количество тиков, ошибок и т.п.);
+    - текущие значения (размер очередей и т.п.).
+Метрика идентифицируется именем и набором меток, например:
+    add_timing('object_seconds', 0.5, object='SRC1', phase='io')
+
+Метрики могут быть опубликованы по HTTP в текстовом формате Prometheus
+(функция start_http_server). Используется только стандартная библиотека.
+"""
+
+import time
+import threading
+import collections
+import BaseHTTPServer
+
+from . import log
+
+__version__ = (0, 0, 2, 2)
+
+# Префикс имен метрик в формате Prometheus
+PROMETHEUS_PREFIX = 'icregistrator_'
+# Путь запроса метрик
+METRICS_HTTP_PATH = '/metrics'
+
+# Размер скользящего окна значений длительностей
+WINDOW_SIZE = 1000
+
+# Квантили, выводимые в сводке
+SUMMARY_QUANTILES = (0.5, 0.9, 0.99)
+
+# Блокировка изменения метрик из разных потоков
+_lock = threading.Lock()
+
+# Словари метрик {(Имя, Метки): Значение}
+TIMINGS = dict()
+COUNTERS = dict()
+GAUGES = dict()
+# Функции получения текущих значений в момент запроса метрик {(Имя, Метки): Функция}
+GAUGE_CALLBACKS = dict()
+
+# HTTP сервер метрик
+_http_server = None
+
+# Время начала сбора метрик
+START_TIME = time.time()
+
+
+class icTiming(object):
+    """
+    Метрика длительности.
+    Квантили и максимум рассчитываются по скользящему окну последних значений,
+    количество и сумма значений накапливаются за все время работы.
+    """
+    def __init__(self, window_size=WINDOW_SIZE):
+        """
+        Конструктор.
+        @param window_size: Размер скользящего окна значений.
+        """
+        self.window = collections.deque(maxlen=window_size)
+        self.count = 0
+        self.sum = 0.0
+        self.last = None
+
+    def add(self, value):
+        """
+        Зарегистрировать значение.
+        @param value: Длительность в секундах.
+        """
+        self.window.append(value)
+        self.count += 1
+        self.sum += value
+        self.last = value
+
+    def get_quantile(self, quantile):
+        """
+        Квантиль значений скользящего окна.
+        @param quantile: Квантиль (0..1).
+        @return: Значение квантиля или None, если значений нет.
+        """
+        if not self.window:
+            return None
+        values = sorted(self.window)
+        idx = min(int(quantile * len(values)), len(values) - 1)
+        return values[idx]
+
+    def get_max(self):
+        """
+        Максимальное значение скользящего окна.
+        """
+        return max(self.window) if self.window else None
+
+    def get_avg(self):
+        """
+        Среднее значение за все время работы.
+        """
+        return self.sum / self.count if self.count else None
+
+
+def _get_key(name, labels):
+    """
+    Ключ метрики.
+    @param name: Имя метрики.
+    @param labels: Словарь меток.
+    @return: Кортеж (Имя, ((Метка, Значение), ...)).
+    """
+    return name, tuple(sorted(labels.items()))
+
+
+def add_timing(name, value, **labels):
+    """
+    Зарегистрировать длительность.
+    @param name: Имя метрики.
+    @param value: Длительность в секундах.
+    @param labels: Метки метрики.
+    """
+    key = _get_key(name, labels)
+    with _lock:
+        timing = TIMINGS.get(key, None)
+        if timing is None:
+            timing = TIMINGS[key] = icTiming()
+        timing.add(value)
+
+
+def inc_counter(name, value=1, **labels):
+    """
+    Увеличить счетчик.
+    @param name: Имя метрики.
+    @param value: Приращение.
+    @param labels: Метки метрики.
+    """
+    key = _get_key(name, labels)
+    with _lock:
+        COUNTERS[key] = COUNTERS.get(key, 0) + value
+
+
+def set_gauge(name, value, **labels):
+    """
+    Установить текущее значение.
+    @param name: Имя метрики.
+    @param value: Значение.
+    @param labels: Метки метрики.
+    """
+    with _lock:
+        GAUGES[_get_key(name, labels)] = value
+
+
+def register_gauge_callback(name, callback, **labels):
+    """
+    Зарегистрировать функцию получения текущего значения.
+    Функция вызывается при каждом запросе метрик.
+    @param name: Имя метрики.
+    @param callback: Функция без аргументов, возвращающая значение.
+    @param labels: Метки метрики.
+    """
+    with _lock:
+        GAUGE_CALLBACKS[_get_key(name, labels)] = callback
+
+
+def get_timing(name, **labels):
+    """
+    Получить метрику длительности.
+    @param name: Имя метрики.
+    @param labels: Метки метрики.
+    @return: Объект icTiming или None, если значения не регистрировались.
+    """
+    return TIMINGS.get(_get_key(name, labels), None)
+
+
+def get_counter(name, **labels):
+    """
+    Получить значение счетчика.
+    @param name: Имя метрики.
+    @param labels: Метки метрики.
+    """
+    return COUNTERS.get(_get_key(name, labels), 0)
+
+
+def clear():
+    """
+    Сбросить все метрики.
+    """
+    global START_TIME
+
+    with _lock:
+        TIMINGS.clear()
+        COUNTERS.clear()
+        GAUGES.clear()
+        START_TIME = time.time()
+
+
+def get_key_label(key):
+    """
+    Текстовое представление ключа метрики.
+    @param key: Ключ метрики.
+    @return: Строка вида имя{метка="значение",...}.
+    """
+    name, labels = key
+    if not labels:
+        return name
+    return u'%s{%s}' % (name, u','.join([u'%s="%s"' % (label, value) for label, value in labels]))
+
+
+def get_summary():
+    """
+    Сводка метрик.
+    @return: Список строк сводки.
+    """
+    lines = list()
+    with _lock:
+        for key, timing in sorted(TIMINGS.items()):
+            quantiles = u' '.join([u'p%d=%.3f' % (quantile * 100, timing.get_quantile(quantile))
+                                   for quantile in SUMMARY_QUANTILES])
+            lines.append(u'%s: count=%d avg=%.3f %s max=%.3f' % (get_key_label(key), timing.count,
+                                                                 timing.get_avg(), quantiles, timing.get_max()))
+        counters = sorted(COUNTERS.items())
+        gauges = sorted(GAUGES.items())
+
+    for key, value in counters + gauges:
+        lines.append(u'%s: %s' % (get_key_label(key), value))
+    return lines
+
+
+def log_summary():
+    """
+    Вывести сводку метрик.
+    Сводка выводится принудительно, не зависимо от режима отладки.
+    """
+    lines = get_summary()
+    if not lines:
+        return
+    log.info(u'Сводка метрик за %.1f сек.:' % (time.time() - START_TIME), bForcePrint=True)
+    for line in lines:
+        log.info(u'\t%s', line, bForcePrint=True)
+
+
+def _update_gauge_callbacks():
+    """
+    Обновить текущие значения, получаемые через функции.
+    """
+    for key, callback in GAUGE_CALLBACKS.items():
+        try:
+            value = callback()
+        except:
+            log.fatal(u'Ошибка получения значения метрики <%s>' % get_key_label(key))
+            continue
+        with _lock:
+            GAUGES[key] = value
+
+
+def _escape_label_value(value):
+    """
+    Экранирование значения метки в формате Prometheus.
+    """
+    return unicode(value).replace(u'\\', u'\\\\').replace(u'"', u'\\"').replace(u'\n', u'\\n')
+
+
+def _get_prometheus_label(key, **extra_labels):
+    """
+    Имя метрики с метками в формате Prometheus.
+    @param key: Ключ метрики.
+    @param extra_labels: Дополнительные метки.
+    """
+    name, labels = key
+    labels = list(labels) + sorted(extra_labels.items())
+    label_txt = u','.join([u'%s="%s"' % (label, _escape_label_value(value)) for label, value in labels])
+    if label_txt:
+        return u'%s%s{%s}' % (PROMETHEUS_PREFIX, name, label_txt)
+    return PROMETHEUS_PREFIX + name
+
+
+def get_prometheus_text():
+    """
+    Метрики в текстовом формате Prometheus.
+    Длительности публикуются как summary (квантили скользящего окна, сумма и количество).
+    @return: Текст метрик.
+    """
+    _update_gauge_callbacks()
+    lines = list()
+    types = dict()
+
+    def _add_type(name, metric_type):
+        if name not in types:
+            types[name] = metric_type
+            lines.append(u'# TYPE %s%s %s' % (PROMETHEUS_PREFIX, name, metric_type))
+
+    with _lock:
+        for key, timing in sorted(TIMINGS.items()):
+            name, labels = key
+            _add_type(name, 'summary')
+            for quantile in SUMMARY_QUANTILES:
+                lines.append(u'%s %f' % (_get_prometheus_label(key, quantile=quantile),
+                                         timing.get_quantile(quantile)))
+            lines.append(u'%s %f' % (_get_prometheus_label((name + '_sum', labels)), timing.sum))
+            lines.append(u'%s %d' % (_get_prometheus_label((name + '_count', labels)), timing.count))
+        for key, value in sorted(COUNTERS.items()):
+            _add_type(key[0], 'counter')
+            lines.append(u'%s %s' % (_get_prometheus_label(key), value))
+        for key, value in sorted(GAUGES.items()):
+            # Значение не определено (например функция значения вернула None).
+            # Такие значения не публикуются, т.к. недопустимы в формате Prometheus
+            if value is None:
+                continue
+            _add_type(key[0], 'gauge')
+            lines.append(u'%s %s' % (_get_prometheus_label(key), value))
+    return u'\n'.join(lines) + u'\n'
+
+
+class icMetricsHTTPRequestHandler(BaseHTTPServer.BaseHTTPRequestHandler):
+    """
+    Обработчик HTTP запросов метрик.
+    """
+    def do_GET(self):
+        if self.path.split('?')[0] not in (METRICS_HTTP_PATH, '/'):
+            self.send_error(404)
+            return
+        try:
+            body = get_prometheus_text().encode('utf-8')
+        except:
+            log.fatal(u'Ошибка подготовки метрик')
+            self.send_error(500)
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'text/plain; version=0.0.4; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        # Запросы метрик не выводим, чтобы не засорять журнал
+        pass
+
+
+def start_http_server(port, host=''):
+    """
+    Запустить HTTP сервер метрик в фоновом потоке.
+    @param port: Порт.
+    @param host: Адрес. По умолчанию все интерфейсы.
+    @return: True/False.
+    """
+    global _http_server
+
+    if _http_server is not None:
+        return True
+    try:
+        _http_server = BaseHTTPServer.HTTPServer((host, int(port)), icMetricsHTTPRequestHandler)
+    except:
+        log.fatal(u'Ошибка запуска HTTP сервера метрик на порту <%s>' % port)
+        return False
+
+    thread = threading.Thread(target=_http_server.serve_forever, name='metrics_http')
+    thread.daemon = True
+    thread.start()
+    log.info(u'HTTP сервер метрик запущен на порту <%s>' % port)
+    return True
+
+
+def stop_http_server():
+    """
+    Остановить HTTP сервер метрик.
+    """
+    global _http_server
+
+    if _http_server is not None:
+        _http_server.shutdown()
+        _http_server.server_close()
+        _http_server = None
@@ -0,0 +1,98 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Функции работы с PID файлами.
+
+PID файл содержит идентификатор процесса работающего регистратора.
+Используется менеджерами служб (systemd, init скрипты) для управления
+процессом и для контроля запуска единственного экземпляра программы.
+"""
+
+import os
+import os.path
+import errno
+
+from . import log
+
+__version__ = (0, 0, 1, 1)
+
+
+def is_process_alive(pid):
+    """
+    Проверка существования процесса.
+    @param pid: Идентификатор процесса.
+    @return: True - процесс существует / False - нет.
+    """
+    try:
+        os.kill(pid, 0)
+    except OSError, err:
+        # Процесс есть, но принадлежит другому пользователю
+        return err.errno == errno.EPERM
+    return True
+
+
+def read_pidfile(pid_filename):
+    """
+    Прочитать идентификатор процесса из PID файла.
+    @param pid_filename: Полное имя PID файла.
+    @return: Идентификатор процесса или None, если файл не найден или поврежден.
+    """
+    try:
+        pid_file = open(pid_filename, 'r')
+        try:
+            return int(pid_file.read().strip())
+        finally:
+            pid_file.close()
+    except (IOError, ValueError):
+        return None
+
+
+def get_running_pid(pid_filename):
+    """
+    Идентификатор работающего процесса, указанного в PID файле.
+    @param pid_filename: Полное имя PID файла.
+    @return: Идентификатор процесса или None, если процесс не работает.
+        PID файл не работающего процесса считается устаревшим.
+    """
+    pid = read_pidfile(pid_filename)
+    if pid is None or pid == os.getpid() or not is_process_alive(pid):
+        return None
+    return pid
+
+
+def write_pidfile(pid_filename):
+    """
+    Записать идентификатор текущего процесса в PID файл.
+    @param pid_filename: Полное имя PID файла.
+    @return: True/False.
+    """
+    try:
+        dirname = os.path.dirname(os.path.abspath(pid_filename))
+        if not os.path.exists(dirname):
+            os.makedirs(dirname)
+        pid_file = open(pid_filename, 'w')
+        try:
+            pid_file.write('%d\n' % os.getpid())
+        finally:
+            pid_file.close()
+        return True
+    except:
+        log.fatal(u'Ошибка записи PID файла <%s>' % pid_filename)
+    return False
+
+
+def remove_pidfile(pid_filename):
+    """
+    Удалить PID файл, если он принадлежит текущему процессу.
+    @param pid_filename: Полное имя PID файла.
+    @return: True/False.
+    """
+    if read_pidfile(pid_filename) != os.getpid():
+        return False
+    try:
+        os.remove(pid_filename)
+        return True
+    except OSError:
+        log.fatal(u'Ошибка удаления PID файла <%s>' % pid_filename)
+    return False
@@ -0,0 +1,142 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Функции работы с реестрами подключаемых классов (плагинов).
+
+Классы регистрируются в реестре строкой вида 'модуль:Класс'.
+Модуль класса импортируется только при первом обращении к нему.
+Таким образом при запуске не импортируются модули,
+которые не используются в текущих настройках (а вместе с ними и
+их тяжелые зависимости: драйверы OPC, sqlalchemy и т.п.).
+
+Сторонние классы могут быть зарегистрированы через точки входа
+(entry points) пакетов. Точки входа просматриваются, только если
+тип не найден среди встроенных классов.
+"""
+
+import threading
+
+from . import log
+
+__version__ = (0, 0, 1, 2)
+
+# Разделитель модуля и класса в строке регистрации
+CLASS_PATH_DELIMETER = ':'
+
+
+def import_class(class_path):
+    """
+    Импортировать класс по строке регистрации.
+    @param class_path: Строка регистрации вида 'модуль:Класс'.
+    @return: Класс.
+    """
+    module_name, class_name = class_path.split(CLASS_PATH_DELIMETER, 1)
+    module = __import__(module_name, globals(), locals(), [class_name])
+    return getattr(module, class_name)
+
+
+class icLazyRegistry(dict):
+    """
+    Реестр классов с отложенным импортом.
+    Значениями реестра могут быть строки регистрации вида 'модуль:Класс',
+    объекты точек входа или сами классы.
+    При первом обращении к элементу строка регистрации заменяется
+    импортированным классом.
+    """
+    def __init__(self, classes=None, entry_point_group=None):
+        """
+        Конструктор.
+        @param classes: Словарь {Имя типа: Строка регистрации или класс}.
+        @param entry_point_group: Группа точек входа сторонних классов.
+            Если не определена, то сторонние классы не подключаются.
+        """
+        dict.__init__(self, classes or dict())
+        self.entry_point_group = entry_point_group
+        self._is_entry_points_loaded = entry_point_group is None
+        self._lock = threading.RLock()
+
+    def _load_entry_points(self):
+        """
+        Зарегистрировать классы точек входа сторонних пакетов.
+        Встроенные классы точками входа не переопределяются.
+        """
+        if self._is_entry_points_loaded:
+            return
+        self._is_entry_points_loaded = True
+        try:
+            import pkg_resources
+        except ImportError:
+            return
+        try:
+            for entry_point in pkg_resources.iter_entry_points(self.entry_point_group):
+                if not dict.__contains__(self, entry_point.name):
+                    log.info(u'Регистрация стороннего типа <%s> из <%s>' % (entry_point.name, entry_point.module_name))
+                    dict.__setitem__(self, entry_point.name, entry_point)
+        except:
+            log.fatal(u'Ошибка загрузки точек входа <%s>' % self.entry_point_group)
+
+    def _resolve(self, name):
+        """
+        Получить класс по имени типа с импортом его модуля при необходимости.
+        @param name: Имя типа.
+        @return: Класс.
+        """
+        with self._lock:
+            if not dict.__contains__(self, name):
+                self._load_entry_points()
+            value = dict.__getitem__(self, name)
+            if isinstance(value, basestring):
+                log.debug(u'Импорт класса <%s>', value)
+                value = import_class(value)
+                dict.__setitem__(self, name, value)
+            elif hasattr(value, 'load') and hasattr(value, 'module_name'):
+                # Точка входа стороннего пакета
+                value = value.load()
+                dict.__setitem__(self, name, value)
+            return value
+
+    def __getitem__(self, name):
+        return self._resolve(name)
+
+    def get(self, name, default=None):
+        """
+        Получить класс по имени типа.
+        Ошибка импорта модуля регистрируется в журнале.
+        @param name: Имя типа.
+        @param default: Значение по умолчанию.
+        @return: Класс или default, если тип не зарегистрирован или его не удалось импортировать.
+        """
+        try:
+            return self._resolve(name)
+        except KeyError:
+            return default
+        except:
+            log.fatal(u'Ошибка импорта класса типа <%s>' % name)
+        return default
+
+    def has_builtin(self, name):
+        """
+        Проверка регистрации типа без просмотра точек входа сторонних пакетов.
+        @param name: Имя типа.
+        @return: True - тип зарегистрирован / False - нет или он может быть среди точек входа.
+        """
+        return dict.__contains__(self, name)
+
+    def __contains__(self, name):
+        if dict.__contains__(self, name):
+            return True
+        with self._lock:
+            self._load_entry_points()
+        return dict.__contains__(self, name)
+
+    has_key = __contains__
+
+    def keys(self):
+        """
+        Имена всех зарегистрированных типов, включая сторонние.
+        Классы при этом не импортируются.
+        """
+        with self._lock:
+            self._load_entry_points()
+        return dict.keys(self)
@@ -0,0 +1,268 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Функции запуска внешних процессов.
+
+Команды запускаются через subprocess списком аргументов, без коммандной оболочки
+и без создания временных коммандных файлов.
+Коммандная оболочка используется только для команд, содержащих
+специальные символы оболочки (конвейеры, перенаправления, шаблоны файлов и т.п.),
+встроенные команды оболочки (cd, export и т.п.) или присваивания переменных окружения.
+Результат выполнения возвращается в структурированном виде:
+код возврата, перехваченные stdout и stderr, признак превышения времени выполнения.
+"""
+
+import os
+import re
+import sys
+import shlex
+import signal
+import threading
+import subprocess
+import locale
+
+from . import log
+
+__version__ = (0, 0, 1, 3)
+
+# Кодировка коммандной оболочки по умолчанию
+CMD_ENCODING = sys.stdout.encoding if sys.platform.startswith('win') else locale.getpreferredencoding()
+
+# Специальные символы коммандной оболочки.
+# Команды с такими символами выполняются через коммандную оболочку
+SHELL_CHARS = ('|', '&', ';', '<', '>', '$', '`', '*', '?', '~',
+               '(', ')', '{', '}', '[', ']', '#', '!', '\n')
+
+# Встроенные команды коммандной оболочки.
+# Отдельных исполняемых файлов для них нет, поэтому они выполняются через оболочку
+SHELL_BUILTINS = ('.', ':', 'alias', 'bg', 'break', 'builtin', 'cd', 'command', 'continue',
+                  'eval', 'exec', 'exit', 'export', 'fg', 'getopts', 'hash', 'jobs',
+                  'local', 'read', 'readonly', 'return', 'set', 'shift', 'source',
+                  'times', 'trap', 'type', 'ulimit', 'umask', 'unalias', 'unset', 'wait')
+
+# Присваивание переменной окружения в начале команды (VAR=1 prog)
+ENV_ASSIGNMENT_PATTERN = re.compile(r'^[A-Za-z_][A-Za-z0-9_]*=')
+
+# Код возврата, если процесс не удалось запустить
+NOT_STARTED_RETURNCODE = -1
+
+
+class icProcessResult(object):
+    """
+    Результат выполнения внешнего процесса.
+    В логическом контексте результат истинен, если процесс
+    успешно завершился с кодом возврата 0.
+    """
+    def __init__(self, command, returncode=NOT_STARTED_RETURNCODE,
+                 stdout='', stderr='', is_timeout=False, error=None):
+        """
+        Конструктор.
+        @param command: Выполняемая команда.
+        @param returncode: Код возврата.
+        @param stdout: Перехваченный стандартный вывод.
+        @param stderr: Перехваченный вывод ошибок.
+        @param is_timeout: Процесс был прерван по превышению времени выполнения?
+        @param error: Текст ошибки запуска процесса.
+        """
+        self.command = command
+        self.returncode = returncode
+        self.stdout = stdout
+        self.stderr = stderr
+        self.is_timeout = is_timeout
+        self.error = error
+
+    def is_ok(self):
+        """
+        Процесс успешно завершился?
+        """
+        return self.returncode == 0 and not self.is_timeout and self.error is None
+
+    __nonzero__ = is_ok
+
+    def get_stdout(self, encoding=CMD_ENCODING):
+        """
+        Стандартный вывод процесса в Unicode.
+        """
+        return self.stdout.decode(encoding, 'replace') if isinstance(self.stdout, str) else self.stdout
+
+    def get_stderr(self, encoding=CMD_ENCODING):
+        """
+        Вывод ошибок процесса в Unicode.
+        """
+        return self.stderr.decode(encoding, 'replace') if isinstance(self.stderr, str) else self.stderr
+
+    def __repr__(self):
+        return '<%s %r returncode=%s timeout=%s>' % (self.__class__.__name__, self.command,
+                                                     self.returncode, self.is_timeout)
+
+
+class icProcessResults(list):
+    """
+    Список результатов выполнения нескольких процессов.
+    В логическом контексте список истинен, если все процессы завершились успешно.
+    """
+    def __nonzero__(self):
+        return all([bool(result) for result in self])
+
+
+def is_shell_command(command):
+    """
+    Проверка требует ли команда коммандной оболочки.
+    Под Windows большинство команд (copy, move, del и т.п.) встроены в
+    коммандный интерпретатор, поэтому там оболочка используется всегда.
+    @param command: Текст команды.
+    @return: True/False.
+    """
+    if sys.platform.startswith('win'):
+        return True
+    if max([char in command for char in SHELL_CHARS]):
+        return True
+    words = command.split(None, 1)
+    if not words:
+        return False
+    return words[0] in SHELL_BUILTINS or bool(ENV_ASSIGNMENT_PATTERN.match(words[0]))
+
+
+def split_command(command):
+    """
+    Разбить команду на список аргументов.
+    @param command: Текст команды.
+    @return: Список аргументов.
+    """
+    return shlex.split(command, posix=not sys.platform.startswith('win'))
+
+
+def _encode_command(command):
+    """
+    Команды выполняются в контексте консоли, поэтому должны быть
+    перекодированы в консольную кодировку перед выполнением.
+    """
+    if isinstance(command, unicode):
+        return command.encode(CMD_ENCODING)
+    return command
+
+
+def run_process(command, timeout=None, stdin_data=None, use_shell=None):
+    """
+    Выполнить внешний процесс.
+    @param command: Текст команды или список аргументов.
+    @param timeout: Максимальное время выполнения в секундах.
+        По истечении времени процесс принудительно завершается.
+        Если не определено, то время выполнения не ограничивается.
+    @param stdin_data: Данные, передаваемые процессу на стандартный вход.
+    @param use_shell: Выполнить команду через коммандную оболочку?
+        Если не определено, то определяется автоматически по наличию
+        специальных символов оболочки в команде.
+    @return: Объект результата выполнения icProcessResult.
+    """
+    result = icProcessResult(command)
+    try:
+        if isinstance(command, (list, tuple)):
+            args = [_encode_command(arg) for arg in command]
+            use_shell = bool(use_shell)
+        else:
+            command = result.command = _encode_command(command.strip())
+            if use_shell is None:
+                use_shell = is_shell_command(command)
+            args = command if use_shell else split_command(command)
+
+        # Открытые регистратором файлы (блокировки, кеш тегов) не передаются процессу.
+        # Под Windows close_fds не совместим с перенаправлением стандартных потоков.
+        # Процесс запускается в отдельной группе процессов, чтобы по превышению
+        # времени выполнения завершить и все запущенные им процессы
+        is_win = sys.platform.startswith('win')
+        process = subprocess.Popen(args, shell=use_shell,
+                                   stdin=subprocess.PIPE if stdin_data is not None else None,
+                                   stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                                   close_fds=not is_win,
+                                   preexec_fn=None if is_win else os.setsid)
+    except (OSError, ValueError), err:
+        # Команда не найдена, не закрытые кавычки и т.п.
+        result.error = str(err)
+        return result
+
+    timer = None
+    if timeout:
+        def _kill():
+            result.is_timeout = True
+            try:
+                if is_win:
+                    process.kill()
+                else:
+                    # Завершение только оболочки оставит работать ее дочерние процессы,
+                    # которые держат открытыми каналы вывода
+                    os.killpg(process.pid, signal.SIGKILL)
+            except OSError:
+                pass
+        timer = threading.Timer(timeout, _kill)
+        timer.start()
+    try:
+        result.stdout, result.stderr = process.communicate(stdin_data)
+    finally:
+        if timer:
+            timer.cancel()
+    result.returncode = process.returncode
+    return result
+
+
+def run_processes(commands, timeout=None, concurrent=False):
+    """
+    Выполнить несколько внешних процессов.
+    @param commands: Список команд.
+    @param timeout: Максимальное время выполнения каждого процесса в секундах.
+    @param concurrent: Выполнять процессы параллельно?
+        Используется для независимых друг от друга команд.
+        Иначе процессы выполняются последовательно.
+    @return: Список результатов icProcessResults в порядке команд.
+    """
+    if not concurrent or len(commands) < 2:
+        return icProcessResults([run_process(command, timeout) for command in commands])
+
+    results = icProcessResults([None] * len(commands))
+
+    def _run(i, command):
+        results[i] = run_process(command, timeout)
+
+    threads = [threading.Thread(target=_run, args=(i, command)) for i, command in enumerate(commands)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return results
+
+
+def run_script(script, timeout=None):
+    """
+    Выполнить скрипт коммандной оболочки.
+    Текст скрипта передается интерпретатору через стандартный вход
+    без создания временного коммандного файла.
+    @param script: Текст скрипта.
+    @param timeout: Максимальное время выполнения в секундах.
+    @return: Объект результата выполнения icProcessResult.
+    """
+    script = _encode_command(script)
+    if sys.platform.startswith('win'):
+        args = ['cmd', '/Q']
+    else:
+        args = ['sh', '-s']
+    result = run_process(args, timeout=timeout, stdin_data=script)
+    result.command = script
+    return result
+
+
+def log_result(result):
+    """
+    Вывести результат выполнения процесса в журнал.
+    @param result: Объект результата выполнения icProcessResult.
+    """
+    command = result.command.decode(CMD_ENCODING, 'replace') if isinstance(result.command, str) else result.command
+    if result.error is not None:
+        log.error(u'Ошибка запуска команды ОС <%s>: %s' % (command, result.error))
+    elif result.is_timeout:
+        log.error(u'Превышено время выполнения команды ОС <%s>' % command)
+    elif result.returncode != 0:
+        log.warning(u'Команда ОС <%s> завершена с кодом <%s>: %s' % (command, result.returncode,
+                                                                    result.get_stderr().strip()))
+    else:
+        log.debug(u'Команда ОС <%s> выполнена' % command)
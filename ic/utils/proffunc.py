@@ -0,0 +1,124 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Функции профилирования выполнения.
+
+Профилировщик оборачивает выполнение тиков регистратора в cProfile.
+Статистика сохраняется в файлы .pstats каждые N тиков
+(файлы можно анализировать модулем pstats или snakeviz/gprof2dot).
+При завершении работы выводятся самые затратные функции за все время профилирования.
+"""
+
+import os
+import os.path
+import time
+import cProfile
+import pstats
+import StringIO
+
+from . import log
+
+__version__ = (0, 0, 1, 1)
+
+# Расширение файлов статистики профилирования
+PSTATS_FILE_EXT = '.pstats'
+
+# Количество выводимых самых затратных функций
+TOP_HOTSPOTS = 25
+
+
+class icTickProfiler(object):
+    """
+    Профилировщик тиков.
+    """
+    def __init__(self, output_dir, dump_ticks=1):
+        """
+        Конструктор.
+        @param output_dir: Папка сохранения файлов статистики.
+        @param dump_ticks: Количество тиков, статистика которых сохраняется в один файл.
+        """
+        self.output_dir = os.path.abspath(output_dir)
+        self.dump_ticks = max(int(dump_ticks), 1)
+
+        self.profiler = cProfile.Profile()
+        # Номер первого тика текущего файла статистики
+        self.first_tick = None
+        # Количество тиков в текущем профиле
+        self.tick_count = 0
+        # Общая статистика за все время профилирования
+        self.total_stats = None
+
+        if not os.path.exists(self.output_dir):
+            log.info(u'Создание папки <%s>' % self.output_dir)
+            os.makedirs(self.output_dir)
+
+    def run(self, n_tick, func, *args, **kwargs):
+        """
+        Выполнить тик под профилировщиком.
+        @param n_tick: Номер тика.
+        @param func: Функция выполнения тика.
+        @return: Результат выполнения функции.
+        """
+        if self.first_tick is None:
+            self.first_tick = n_tick
+        try:
+            return self.profiler.runcall(func, *args, **kwargs)
+        finally:
+            self.tick_count += 1
+            if self.tick_count >= self.dump_ticks:
+                self.dump(n_tick)
+
+    def dump(self, last_tick=None):
+        """
+        Сохранить статистику накопленных тиков в файл и начать новый профиль.
+        @param last_tick: Номер последнего тика профиля.
+        @return: Имя файла статистики или None, если сохранять нечего.
+        """
+        if not self.tick_count:
+            return None
+
+        if last_tick is None:
+            last_tick = self.first_tick + self.tick_count - 1
+        filename = os.path.join(self.output_dir, 'tick_%06d-%06d_%s%s' % (self.first_tick, last_tick,
+                                                                           time.strftime('%Y%m%d_%H%M%S'),
+                                                                           PSTATS_FILE_EXT))
+        try:
+            self.profiler.dump_stats(filename)
+            if self.total_stats is None:
+                self.total_stats = pstats.Stats(filename)
+            else:
+                self.total_stats.add(filename)
+            log.info(u'Статистика профилирования сохранена в <%s>' % filename)
+        except:
+            log.fatal(u'Ошибка сохранения статистики профилирования в <%s>' % filename)
+            filename = None
+
+        self.profiler = cProfile.Profile()
+        self.first_tick = None
+        self.tick_count = 0
+        return filename
+
+    def get_hotspots(self, limit=TOP_HOTSPOTS, sort_key='cumulative'):
+        """
+        Самые затратные функции за все время профилирования.
+        @param limit: Количество функций.
+        @param sort_key: Ключ сортировки статистики (cumulative, tottime, calls...).
+        @return: Текст статистики.
+        """
+        if self.total_stats is None:
+            return u''
+        stream = StringIO.StringIO()
+        self.total_stats.stream = stream
+        self.total_stats.strip_dirs().sort_stats(sort_key).print_stats(limit)
+        return stream.getvalue()
+
+    def close(self):
+        """
+        Завершить профилирование.
+        Сохраняется статистика оставшихся тиков и выводятся самые затратные функции.
+        """
+        self.dump()
+        hotspots = self.get_hotspots()
+        if hotspots:
+            log.info(u'Самые затратные функции:\n%s', hotspots.decode('utf-8', 'replace'), bForcePrint=True)
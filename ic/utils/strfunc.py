@@ -8,7 +8,7 @@
 import random
 import string
 
-__version__ = (0, 0, 2, 2)
+__version__ = (0, 0, 2, 3)
 
 # Элементы псевдографики
 PSEUDOGRAPH = (u'│', u'─', u'┌', u'┐', u'└', u'┘', u'├', u'┤', u'┬', u'┴', u'┼')
@@ -304,6 +304,87 @@ rus_encodings = {'UTF-8':      'utf-8',
                  }
 
 
+# Веса символов при определении кодировки
+CODEPAGE_UPPERCASE_WEIGHT = 1
+CODEPAGE_LOWERCASE_WEIGHT = 3
+CODEPAGE_UTFUPPER_WEIGHT = 5
+CODEPAGE_UTFLOWER_WEIGHT = 7
+
+# Символы ASCII. Не участвуют в определении кодировки
+_ASCII_CHARS = ''.join([chr(i) for i in range(128)])
+
+
+def _get_byte_weights(simb_ord):
+    """
+    Веса однобайтового символа для однобайтовых кодировок.
+    @param simb_ord: Код символа.
+    @return: Словарь {Кодировка: Вес символа}.
+    """
+    uppercase = CODEPAGE_UPPERCASE_WEIGHT
+    lowercase = CODEPAGE_LOWERCASE_WEIGHT
+    weights = dict()
+
+    def _add(enc, weight):
+        weights[enc] = weights.get(enc, 0) + weight
+
+    # CP1251
+    if 223 < simb_ord < 256 or simb_ord == 184:
+        _add('CP1251', lowercase)
+    if 191 < simb_ord < 224 or simb_ord == 168:
+        _add('CP1251', uppercase)
+
+    # KOI8-R
+    if 191 < simb_ord < 224 or simb_ord == 163:
+        _add('KOI8-R', lowercase)
+    if 222 < simb_ord < 256 or simb_ord == 179:
+        _add('KOI8-R', uppercase)
+
+    # IBM866
+    if 159 < simb_ord < 176 or 223 < simb_ord < 241:
+        _add('IBM866', lowercase)
+    if 127 < simb_ord < 160 or simb_ord == 241:
+        _add('IBM866', uppercase)
+
+    # ISO-8859-5
+    if 207 < simb_ord < 240 or simb_ord == 161:
+        _add('ISO-8859-5', lowercase)
+    if 175 < simb_ord < 208 or simb_ord == 241:
+        _add('ISO-8859-5', uppercase)
+
+    # MAC
+    if 221 < simb_ord < 255:
+        _add('MAC', lowercase)
+    if 127 < simb_ord < 160:
+        _add('MAC', uppercase)
+    return weights
+
+
+def _get_utf8_pair_weights():
+    """
+    Веса двухбайтовых последовательностей русских букв в UTF-8.
+    @return: Словарь {Двухбайтовая последовательность: Вес}.
+    """
+    utfupper = CODEPAGE_UTFUPPER_WEIGHT * 2
+    utflower = CODEPAGE_UTFLOWER_WEIGHT * 2
+    weights = dict()
+    for simb_ord in range(128, 256):
+        pair = chr(208) + chr(simb_ord)
+        if 143 < simb_ord < 176 or simb_ord == 129:
+            weights[pair] = weights.get(pair, 0) + utfupper
+        if simb_ord == 145 or 175 < simb_ord < 192:
+            weights[pair] = weights.get(pair, 0) + utflower
+        if 127 < simb_ord < 144:
+            weights[chr(209) + chr(simb_ord)] = utflower
+    return weights
+
+
+# Таблица весов байтов {Байт: ((Кодировка, Вес), ...)}.
+# Подготавливается один раз при загрузке модуля
+CODEPAGE_BYTE_WEIGHTS = dict([(chr(i), tuple(_get_byte_weights(i).items())) for i in range(128, 256)])
+# Таблица весов двухбайтовых последовательностей UTF-8
+CODEPAGE_UTF8_PAIR_WEIGHTS = _get_utf8_pair_weights()
+
+
 def get_codepage(text=None):
     """
     Определение кодировки текста.
@@ -317,61 +398,29 @@ def get_codepage(text=None):
     a = 'авыаыв'
     print(chardet.detect(a))
     {'confidence': 0.99, 'encoding': 'utf-8'}
+    Символы ASCII отбрасываются, а оставшиеся байты подсчитываются
+    средствами str.count по заранее подготовленным таблицам весов,
+    без посимвольного обхода текста.
     """
-    uppercase = 1
-    lowercase = 3
-    utfupper = 5
-    utflower = 7
     codepages = {}
     for enc in rus_encodings.keys():
         codepages[enc] = 0
     if text is not None and len(text) > 0:
-        last_simb = 0
-        for simb in text:
-            simb_ord = ord(simb)
-
-            # non-russian characters
-            if simb_ord < 128 or simb_ord > 256:
-                continue
-
-            # UTF-8
-            if last_simb == 208 and (143 < simb_ord < 176 or simb_ord == 129):
-                codepages['UTF-8'] += (utfupper * 2)
-            if (last_simb == 208 and (simb_ord == 145 or 175 < simb_ord < 192)) \
-               or (last_simb == 209 and (127 < simb_ord < 144)):
-                codepages['UTF-8'] += (utflower * 2)
-
-            # CP1251
-            if 223 < simb_ord < 256 or simb_ord == 184:
-                codepages['CP1251'] += lowercase
-            if 191 < simb_ord < 224 or simb_ord == 168:
-                codepages['CP1251'] += uppercase
-
-            # KOI8-R
-            if 191 < simb_ord < 224 or simb_ord == 163:
-                codepages['KOI8-R'] += lowercase
-            if 222 < simb_ord < 256 or simb_ord == 179:
-                codepages['KOI8-R'] += uppercase
-
-            # IBM866
-            if 159 < simb_ord < 176 or 223 < simb_ord < 241:
-                codepages['IBM866'] += lowercase
-            if 127 < simb_ord < 160 or simb_ord == 241:
-                codepages['IBM866'] += uppercase
-
-            # ISO-8859-5
-            if 207 < simb_ord < 240 or simb_ord == 161:
-                codepages['ISO-8859-5'] += lowercase
-            if 175 < simb_ord < 208 or simb_ord == 241:
-                codepages['ISO-8859-5'] += uppercase
-
-            # MAC
-            if 221 < simb_ord < 255:
-                codepages['MAC'] += lowercase
-            if 127 < simb_ord < 160:
-                codepages['MAC'] += uppercase
-
-            last_simb = simb_ord
+        if isinstance(text, unicode):
+            text = text.encode('latin-1', 'ignore')
+        # Последовательности UTF-8 ищутся среди не ASCII символов
+        text = text.translate(None, _ASCII_CHARS)
+
+        simbols = set(text)
+        for simb in simbols:
+            count = text.count(simb)
+            for enc, weight in CODEPAGE_BYTE_WEIGHTS[simb]:
+                codepages[enc] += count * weight
+
+        if chr(208) in simbols or chr(209) in simbols:
+            for pair, weight in CODEPAGE_UTF8_PAIR_WEIGHTS.items():
+                if pair[0] in simbols and pair[1] in simbols:
+                    codepages['UTF-8'] += text.count(pair) * weight
 
         idx = 'utf-8'
         max_cp = 0
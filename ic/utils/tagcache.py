@@ -0,0 +1,327 @@
+#!/usr/bin/env python
+# -*- coding: utf-8 -*-
+
+"""
+Общий кеш значений тегов для нескольких процессов регистраторов.
+
+Несколько регистраторов на одном хосте часто читают одни и те же теги
+одного шлюза/OPC сервера. Процесс, прочитавший теги, публикует значения
+в кеше, а другие процессы в течение времени жизни (TTL) берут значения
+из кеша, не обращаясь к шлюзу.
+
+Кеш хранится в файле, отображаемом в память (mmap). По умолчанию файл
+создается в личной папке пользователя в /dev/shm (разделяемая память),
+если она есть. Файл кеша доступен только пользователю, от имени которого
+работают регистраторы. Файл, принадлежащий другому пользователю, или
+символическая ссылка вместо файла не используются.
+Доступ процессов синхронизируется блокировкой файла (fcntl.flock):
+чтение - разделяемая блокировка, запись - монопольная.
+
+Формат файла: заголовок (сигнатура, версия формата, длина данных) и
+словарь {Ключ тега: (Время чтения, Значение)}, сериализованный marshal.
+"""
+
+import os
+import os.path
+import stat
+import errno
+import time
+import mmap
+import struct
+import marshal
+import tempfile
+import threading
+
+try:
+    import fcntl
+except ImportError:
+    fcntl = None
+
+from . import log
+
+__version__ = (0, 0, 1, 2)
+
+# Имя файла кеша по умолчанию
+DEFAULT_CACHE_BASENAME = 'icregistrator_tags.cache'
+# Формат имени личной папки пользователя для файла кеша по умолчанию
+CACHE_DIRNAME_FMT = 'icregistrator-%d'
+# Папка разделяемой памяти
+SHM_DIR = '/dev/shm'
+
+# Заголовок файла: сигнатура, версия формата, длина данных
+HEADER_FMT = '<4sII'
+HEADER_SIZE = struct.calcsize(HEADER_FMT)
+CACHE_SIGNATURE = 'ICTC'
+CACHE_FORMAT_VERSION = 1
+
+# Начальный размер файла кеша в байтах
+INITIAL_CACHE_SIZE = 64 * 1024
+
+# Минимальный возраст значений в секундах, после которого они удаляются из кеша.
+# Процессы могут использовать разное время жизни значений,
+# поэтому значения хранятся дольше времени жизни текущего процесса
+MIN_PRUNE_AGE = 600
+
+# Разделитель частей ключа тега
+KEY_DELIMETER = u'|'
+
+# Открытые кеши {(Полное имя файла, Время жизни значений): Объект кеша}
+_caches = dict()
+_caches_lock = threading.Lock()
+
+
+def get_default_filename():
+    """
+    Имя файла кеша по умолчанию.
+    Файл располагается в личной папке пользователя, т.к. /dev/shm и
+    временная папка доступны на запись всем пользователям.
+    """
+    cache_dir = SHM_DIR if os.path.isdir(SHM_DIR) else tempfile.gettempdir()
+    return os.path.join(cache_dir, CACHE_DIRNAME_FMT % os.getuid(), DEFAULT_CACHE_BASENAME)
+
+
+def _check_owner(st, name):
+    """
+    Проверка принадлежности файла/папки текущему пользователю.
+    @param st: Результат os.stat/os.fstat.
+    @param name: Имя файла/папки для сообщения об ошибке.
+    """
+    if st.st_uid != os.getuid():
+        raise OSError(errno.EPERM, u'Файл кеша тегов принадлежит другому пользователю', name)
+
+
+def _make_private_dir(dirname):
+    """
+    Создать папку файла кеша, доступную только текущему пользователю.
+    Существующая папка должна быть папкой (не символической ссылкой) текущего пользователя.
+    @param dirname: Имя папки.
+    """
+    if not os.path.lexists(dirname):
+        try:
+            os.makedirs(dirname, 0700)
+        except OSError, err:
+            # Папку мог одновременно создать другой процесс
+            if err.errno != errno.EEXIST:
+                raise
+    st = os.lstat(dirname)
+    if not stat.S_ISDIR(st.st_mode):
+        raise OSError(errno.ENOTDIR, u'Не корректная папка файла кеша тегов', dirname)
+    _check_owner(st, dirname)
+
+
+def make_key(*parts):
+    """
+    Ключ тега в кеше.
+    Ключ должен однозначно определять тег на хосте, например:
+    make_key('uni://localhost:8080', 'RSLinx OPC Server', '[PLC]N7:0').
+    @param parts: Части ключа.
+    @return: Строка ключа.
+    """
+    return KEY_DELIMETER.join([part if isinstance(part, unicode) else unicode(str(part), 'utf-8')
+                               for part in parts])
+
+
+class icTagCache(object):
+    """
+    Общий кеш значений тегов.
+    """
+    def __init__(self, filename, ttl, private_dir=False):
+        """
+        Конструктор.
+        @param filename: Полное имя файла кеша.
+        @param ttl: Время жизни значений в секундах.
+        @param private_dir: Папка файла кеша должна быть личной папкой текущего пользователя.
+        """
+        self.filename = filename
+        self.ttl = ttl
+        self.private_dir = private_dir
+        self._lock = threading.Lock()
+        self._fd = None
+
+    def _open(self):
+        """
+        Открыть файл кеша.
+        Вызывается под блокировкой.
+        """
+        if self._fd is None:
+            dirname = os.path.dirname(self.filename)
+            if self.private_dir:
+                _make_private_dir(dirname)
+            elif dirname and not os.path.exists(dirname):
+                os.makedirs(dirname, 0700)
+            fd = os.open(self.filename, os.O_RDWR | os.O_CREAT | getattr(os, 'O_NOFOLLOW', 0), 0600)
+            try:
+                _check_owner(os.fstat(fd), self.filename)
+            except OSError:
+                os.close(fd)
+                raise
+            self._fd = fd
+            if os.fstat(self._fd).st_size < HEADER_SIZE:
+                fcntl.flock(self._fd, fcntl.LOCK_EX)
+                try:
+                    if os.fstat(self._fd).st_size < HEADER_SIZE:
+                        os.ftruncate(self._fd, INITIAL_CACHE_SIZE)
+                finally:
+                    fcntl.flock(self._fd, fcntl.LOCK_UN)
+        return self._fd
+
+    def _load(self, fd):
+        """
+        Загрузить содержимое кеша.
+        Вызывается под блокировкой файла.
+        @param fd: Дескриптор файла кеша.
+        @return: Словарь {Ключ: (Время чтения, Значение)}.
+        """
+        size = os.fstat(fd).st_size
+        if size < HEADER_SIZE:
+            return dict()
+        mm = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ)
+        try:
+            signature, version, length = struct.unpack(HEADER_FMT, mm[:HEADER_SIZE])
+            if signature != CACHE_SIGNATURE or version != CACHE_FORMAT_VERSION or not length:
+                return dict()
+            if HEADER_SIZE + length > size:
+                log.warning(u'Поврежден файл кеша тегов <%s>' % self.filename)
+                return dict()
+            try:
+                entries = marshal.loads(mm[HEADER_SIZE:HEADER_SIZE + length])
+            except (ValueError, EOFError, TypeError):
+                log.warning(u'Поврежден файл кеша тегов <%s>' % self.filename)
+                return dict()
+            return entries if isinstance(entries, dict) else dict()
+        finally:
+            mm.close()
+
+    def _save(self, fd, entries):
+        """
+        Сохранить содержимое кеша.
+        Вызывается под монопольной блокировкой файла.
+        @param fd: Дескриптор файла кеша.
+        @param entries: Словарь {Ключ: (Время чтения, Значение)}.
+        """
+        data = marshal.dumps(entries)
+        size = os.fstat(fd).st_size
+        required_size = HEADER_SIZE + len(data)
+        if required_size > size:
+            size = max(required_size, size * 2)
+            os.ftruncate(fd, size)
+        mm = mmap.mmap(fd, size, mmap.MAP_SHARED, mmap.PROT_READ | mmap.PROT_WRITE)
+        try:
+            mm[HEADER_SIZE:required_size] = data
+            mm[:HEADER_SIZE] = struct.pack(HEADER_FMT, CACHE_SIGNATURE, CACHE_FORMAT_VERSION, len(data))
+        finally:
+            mm.close()
+
+    def get_many(self, keys):
+        """
+        Получить не устаревшие значения тегов.
+        @param keys: Список ключей тегов.
+        @return: Словарь {Ключ: Значение} найденных в кеше тегов.
+        """
+        if not keys:
+            return dict()
+        try:
+            with self._lock:
+                fd = self._open()
+                fcntl.flock(fd, fcntl.LOCK_SH)
+                try:
+                    entries = self._load(fd)
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+        except:
+            log.fatal(u'Ошибка чтения кеша тегов <%s>' % self.filename)
+            return dict()
+
+        min_time = time.time() - self.ttl
+        result = dict()
+        for key in keys:
+            entry = entries.get(key, None)
+            if entry is not None and entry[0] >= min_time:
+                result[key] = entry[1]
+        return result
+
+    def put_many(self, values):
+        """
+        Опубликовать значения тегов.
+        Значения, которые нельзя сохранить в кеше (объекты, даты и т.п.), пропускаются.
+        @param values: Словарь {Ключ: Значение}.
+        @return: True/False.
+        """
+        if not values:
+            return True
+        now = time.time()
+        new_entries = dict()
+        for key, value in values.items():
+            try:
+                marshal.dumps(value)
+            except ValueError:
+                continue
+            new_entries[key] = (now, value)
+
+        prune_time = now - max(self.ttl, MIN_PRUNE_AGE)
+        try:
+            with self._lock:
+                fd = self._open()
+                fcntl.flock(fd, fcntl.LOCK_EX)
+                try:
+                    entries = self._load(fd)
+                    entries = dict([(key, entry) for key, entry in entries.items() if entry[0] >= prune_time])
+                    entries.update(new_entries)
+                    self._save(fd, entries)
+                finally:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+            return True
+        except:
+            log.fatal(u'Ошибка записи в кеш тегов <%s>' % self.filename)
+        return False
+
+    def clear(self):
+        """
+        Очистить кеш.
+        """
+        with self._lock:
+            fd = self._open()
+            fcntl.flock(fd, fcntl.LOCK_EX)
+            try:
+                self._save(fd, dict())
+            finally:
+                fcntl.flock(fd, fcntl.LOCK_UN)
+
+    def close(self):
+        """
+        Закрыть файл кеша.
+        """
+        with self._lock:
+            if self._fd is not None:
+                os.close(self._fd)
+                self._fd = None
+
+
+def get_tag_cache(ttl, filename=None):
+    """
+    Получить общий кеш тегов.
+    @param ttl: Время жизни значений в секундах.
+        Если не определено или 0, то кеш не используется.
+    @param filename: Полное имя файла кеша.
+        Если не определено, то используется файл по умолчанию.
+    @return: Объект кеша icTagCache или None, если кеш не используется.
+    """
+    if not ttl:
+        return None
+    try:
+        ttl = float(ttl)
+    except (TypeError, ValueError):
+        log.warning(u'Не корректное время жизни значений в общем кеше тегов <%s>' % ttl)
+        return None
+    if ttl <= 0:
+        return None
+    if fcntl is None:
+        log.warning(u'Общий кеш тегов не поддерживается на этой платформе')
+        return None
+
+    key = (os.path.abspath(filename or get_default_filename()), ttl)
+    with _caches_lock:
+        cache = _caches.get(key, None)
+        if cache is None:
+            cache = _caches[key] = icTagCache(private_dir=not filename, *key)
+    return cache
@@ -16,10 +16,12 @@ import os.path
 import log
 import utils
 import strfunc
+import ctxfunc
 
-__version__ = (0, 0, 5, 1)
+__version__ = (0, 0, 6, 2)
 
 VAR_PATTERN = r'(\{\{.*?\}\})'
+VAR_REGEXP = re.compile(VAR_PATTERN)
 
 DEFAULT_ENCODING = 'utf-8'
 FIND_REPLACEMENT_ERR = u'!!!Замена не определена в контексте!!!'
@@ -27,6 +29,84 @@ FIND_REPLACEMENT_ERR = u'!!!Замена не определена в конте
 REPLACE_NAME_START = u'{{'
 REPLACE_NAME_END = u'}}'
 
+# Кеш скомпилированных шаблонов текста {Текст шаблона: Скомпилированный шаблон}
+TEMPLATE_CACHE = dict()
+# Максимальное количество шаблонов в кеше.
+# При превышении кеш очищается полностью
+TEMPLATE_CACHE_SIZE = 4096
+
+# Кеш скомпилированных файлов шаблонов
+# {Полное имя файла: (Время модификации, Размер, Кодовая страница, Скомпилированный шаблон)}
+TEMPLATE_FILE_CACHE = dict()
+
+
+class icCompiledTemplate(object):
+    """
+    Скомпилированный шаблон текста.
+    Шаблон один раз разбирается на литеральные части и места замен.
+    Заполнение производится одним объединением частей.
+    """
+    __slots__ = ('literals', 'places', 'names')
+
+    def __init__(self, sTxt):
+        """
+        Конструктор.
+        @param sTxt: Текст шаблона.
+        """
+        # re.split с группой возвращает чередование [литерал, замена, литерал, ...]
+        parts = VAR_REGEXP.split(sTxt)
+        # Литеральные части текста. Их всегда на 1 больше чем мест замен
+        self.literals = parts[::2]
+        # Места замен в виде как они указаны в тексте
+        self.places = parts[1::2]
+        # Имена переменных замен
+        self.names = [_getVarName(place) for place in self.places]
+
+    def render(self, dReplaces):
+        """
+        Заполнение шаблона.
+        @param dReplaces: Словарь замен.
+        @return: Заполненный текст.
+        """
+        literals = self.literals
+        parts = [literals[0]]
+        for i, name in enumerate(self.names):
+            parts.append(strfunc.toUnicode(dReplaces.get(name, FIND_REPLACEMENT_ERR), DEFAULT_ENCODING))
+            parts.append(literals[i + 1])
+        return u''.join(parts)
+
+
+def compile_template(sTxt):
+    """
+    Получить скомпилированный шаблон текста.
+    Шаблоны кешируются по тексту.
+    @param sTxt: Текст шаблона.
+    @return: Объект скомпилированного шаблона.
+    """
+    compiled = TEMPLATE_CACHE.get(sTxt, None)
+    if compiled is None:
+        if len(TEMPLATE_CACHE) >= TEMPLATE_CACHE_SIZE:
+            TEMPLATE_CACHE.clear()
+        compiled = icCompiledTemplate(sTxt)
+        TEMPLATE_CACHE[sTxt] = compiled
+    return compiled
+
+
+def get_default_context():
+    """
+    Контекст генерации по умолчанию - локальное пространство имен модуля config.
+    Используется снимок конфигурации без копирования пространства имен модуля.
+    @return: Словарь контекста.
+    """
+    try:
+        from ic import config
+    except ImportError:
+        import config
+
+    if hasattr(config, 'get_cfg_snapshot'):
+        return ctxfunc.icLayeredContext(config.get_cfg_snapshot())
+    return dict([(name, utils.get_var(name)) for name in config.__dict__.keys()])
+
 
 def gen(sTxt, dContext=None):
     """
@@ -38,15 +118,7 @@ def gen(sTxt, dContext=None):
     @return: Сгенерированный текст.
     """
     if dContext is None:
-        dContext = {}
-
-        try:
-            from ic import config
-        except ImportError:
-            import config
-
-        for name in config.__dict__.keys():
-            dContext[name] = utils.get_var(name)
+        dContext = get_default_context()
     return auto_replace(sTxt, dContext)
 
 
@@ -66,7 +138,7 @@ def get_raplace_names(sTxt):
     if sTxt is None:
         log.warning(u'Не определен текст для автозамен')
         return list()
-    replaces = re.findall(VAR_PATTERN, sTxt)
+    replaces = compile_template(sTxt).places
     return [replace_name[len(REPLACE_NAME_START):-len(REPLACE_NAME_END)].strip() for replace_name in replaces]
 
 
@@ -82,23 +154,11 @@ def auto_replace(sTxt, dReplaces=None):
         dReplaces = locals()
             
     if sTxt and (dReplaces is not None):
-
-        replace_places = re.findall(VAR_PATTERN, sTxt)
-        replaces = dict([(place, dReplaces.get(_getVarName(place), FIND_REPLACEMENT_ERR)) for place in replace_places])
-            
-        for place, value in replaces.items():
-            place = strfunc.toUnicode(place, DEFAULT_ENCODING)
-            value = strfunc.toUnicode(value, DEFAULT_ENCODING)
-            try:
-                log.debug(u'Автозамена %s -> <%s>' % (place, value))
-            except UnicodeEncodeError:
-                log.error(u'Ошибка отображения автозамены %s' % place)
-            except UnicodeDecodeError:
-                log.error(u'Ошибка отображения автозамены %s' % place)
-
-            sTxt = sTxt.replace(place, value)
-            
-        return sTxt
+        compiled = compile_template(sTxt)
+        if not compiled.places:
+            # Замен нет. Текст остается без изменений
+            return sTxt
+        return compiled.render(dReplaces)
     elif sTxt is None:
         log.warning(u'Не определен текст для автозамен')
     elif dReplaces is None:
@@ -121,28 +181,27 @@ def is_genered(txt):
     return REPLACE_NAME_START in txt and REPLACE_NAME_END in txt
 
 
-def gen_txt_file(sTxtTemplateFilename, sTxtOutputFilename, dContext=None, output_encoding=None):
+def get_template_file(sTxtTemplateFilename):
     """
-    Генерация текстового файла по шаблону.
+    Получить скомпилированный шаблон из файла.
+    Файл шаблона читается, а его кодовая страница определяется, только
+    при первом обращении или после изменения файла.
     @param sTxtTemplateFilename: Шаблон - текстовый файл.
-    @param sTxtOutputFilename: Наименование выходного текстового файла.
-    @param dContext. Контекст.
-        В качестве контекста может выступать любая словарная структура.
-        По умолчанию контекст - локальное пространство имен модуля config.
-    @param output_encoding: Кодовая страница результирующего файла.
-        Если не определена, то кодовая страница остается такая же как и у шаблона.
-    @return: True - генерация прошла успешно,
-        False - ошибка генерации.
+    @return: Кортеж (Кодовая страница шаблона, Скомпилированный шаблон) или None в случае ошибки.
     """
-    template_file = None
-    output_file = None
-
     template_filename = os.path.abspath(sTxtTemplateFilename)
-    if not os.path.exists(template_filename):
+    try:
+        template_stat = os.stat(template_filename)
+    except OSError:
         log.warning(u'Файл шаблона для генерации текстового файла <%s> не найден' % template_filename)
-        return False
+        return None
+
+    cache_item = TEMPLATE_FILE_CACHE.get(template_filename, None)
+    if cache_item and cache_item[:2] == (template_stat.st_mtime, template_stat.st_size):
+        return cache_item[2:]
 
     # Чтение шаблона из файла
+    template_file = None
     try:
         template_file = open(template_filename, 'r')
         template_txt = template_file.read()
@@ -151,7 +210,7 @@ def gen_txt_file(sTxtTemplateFilename, sTxtOutputFilename, dContext=None, output
         if template_file:
             template_file.close()
         log.fatal(u'Ошибка чтения шаблона из файла <%s>' % template_filename)
-        return False
+        return None
 
     try:
         # Определить кодовую страницу текста
@@ -162,10 +221,39 @@ def gen_txt_file(sTxtTemplateFilename, sTxtOutputFilename, dContext=None, output
         template_txt = unicode(template_txt, template_encoding)
     except:
         log.fatal(u'Ошибка преобразования текста шаблона в Unicode')
+        return None
+
+    compiled = icCompiledTemplate(template_txt)
+    TEMPLATE_FILE_CACHE[template_filename] = (template_stat.st_mtime, template_stat.st_size,
+                                              template_encoding, compiled)
+    return template_encoding, compiled
+
+
+def gen_txt_file(sTxtTemplateFilename, sTxtOutputFilename, dContext=None, output_encoding=None):
+    """
+    Генерация текстового файла по шаблону.
+    @param sTxtTemplateFilename: Шаблон - текстовый файл.
+    @param sTxtOutputFilename: Наименование выходного текстового файла.
+    @param dContext. Контекст.
+        В качестве контекста может выступать любая словарная структура.
+        По умолчанию контекст - локальное пространство имен модуля config.
+    @param output_encoding: Кодовая страница результирующего файла.
+        Если не определена, то кодовая страница остается такая же как и у шаблона.
+    @return: True - генерация прошла успешно,
+        False - ошибка генерации.
+    """
+    output_file = None
+
+    template_filename = os.path.abspath(sTxtTemplateFilename)
+    template = get_template_file(template_filename)
+    if template is None:
         return False
+    template_encoding, compiled = template
 
     # Генерация текста по шаблону
-    gen_txt = gen(template_txt, dContext)
+    if dContext is None:
+        dContext = get_default_context()
+    gen_txt = compiled.render(dContext)
     if isinstance(gen_txt, unicode):
         # Перед записью необходимо обратно перекодировать текст
         if output_encoding is None:
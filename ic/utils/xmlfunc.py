@@ -12,7 +12,7 @@ from ic.contrib import dicttoxml
 from ic.utils import log
 from ic.convert import simple_dict2xml
 
-__version__ = (0, 0, 2, 3)
+__version__ = (0, 0, 2, 4)
 
 
 def load_xml_content(xml_filename, is_change_keys=True):
@@ -86,7 +86,7 @@ def get_xml_content_by_link(xml_content, link):
         root/Documents/1/Document/Title/value
     @return: Часть содержимого или None если по этому пути ничего не найдено.
     """
-    log.debug(u'Получение содержимого XML файла по пути %s' % link)
+    log.debug(u'Получение содержимого XML файла по пути %s', link)
 
     if type(link) in (str, unicode):
         link = link.split(XML_CONTENT_LINK_DELIMETER)
@@ -99,7 +99,7 @@ def get_xml_content_by_link(xml_content, link):
         return xml_content
 
     if link[0] not in xml_content:
-        log.warning(u'Не найден путь %s в содержимом %s XML файла' % (link, xml_content.keys()))
+        log.warning(u'Не найден путь %s в содержимом %s XML файла', link, xml_content.keys())
         return None
     elif link[0] in xml_content:
         return get_xml_content_by_link(xml_content[link[0]], link[1:])
@@ -15,29 +15,38 @@ icRegistrator - Программа автоматической регистра
         --version|-v        Напечатать версию программы
         --debug|-d          Режим отладки
         --log|-l            Режим журналирования
+        --profile=          Папка сохранения статистики профилирования тиков (cProfile)
+        --profile_ticks=    Количество тиков, статистика которых сохраняется в один файл .pstats
 
     [Контроль запуска]
-        --alone             Проверка монопольного выполнения (только одного экземпляра программы)
+        --alone             Проверка монопольного выполнения (только одного экземпляра программы
+                            с этим файлом настроек). Регистраторы с разными файлами настроек
+                            могут работать одновременно
+        --pidfile=          PID файл. В него записывается идентификатор процесса на время работы
 
     [Дополнительные параметры]
-        --run_mode=         Режимы запуска регистратора single/loop/src_diagnostic/dst_diagnostic
+        --run_mode=         Режимы запуска регистратора single/loop/daemon/src_diagnostic/dst_diagnostic
+                            daemon - режим службы без консоли: SIGTERM - завершение после окончания такта,
+                            SIGHUP - перезагрузка настроек
         --settings=         Файл настроек. Если не определен, то берется settings.ini
+        --metrics_port=     Порт HTTP сервера метрик в формате Prometheus (режим loop)
 """
 
+import os.path
 import sys
-import commands
 import getopt
 
 from ic import config
 from ic.utils import log
 from ic.utils import journal
+from ic.utils import lockfunc
 from ic import engine
 
-__version__ = (0, 0, 7, 1)
+__version__ = (0, 0, 8, 2)
 
-# Команда проверки монопольного выполнения
-PROCESS_LIST_COMMAND = 'ps -eo pid,cmd'
-ALONE_CHECK_COMMAND = 'uni_registrator.py'
+# Блокировка монопольного выполнения.
+# Удерживается до завершения процесса
+ALONE_LOCK = None
 
 
 def main(argv):
@@ -53,8 +62,9 @@ def main(argv):
     try:
         options, args = getopt.getopt(argv, 'h?vdl',
                                       ['help', 'version', 'debug', 'log',
-                                       'alone',
-                                       'run_mode=', 'settings='])
+                                       'alone', 'pidfile=',
+                                       'run_mode=', 'settings=', 'metrics_port=',
+                                       'profile=', 'profile_ticks='])
     except getopt.error, msg:
         print(msg)
         print(u'For help use --help option')
@@ -62,6 +72,7 @@ def main(argv):
 
     registrator = engine.icRegistrator()
 
+    is_alone = False
     for option, arg in options:
         if option in ('-h', '--help', '-?'):
             print(__doc__)
@@ -76,27 +87,59 @@ def main(argv):
             # Установка режима журналирования
             config.set_cfg_var('LOG_MODE', True)
         elif option in ('--alone',):
-            processes_txt = commands.getoutput(PROCESS_LIST_COMMAND)
-            processes = processes_txt.strip().split('\n')
-            find_processes = [process for process in processes if ALONE_CHECK_COMMAND in process]
-            if len(find_processes) > 1:
-                print(u'Monopoly execute mode not imposible')
-                print(u'Fileloader processes:')
-                for process in find_processes:
-                    print(process)
-                print(u'Exit')
-                return
-            else:
-                print(u'Monopoly execute mode ON')
+            # Проверка монопольного выполнения производится после разбора всех параметров
+            is_alone = True
+        elif option in ('--pidfile',):
+            # PID файл
+            config.set_cfg_var('PID_FILENAME', arg)
         elif option in ('--run_mode',):
             # Режим запуска
             config.set_cfg_var('RUN_MODE', arg.lower())
         elif option in ('--settings',):
             # Режим запуска
             config.set_cfg_var('SETTINGS_FILENAME', arg)
+        elif option in ('--profile',):
+            # Профилирование тиков
+            config.set_cfg_var('PROFILER_DIR', arg)
+        elif option in ('--profile_ticks',):
+            config.set_cfg_var('PROFILER_TICKS', int(arg))
+        elif option in ('--metrics_port',):
+            # Порт HTTP сервера метрик
+            config.set_cfg_var('METRICS_PORT', int(arg))
+
+    if is_alone and not check_alone(registrator):
+        return
 
     registrator.run()
 
 
+def check_alone(registrator):
+    """
+    Проверка монопольного выполнения.
+    Захватывается блокировка файла настроек. Если блокировка занята,
+    то регистратор с этим файлом настроек уже запущен и запуск запрещается.
+    Блокировка освобождается автоматически при завершении процесса.
+    @param registrator: Объект движка регистратора.
+    @return: True - монопольное выполнение возможно / False - уже запущен другой экземпляр.
+    """
+    global ALONE_LOCK
+
+    settings_filename = config.get_cfg_var('SETTINGS_FILENAME')
+    if not settings_filename or not os.path.exists(settings_filename):
+        settings_filename = registrator.settings_manager.genINIFileName()
+
+    lock = lockfunc.icFileLock(lockfunc.get_lock_filename(settings_filename, config.get_cfg_var('LOCK_DIR'),
+                                                          prefix='%s_' % config.PRJ_NAME))
+    if not lock.acquire():
+        print(u'Monopoly execute mode not imposible')
+        print(u'Registrator process PID: %s (%s)' % (lock.get_owner_pid(), lock.lock_filename))
+        print(u'Exit')
+        return False
+
+    ALONE_LOCK = lock
+    print(u'Monopoly execute mode ON')
+    return True
+
+
 if __name__ == '__main__':
     main(sys.argv[1:])